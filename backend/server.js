@@ -23,6 +23,7 @@ const adminRoutes = require('./routes/admin');
 
 const app = express();
 const PORT = process.env.PORT || 3001;
+const SHUTDOWN_TIMEOUT_MS = parseInt(process.env.SHUTDOWN_TIMEOUT_MS || '10000', 10);
 
 // 确保上传目录存在
 const UPLOAD_DIR = path.join(__dirname, 'uploads');
@@ -75,7 +76,7 @@ async function startServer() {
     await initPool();
     console.log('数据库连接成功');
     
-    app.listen(PORT, '0.0.0.0', () => {
+    const server = app.listen(PORT, '0.0.0.0', () => {
       console.log(`=================================`);
       console.log(`食材包订阅平台后端服务已启动`);
       console.log(`版本: 1.2.0 (MySQL版)`);
@@ -83,6 +84,21 @@ async function startServer() {
       console.log(`上传目录: ${UPLOAD_DIR}`);
       console.log(`=================================`);
     });
+
+    // 优雅退出：滚动重启时旧实例停止接收新连接，处理完进行中的请求后再退出
+    const shutdown = (signal) => {
+      console.log(`收到 ${signal}，停止接收新请求...`);
+      server.close(() => {
+        console.log('进行中的请求已处理完毕，退出');
+        process.exit(0);
+      });
+      if (server.closeIdleConnections) {
+        server.closeIdleConnections();
+      }
+      setTimeout(() => process.exit(0), SHUTDOWN_TIMEOUT_MS).unref();
+    };
+    process.once('SIGTERM', () => shutdown('SIGTERM'));
+    process.once('SIGINT', () => shutdown('SIGINT'));
   } catch (error) {
     console.error('启动失败:', error);
     process.exit(1);
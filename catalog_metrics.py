@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+食材包营养 / 成本 / 烹饪时长批量计算
+根据食材参考表（每 100g 营养和进价）和每个食材包的食材用量，
+用 NumPy 一次性算出整个目录的 nutrition_info、食材成本和 cook_time。
+
+用法:
+  # 读取 generate_food_data.py --format parquet|arrow 导出的目录（最快）
+  python3 catalog_metrics.py --catalog catalog/ -o metrics.tsv
+  # 直接计算合成食材包
+  python3 catalog_metrics.py --count 100000 -o metrics.tsv
+  # 演示食材包
+  python3 catalog_metrics.py
+
+输出的 TSV 可用 LOAD DATA 导入临时表后一条 UPDATE ... JOIN 回写 food_packages。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    print("❌ 需要安装 numpy: pip install numpy")
+    sys.exit(1)
+
+import generate_food_data as gen
+
+# 食材参考表: 名称 -> (热量kcal, 蛋白质g, 碳水g, 脂肪g, 膳食纤维g, 进价元) 均为每 100g，
+# 最后一项为按个/只/根计量时每件的克数（按重量计量的食材为 None）
+INGREDIENT_REFERENCE = {
+    '野生牛肝菌': (28, 3.5, 4.6, 0.4, 2.8, 12.0, None),
+    '农家土鸡': (167, 19.3, 0.0, 9.4, 0.0, 4.5, None),
+    '竹荪': (155, 17.8, 60.3, 3.1, 46.4, 30.0, None),
+    '枸杞': (258, 13.9, 64.1, 1.5, 16.9, 10.0, None),
+    '红枣': (276, 3.2, 67.8, 0.5, 6.2, 3.0, None),
+    '鲜活草鱼': (113, 16.6, 0.0, 5.2, 0.0, 2.5, None),
+    '洪湖莲藕': (73, 1.9, 16.4, 0.2, 1.2, 1.2, None),
+    '嫩豆腐': (50, 5.0, 2.0, 2.5, 0.4, 0.8, None),
+    '香菜': (33, 1.8, 6.2, 0.4, 1.2, 1.5, None),
+    '川味腊肉': (498, 11.8, 2.9, 48.8, 0.0, 8.0, None),
+    '青蒜苗': (40, 2.1, 8.0, 0.4, 1.8, 1.2, None),
+    '土豆': (77, 2.0, 17.2, 0.2, 0.7, 0.4, None),
+    '二荆条辣椒': (38, 1.4, 8.9, 0.3, 3.2, 1.5, None),
+    '长白山野山参': (300, 10.0, 60.0, 1.0, 10.0, 500.0, None),
+    '散养土鸡': (167, 19.3, 0.0, 9.4, 0.0, 5.0, None),
+    '淮山': (57, 1.9, 12.4, 0.2, 0.8, 1.6, None),
+    '干贝': (264, 55.6, 5.1, 2.4, 0.0, 40.0, None),
+    '虫草花': (320, 27.0, 45.0, 2.5, 22.0, 15.0, None),
+    '苦菜': (38, 2.8, 6.4, 0.6, 3.0, 2.0, None),
+    '蕨菜': (42, 1.6, 9.0, 0.4, 1.8, 2.5, None),
+    '折耳根': (52, 2.2, 10.4, 0.4, 1.2, 2.0, None),
+    '火腿': (330, 16.4, 0.1, 27.4, 0.0, 12.0, None),
+    '文昌鸡': (167, 19.3, 0.0, 9.4, 0.0, 6.0, None),
+    '新鲜椰子': (241, 4.0, 31.3, 12.1, 4.7, 1.5, 800),
+    '珍珠马蹄': (61, 1.2, 14.2, 0.2, 1.1, 1.2, None),
+    '五常大米': (346, 7.4, 77.9, 0.8, 0.7, 1.2, None),
+    '甜玉米': (112, 4.0, 22.8, 1.2, 2.9, 0.8, 250),
+    '紫薯': (82, 1.1, 18.5, 0.2, 1.6, 0.8, None),
+    '红豆': (324, 20.2, 63.4, 0.6, 7.7, 1.5, None),
+    '活河虾': (87, 16.4, 0.0, 2.4, 0.0, 8.0, None),
+    '螺蛳': (59, 7.5, 6.0, 0.6, 0.0, 2.0, None),
+    '茭白': (26, 1.2, 5.9, 0.2, 1.9, 1.0, None),
+    '小葱': (27, 1.6, 4.9, 0.4, 1.4, 1.0, None),
+    '鲜鲍鱼': (84, 12.6, 6.6, 0.8, 0.0, 25.0, 50),
+    '海参': (78, 16.5, 2.5, 0.2, 0.0, 60.0, None),
+    '扇贝': (60, 11.1, 2.6, 0.6, 0.0, 5.0, 40),
+    '花菇': (274, 20.0, 61.7, 1.2, 31.6, 12.0, None),
+}
+NUTRIENTS = ['calories', 'protein', 'carbs', 'fat', 'fiber']
+# nutrition_info 按份计算，与 food_packages.serving_size 的默认值一致
+SERVINGS_PER_PACKAGE = 2
+METRIC_COLUMNS = ['id', 'nutrition_info', 'cook_time', 'ingredient_cost']
+
+
+class IngredientReference:
+    """参考表的数组形式：第 i 行对应编码为 i 的食材，最后一行留给参考表里没有的食材（全为 0）"""
+
+    def __init__(self, reference=INGREDIENT_REFERENCE):
+        self.names = list(reference)
+        self.codes = {name: i for i, name in enumerate(self.names)}
+        self.unknown = len(self.names)
+        values = list(reference.values()) + [(0, 0, 0, 0, 0, 0, None)]
+        self.per_100g = np.array([v[:5] for v in values], dtype=np.float64)
+        self.cost_per_100g = np.array([v[5] for v in values], dtype=np.float64)
+        self.piece_grams = np.array([np.nan if v[6] is None else v[6] for v in values], dtype=np.float64)
+
+    def encode(self, names):
+        return np.fromiter((self.codes.get(n, self.unknown) for n in names), dtype=np.int32, count=len(names))
+
+    def encode_dictionary(self, dictionary, indices):
+        """字典编码的名称列：只需查一次字典，再用数组索引展开"""
+        lookup = self.encode(dictionary)
+        return lookup[indices]
+
+
+def compute_metrics(reference, package_ids, ing_package_ids, ing_codes, ing_quantity, ing_grams,
+                    step_package_ids, step_durations):
+    """向量化计算每个食材包的营养（按份）、食材成本和烹饪时长
+
+    所有参数都是等长的 NumPy 数组（按食材行 / 步骤行展开），ing_grams 中无法按重量折算的
+    位置为 NaN，会改用“件数 × 每件克数”。返回以 package_ids 顺序排列的结果数组字典。
+    """
+    order = np.argsort(package_ids, kind='stable')
+    sorted_ids = package_ids[order]
+    n = len(package_ids)
+
+    def package_index(ids):
+        # 先映射到排序后的位置，再还原为 package_ids 中的位置
+        return order[np.searchsorted(sorted_ids, ids)]
+
+    grams = np.where(np.isnan(ing_grams), ing_quantity * reference.piece_grams[ing_codes], ing_grams)
+    grams = np.nan_to_num(grams)
+    ing_idx = package_index(ing_package_ids)
+
+    result = {}
+    weight = grams / 100.0
+    for k, nutrient in enumerate(NUTRIENTS):
+        totals = np.bincount(ing_idx, weights=weight * reference.per_100g[ing_codes, k], minlength=n)
+        result[nutrient] = np.rint(totals / SERVINGS_PER_PACKAGE).astype(np.int64)
+    result['ingredient_cost'] = np.round(
+        np.bincount(ing_idx, weights=weight * reference.cost_per_100g[ing_codes], minlength=n), 2
+    )
+    result['cook_time'] = np.bincount(
+        package_index(step_package_ids), weights=step_durations, minlength=n
+    ).astype(np.int64)
+    result['unknown_ingredients'] = int(np.count_nonzero(ing_codes == reference.unknown))
+    return result
+
+
+def metrics_from_packages(reference, packages):
+    """从食材包字典计算，返回 (package_ids, metrics)"""
+    cols = gen.flatten_packages(packages)
+    ing, steps = cols['ingredients'], cols['recipe_steps']
+    package_ids = np.array(cols['packages']['id'], dtype=np.int64)
+    metrics = compute_metrics(
+        reference,
+        package_ids,
+        np.array(ing['package_id'], dtype=np.int64),
+        reference.encode(ing['name']),
+        np.array(ing['quantity'], dtype=np.float64),
+        np.array([np.nan if g is None else g for g in ing['grams']], dtype=np.float64),
+        np.array(steps['package_id'], dtype=np.int64),
+        np.array(steps['duration'], dtype=np.float64),
+    )
+    return package_ids, metrics
+
+
+def metrics_from_columnar(reference, catalog_dir):
+    """读取 generate_food_data.py 导出的列式目录，返回 (package_ids, metrics)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("❌ 需要安装 pyarrow: pip install pyarrow")
+        sys.exit(1)
+
+    def read(name, columns):
+        path = os.path.join(catalog_dir, f"{name}.parquet")
+        if os.path.exists(path):
+            return pq.read_table(path, columns=columns)
+        with pa.memory_map(os.path.join(catalog_dir, f"{name}.arrow")) as source:
+            return pa.ipc.open_file(source).read_all().select(columns)
+
+    packages = read('packages', ['id'])
+    ing = read('ingredients', ['package_id', 'name', 'quantity', 'grams'])
+    steps = read('recipe_steps', ['package_id', 'duration'])
+
+    names = ing['name'].combine_chunks()
+    if pa.types.is_dictionary(names.type):
+        codes = reference.encode_dictionary(names.dictionary.to_pylist(),
+                                            names.indices.to_numpy(zero_copy_only=False))
+    else:
+        codes = reference.encode(names.to_pylist())
+
+    package_ids = packages['id'].to_numpy()
+    metrics = compute_metrics(
+        reference,
+        package_ids,
+        ing['package_id'].to_numpy(),
+        codes,
+        ing['quantity'].to_numpy(),
+        ing['grams'].to_numpy(zero_copy_only=False).astype(np.float64),
+        steps['package_id'].to_numpy(),
+        steps['duration'].to_numpy().astype(np.float64),
+    )
+    return package_ids, metrics
+
+
+def metric_rows(package_ids, metrics):
+    """按 METRIC_COLUMNS 产出每个食材包的值元组"""
+    columns = [metrics[name].tolist() for name in NUTRIENTS]
+    cook_time = metrics['cook_time'].tolist()
+    cost = metrics['ingredient_cost'].tolist()
+    for i, pkg_id in enumerate(package_ids.tolist()):
+        nutrition = json.dumps(dict(zip(NUTRIENTS, (col[i] for col in columns))), separators=(',', ':'))
+        yield pkg_id, nutrition, cook_time[i], cost[i]
+
+
+def update_statements(path):
+    """把 metrics TSV 回写 food_packages 所需的 SQL：一次 LOAD DATA + 一次 UPDATE JOIN"""
+    return '\n'.join([
+        "CREATE TEMPORARY TABLE package_metrics "
+        "(id INT PRIMARY KEY, nutrition_info JSON, cook_time INT, ingredient_cost DECIMAL(10, 2));",
+        gen.load_data_statement('package_metrics', METRIC_COLUMNS, path),
+        "UPDATE food_packages p JOIN package_metrics m ON p.id = m.id "
+        "SET p.nutrition_info = m.nutrition_info, p.cook_time = m.cook_time;",
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量计算食材包营养、成本和烹饪时长')
+    parser.add_argument('--catalog', help='列式导出目录（generate_food_data.py --format parquet|arrow）')
+    parser.add_argument('--count', type=int, help='直接计算的合成食材包数量')
+    parser.add_argument('--start-id', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-o', '--output', default='-', help="输出 TSV 文件（默认 '-' 标准输出）")
+    args = parser.parse_args()
+
+    reference = IngredientReference()
+    started = time.monotonic()
+    if args.catalog:
+        results = [metrics_from_columnar(reference, args.catalog)]
+    else:
+        packages = gen.food_packages if args.count is None else gen.generate_packages(
+            args.count, args.start_id, args.seed)
+        # 分批计算并立即写出，内存只与批大小有关
+        results = (metrics_from_packages(reference, chunk)
+                   for chunk in gen.batched(packages, gen.COLUMNAR_BATCH_PACKAGES))
+
+    total = 0
+    unknown = 0
+    out = gen.open_output(args.output)
+    try:
+        for package_ids, metrics in results:
+            total += gen.write_tsv(metric_rows(package_ids, metrics), out)
+            unknown += metrics['unknown_ingredients']
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.monotonic() - started
+
+    print(f"已计算 {total} 个食材包，耗时 {elapsed:.2f}s", file=sys.stderr)
+    if unknown:
+        print(f"  ! {unknown} 条食材不在参考表中，按 0 计算", file=sys.stderr)
+    if args.output != '-':
+        print(f"回写:\n{update_statements(args.output)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+rsync 式增量传输工具
+把新版本文件相对服务器上已有的旧文件的差异编码为增量文件，只传输变化的块
+
+用法:
+  # 服务器: 为旧文件生成块签名（旧文件不存在时生成空签名，增量即为全量）
+  python3 delta_transfer.py signature /var/www/food-subscription-artifacts/current.tar current.sig
+  # 本地: 用签名和新文件生成增量
+  python3 delta_transfer.py delta current.sig release.tar release.delta
+  # 服务器: 旧文件 + 增量还原出新文件（校验 SHA-256）
+  python3 delta_transfer.py patch current.tar release.delta release.tar
+
+签名为每个块的弱校验（Adler-32，可滚动）+ 强校验（BLAKE2b-128）。生成增量时在新文件上
+逐字节滚动弱校验，弱校验命中后再比较强校验，命中的块只记录块号，其余字节作为字面数据；
+增量整体用 zlib 压缩。
+"""
+
+import argparse
+import hashlib
+import os
+import struct
+import sys
+import time
+import zlib
+
+BLOCK_SIZE = 4096
+SIGNATURE_MAGIC = b'FSSG'
+DELTA_MAGIC = b'FSDL'
+STRONG_DIGEST_SIZE = 16
+READ_SIZE = 1024 * 1024
+ADLER_MOD = 65521
+
+
+def strong_digest(data):
+    return hashlib.blake2b(data, digest_size=STRONG_DIGEST_SIZE).digest()
+
+
+def write_signature(basis_path, sig_path, block_size=BLOCK_SIZE):
+    """为 basis_path 的每个完整块写出 (弱校验, 强校验)，返回块数"""
+    count = 0
+    tmp_path = f"{sig_path}.{os.getpid()}.partial"
+    with open(tmp_path, 'wb') as out:
+        out.write(struct.pack('>4sII', SIGNATURE_MAGIC, block_size, 0))
+        if os.path.exists(basis_path):
+            with open(basis_path, 'rb') as f:
+                for block in iter(lambda: f.read(block_size), b''):
+                    if len(block) < block_size:
+                        break
+                    out.write(struct.pack('>I', zlib.adler32(block)) + strong_digest(block))
+                    count += 1
+        out.seek(0)
+        out.write(struct.pack('>4sII', SIGNATURE_MAGIC, block_size, count))
+    os.replace(tmp_path, sig_path)
+    return count
+
+
+def read_signature(sig_path):
+    """读取签名，返回 (block_size, {弱校验: [(强校验, 块号)]})"""
+    with open(sig_path, 'rb') as f:
+        magic, block_size, count = struct.unpack('>4sII', f.read(12))
+        if magic != SIGNATURE_MAGIC:
+            raise ValueError(f"{sig_path} 不是签名文件")
+        entry_size = 4 + STRONG_DIGEST_SIZE
+        data = f.read(count * entry_size)
+    table = {}
+    for index in range(count):
+        entry = data[index * entry_size:(index + 1) * entry_size]
+        weak, = struct.unpack('>I', entry[:4])
+        table.setdefault(weak, []).append((entry[4:], index))
+    return block_size, table
+
+
+class _DeltaWriter:
+    """按顺序写出增量指令，连续的块引用合并为一条，整体经 zlib 压缩"""
+
+    def __init__(self, out):
+        self.out = out
+        self.compressor = zlib.compressobj(6)
+        self.copy_start = None
+        self.copy_count = 0
+        self.copied_blocks = 0
+        self.literal_bytes = 0
+
+    def write(self, data):
+        self.out.write(self.compressor.compress(data))
+
+    def flush_copy(self):
+        if self.copy_count:
+            self.write(b'C' + struct.pack('>II', self.copy_start, self.copy_count))
+            self.copied_blocks += self.copy_count
+            self.copy_start, self.copy_count = None, 0
+
+    def copy(self, index):
+        if self.copy_count and index == self.copy_start + self.copy_count:
+            self.copy_count += 1
+            return
+        self.flush_copy()
+        self.copy_start, self.copy_count = index, 1
+
+    def literal(self, data):
+        if not data:
+            return
+        self.flush_copy()
+        for start in range(0, len(data), READ_SIZE):
+            chunk = data[start:start + READ_SIZE]
+            self.write(b'L' + struct.pack('>I', len(chunk)) + chunk)
+        self.literal_bytes += len(data)
+
+    def close(self, sha256, size):
+        self.flush_copy()
+        self.write(b'E' + bytes.fromhex(sha256) + struct.pack('>Q', size))
+        self.out.write(self.compressor.flush())
+
+
+def write_delta(sig_path, new_path, delta_path):
+    """用签名和新文件生成增量文件，返回统计信息"""
+    started = time.monotonic()
+    block_size, table = read_signature(sig_path)
+    with open(new_path, 'rb') as f:
+        data = f.read()
+    size = len(data)
+    L = block_size
+    tmp_path = f"{delta_path}.{os.getpid()}.partial"
+
+    with open(tmp_path, 'wb') as out:
+        out.write(struct.pack('>4sI', DELTA_MAGIC, block_size))
+        writer = _DeltaWriter(out)
+        pos = 0
+        literal_start = 0
+        if table and size >= L:
+            weak = zlib.adler32(data[:L])
+            a, b = weak & 0xffff, weak >> 16
+            while True:
+                candidates = table.get((b << 16) | a)
+                if candidates:
+                    digest = strong_digest(data[pos:pos + L])
+                    index = next((i for strong, i in candidates if strong == digest), None)
+                    if index is not None:
+                        writer.literal(data[literal_start:pos])
+                        writer.copy(index)
+                        pos += L
+                        literal_start = pos
+                        if pos + L > size:
+                            break
+                        weak = zlib.adler32(data[pos:pos + L])
+                        a, b = weak & 0xffff, weak >> 16
+                        continue
+                if pos + L >= size:
+                    break
+                # 窗口右移一个字节：移出 data[pos]，移入 data[pos + L]
+                old, new = data[pos], data[pos + L]
+                a = (a - old + new) % ADLER_MOD
+                b = (b - L * old - 1 + a) % ADLER_MOD
+                pos += 1
+        writer.literal(data[literal_start:])
+        writer.close(hashlib.sha256(data).hexdigest(), size)
+    os.replace(tmp_path, delta_path)
+
+    return {
+        'size': size,
+        'delta_size': os.path.getsize(delta_path),
+        'copied_bytes': writer.copied_blocks * block_size,
+        'literal_bytes': writer.literal_bytes,
+        'seconds': time.monotonic() - started,
+    }
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError("增量文件不完整")
+    return data
+
+
+class _Inflater:
+    """逐段解压增量指令流"""
+
+    def __init__(self, f):
+        self.f = f
+        self.decompressor = zlib.decompressobj()
+        self.buffer = b''
+
+    def read(self, size):
+        while len(self.buffer) < size:
+            chunk = self.f.read(READ_SIZE)
+            if not chunk:
+                self.buffer += self.decompressor.flush()
+                break
+            self.buffer += self.decompressor.decompress(chunk)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def apply_delta(basis_path, delta_path, out_path):
+    """旧文件 + 增量还原出新文件，SHA-256 与增量中记录的不一致时报错且不留下输出文件"""
+    tmp_path = f"{out_path}.{os.getpid()}.partial"
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with open(delta_path, 'rb') as f, open(tmp_path, 'wb') as out:
+            magic, block_size = struct.unpack('>4sI', _read_exact(f, 8))
+            if magic != DELTA_MAGIC:
+                raise ValueError(f"{delta_path} 不是增量文件")
+            ops = _Inflater(f)
+            basis = open(basis_path, 'rb') if os.path.exists(basis_path) else None
+            try:
+                while True:
+                    op = _read_exact(ops, 1)
+                    if op == b'C':
+                        start, count = struct.unpack('>II', _read_exact(ops, 8))
+                        if basis is None:
+                            raise ValueError(f"增量引用了旧文件，但 {basis_path} 不存在")
+                        basis.seek(start * block_size)
+                        remaining = count * block_size
+                        while remaining:
+                            chunk = _read_exact(basis, min(remaining, READ_SIZE))
+                            out.write(chunk)
+                            digest.update(chunk)
+                            remaining -= len(chunk)
+                        written += count * block_size
+                    elif op == b'L':
+                        length, = struct.unpack('>I', _read_exact(ops, 4))
+                        chunk = _read_exact(ops, length)
+                        out.write(chunk)
+                        digest.update(chunk)
+                        written += length
+                    elif op == b'E':
+                        expected = _read_exact(ops, 32).hex()
+                        size, = struct.unpack('>Q', _read_exact(ops, 8))
+                        break
+                    else:
+                        raise ValueError(f"未知的增量指令: {op!r}")
+            finally:
+                if basis is not None:
+                    basis.close()
+            out.flush()
+            os.fsync(out.fileno())
+        if written != size or digest.hexdigest() != expected:
+            raise ValueError(f"还原结果校验失败（{written} 字节，期望 {size} 字节）")
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {'size': written, 'sha256': expected}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='rsync 式增量传输工具')
+    commands = parser.add_subparsers(dest='command', required=True)
+    sig = commands.add_parser('signature', help='为旧文件生成块签名')
+    sig.add_argument('basis')
+    sig.add_argument('signature')
+    sig.add_argument('--block-size', type=int, default=BLOCK_SIZE)
+    delta = commands.add_parser('delta', help='用签名和新文件生成增量')
+    delta.add_argument('signature')
+    delta.add_argument('new')
+    delta.add_argument('delta')
+    patch = commands.add_parser('patch', help='旧文件 + 增量还原新文件')
+    patch.add_argument('basis')
+    patch.add_argument('delta')
+    patch.add_argument('out')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'signature':
+            count = write_signature(args.basis, args.signature, args.block_size)
+            print(f"✓ 签名: {count} 块 × {args.block_size} 字节")
+        elif args.command == 'delta':
+            stats = write_delta(args.signature, args.new, args.delta)
+            print(f"✓ 增量: {stats['delta_size'] / 1024:.1f} KB（新文件 {stats['size'] / 1024:.1f} KB，"
+                  f"复用 {stats['copied_bytes'] / 1024:.1f} KB，字面 {stats['literal_bytes'] / 1024:.1f} KB，"
+                  f"耗时 {stats['seconds']:.1f}s）")
+        else:
+            result = apply_delta(args.basis, args.delta, args.out)
+            print(f"✓ 已还原 {args.out}（{result['size'] / 1024:.1f} KB，sha256 {result['sha256'][:12]}）")
+    except (OSError, ValueError) as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,84 +2,162 @@
 # -*- coding: utf-8 -*-
 """
 修复文件换行符工具 (CRLF -> LF)
-用法: python3 fix-crlf.py [文件或目录]
+用法: python3 fix-crlf.py [文件或目录 ...] [--jobs N]
+
+二进制文件（开头一块含 NUL 字节或是常见的图片/压缩包格式）会被跳过；
+文件用 mmap 扫描，只有确实包含 CRLF 的文件才分块写入同目录的临时文件再原子替换，内存占用与文件大小无关。
 """
 
-import sys
+import argparse
+import mmap
 import os
-from pathlib import Path
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def fix_file(file_path):
-    """修复单个文件的换行符"""
+DEFAULT_EXTENSIONS = ['.sh', '.py', '.js', '.json', '.md', '.txt', '.ts', '.tsx', '.css', '.html']
+SKIP_DIRS = ['node_modules', '.git', '__pycache__', '.venv']
+SNIFF_SIZE = 8192                 # 判断是否为二进制文件时读取的字节数
+CHUNK_SIZE = 1024 * 1024          # 改写时每次处理的字节数
+BINARY_SIGNATURES = (
+    b'\x89PNG', b'GIF8', b'\xff\xd8\xff', b'PK\x03\x04', b'\x1f\x8b', b'\x28\xb5\x2f\xfd', b'%PDF', b'\x7fELF',
+)
+JOBS = min(32, (os.cpu_count() or 1) * 2)
+
+
+def is_binary(head):
+    """根据文件开头一块内容判断是否为二进制文件"""
+    return b'\0' in head or head.startswith(BINARY_SIGNATURES)
+
+
+def rewrite_lf(src, first_crlf, out):
+    """把 src（mmap）中的 CRLF 替换为 LF 写入 out；first_crlf 之前的内容原样复制"""
+    size = len(src)
+    for start in range(0, first_crlf, CHUNK_SIZE):
+        out.write(src[start:min(start + CHUNK_SIZE, first_crlf)])
+    carry = b''
+    for start in range(first_crlf, size, CHUNK_SIZE):
+        end = min(start + CHUNK_SIZE, size)
+        data = carry + src[start:end]
+        # 块末尾的 \r 可能和下一块开头的 \n 组成 CRLF，留到下一块一起处理
+        carry = b''
+        if end < size and data.endswith(b'\r'):
+            data, carry = data[:-1], b'\r'
+        out.write(data.replace(b'\r\n', b'\n'))
+    out.write(carry)
+
+
+def normalize_file(file_path):
+    """修复单个文件的换行符，返回 'fixed' / 'clean' / 'binary' / 'error'"""
+    tmp_path = None
     try:
-        with open(file_path, 'rb') as f:
-            content = f.read()
-        
-        # 检测是否包含 CRLF
-        if b'\r\n' not in content:
-            return False
-        
-        # 替换 CRLF 为 LF
-        new_content = content.replace(b'\r\n', b'\n')
-        
-        with open(file_path, 'wb') as f:
-            f.write(new_content)
-        
-        return True
+        # 符号链接改写其指向的文件，不把链接替换成普通文件
+        target = os.path.realpath(file_path)
+        with open(target, 'rb') as f:
+            if is_binary(f.read(SNIFF_SIZE)):
+                return 'binary'
+            st = os.fstat(f.fileno())
+            if st.st_size == 0:
+                return 'clean'
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as src:
+                # 检测是否包含 CRLF
+                first_crlf = src.find(b'\r\n')
+                if first_crlf < 0:
+                    return 'clean'
+                fd, tmp_path = tempfile.mkstemp(prefix='.crlf-', dir=os.path.dirname(target))
+                with os.fdopen(fd, 'wb') as out:
+                    rewrite_lf(src, first_crlf, out)
+        # 临时文件属于当前用户，替换前改回原文件的属主和属组；没有权限时保持现状。
+        # chown 会清掉 setuid/setgid 位，所以放在 copymode 之前
+        try:
+            os.chown(tmp_path, st.st_uid, st.st_gid)
+        except PermissionError:
+            pass
+        shutil.copymode(target, tmp_path)
+        os.replace(tmp_path, target)
+        return 'fixed'
     except Exception as e:
         print(f"  错误: {file_path} - {e}")
-        return False
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return 'error'
 
-def fix_directory(dir_path, extensions=None):
-    """修复目录下所有文件的换行符"""
-    fixed_count = 0
-    checked_count = 0
-    
+
+def fix_file(file_path):
+    """修复单个文件的换行符"""
+    return normalize_file(file_path) == 'fixed'
+
+
+def fix_directory(dir_path, extensions=None, jobs=JOBS):
+    """用 jobs 个线程并行修复目录下所有文件的换行符"""
+    paths = []
+    seen = set()
     for root, dirs, files in os.walk(dir_path):
         # 跳过 node_modules 和 .git
-        dirs[:] = [d for d in dirs if d not in ['node_modules', '.git', '__pycache__', '.venv']]
-        
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
         for filename in files:
             if extensions and not any(filename.endswith(ext) for ext in extensions):
                 continue
-            
             file_path = os.path.join(root, filename)
-            checked_count += 1
-            
-            if fix_file(file_path):
-                print(f"  已修复: {file_path}")
+            # 指向同一文件的符号链接只处理一次，避免两个线程同时改写
+            real_path = os.path.realpath(file_path)
+            if real_path not in seen:
+                seen.add(real_path)
+                paths.append(file_path)
+
+    fixed_count = 0
+    binary_count = 0
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {pool.submit(normalize_file, path): path for path in paths}
+        for future in as_completed(futures):
+            status = future.result()
+            if status == 'fixed':
+                print(f"  已修复: {futures[future]}")
                 fixed_count += 1
-    
-    return checked_count, fixed_count
+            elif status == 'binary':
+                binary_count += 1
+
+    if binary_count:
+        print(f"  跳过二进制文件: {binary_count} 个")
+    return len(paths), fixed_count
+
 
 def main():
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description='修复文件换行符 (CRLF -> LF)')
+    parser.add_argument('targets', nargs='*', help='文件或目录；不指定时只处理当前目录下的脚本和文本文件')
+    parser.add_argument('--jobs', type=int, default=JOBS, help='并行处理的线程数')
+    args = parser.parse_args()
+
+    if not args.targets:
         # 默认修复当前目录下的脚本文件
         targets = ['.']
-        extensions = ['.sh', '.py', '.js', '.json', '.md', '.txt', '.ts', '.tsx', '.css', '.html']
+        extensions = DEFAULT_EXTENSIONS
     else:
-        targets = sys.argv[1:]
-        extensions = None  # 修复所有文件
-    
+        targets = args.targets
+        extensions = None  # 修复所有文本文件
+
     total_checked = 0
     total_fixed = 0
-    
+
     for target in targets:
         if not os.path.exists(target):
             print(f"不存在: {target}")
             continue
-        
+
         if os.path.isfile(target):
-            if fix_file(target):
+            status = normalize_file(target)
+            if status == 'fixed':
                 print(f"已修复: {target}")
                 total_fixed += 1
+            elif status == 'binary':
+                print(f"跳过二进制文件: {target}")
             total_checked += 1
         else:
             print(f"\n扫描目录: {target}")
-            checked, fixed = fix_directory(target, extensions)
+            checked, fixed = fix_directory(target, extensions, args.jobs)
             total_checked += checked
             total_fixed += fixed
-    
+
     print(f"\n{'='*50}")
     print(f"检查文件数: {total_checked}")
     print(f"修复文件数: {total_fixed}")
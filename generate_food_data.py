@@ -1,9 +1,29 @@
 """
 生成丰富的县域特色食材包数据
 适合三创赛展示 - 梓里炊烟平台
+
+用法:
+  python3 generate_food_data.py                      # 输出演示食材包的 SQL 值列表
+  python3 generate_food_data.py --count 1000000 -o packages.sql
+  python3 generate_food_data.py --count 1000000 --format tsv -o packages.tsv
+  python3 generate_food_data.py --table orders --count 5000000 --users 100000 --packages 1000000 -o orders.sql
+  python3 generate_food_data.py --count 10000000 --format tsv --workers 8 -o seed/packages
+  python3 generate_food_data.py --count 1000000 --format parquet -o catalog/   # 需要 pyarrow
+  python3 generate_food_data.py --count 1000000 --diff-manifest catalog.manifest -o changes.sql
 """
 
+import argparse
+import bisect
+import datetime
+import hashlib
+import itertools
 import json
+import os
+import random
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 # 县域特色食材包数据
 food_packages = [
@@ -387,16 +407,1050 @@ food_packages = [
     }
 ]
 
-# 生成SQL语句
-print("-- 新增食材包数据")
-for pkg in food_packages:
-    sql = f'''({pkg['id']}, '{pkg['name']}', '{pkg['description']}', '{pkg['level']}', {pkg['price']}, {pkg['original_price']}, '{pkg['image']}',
-        '{json.dumps(pkg['tags'], ensure_ascii=False)}',
-        '{json.dumps(pkg['ingredients'], ensure_ascii=False)}',
-        '{json.dumps(pkg['recipes'], ensure_ascii=False)}',
-        '{json.dumps(pkg['seasonings'], ensure_ascii=False)}',
-        '{json.dumps(pkg['nutrition_info'])}',
-        {str(pkg['is_limited']).lower()}, {pkg['stock_quantity']}, {pkg['merchant_id']}, '{pkg['status']}')'''
-    print(sql + ",")
-
-print(f"\n共生成 {len(food_packages)} 个食材包")
+# ==================== 批量合成数据 ====================
+
+# food_packages 表中由生成器填充的列（顺序即输出顺序）
+PACKAGE_COLUMNS = [
+    'id', 'name', 'description', 'level', 'price', 'original_price', 'image',
+    'tags', 'ingredients', 'recipes', 'seasonings', 'nutrition_info',
+    'is_limited', 'stock_quantity', 'merchant_id', 'status',
+]
+JSON_COLUMNS = {
+    'tags', 'ingredients', 'recipes', 'seasonings', 'nutrition_info',
+    'delivery_address', 'health_goals', 'dietary_restrictions', 'preferred_cuisines',
+}
+
+# 每个随机数分块覆盖的 ID 数量；同一 seed 下每块的数据与生成范围无关
+CHUNK_ROWS = 1000
+MAX_INGREDIENTS = 8
+MAX_SEASONINGS = 6
+
+# 合成数据的素材池，全部取自上面的演示食材包
+INGREDIENT_POOL = [
+    {k: v for k, v in ing.items() if k != 'id'}
+    for pkg in food_packages for ing in pkg['ingredients']
+]
+SEASONING_POOL = [
+    {k: v for k, v in s.items() if k != 'id'}
+    for pkg in food_packages for s in pkg['seasonings']
+]
+STEP_POOL = [
+    (step['description'], step['duration'])
+    for pkg in food_packages for recipe in pkg['recipes'] for step in recipe['steps']
+]
+TIP_POOL = [tip for pkg in food_packages for recipe in pkg['recipes'] for tip in recipe['tips']]
+TAG_POOL = sorted({tag for pkg in food_packages for tag in pkg['tags']})
+IMAGE_POOL = [pkg['image'] for pkg in food_packages]
+REGION_POOL = sorted({ing['origin'] for ing in INGREDIENT_POOL if ing['origin'] != '本地'})
+DISH_SUFFIXES = ['山珍宴', '鲜鱼宴', '农家土菜', '养生炖汤', '风味套餐', '丰收宴', '河鲜宴', '海鲜盛宴', '野菜宴']
+LEVELS = ['basic', 'intermediate', 'advanced']
+LEVEL_WEIGHTS = [5, 4, 2]
+
+
+def chunk_rng(seed, stream, chunk_index):
+    """返回某个数据流第 chunk_index 块专用的随机数生成器
+
+    以字符串作种子（内部走 sha512），结果不受 PYTHONHASHSEED 影响，
+    任意 ID 区间都能单独、可复现地生成。
+    """
+    return random.Random(f"{seed}:{stream}:{chunk_index}")
+
+
+def iter_chunked(stream, start_id, stop_id, seed, make_row):
+    """按 CHUNK_ROWS 对齐的分块遍历 [start_id, stop_id)，逐行调用 make_row(rng, id)"""
+    chunk_index = (start_id - 1) // CHUNK_ROWS
+    while True:
+        chunk_start = chunk_index * CHUNK_ROWS + 1
+        if chunk_start >= stop_id:
+            return
+        rng = chunk_rng(seed, stream, chunk_index)
+        for row_id in range(chunk_start, min(chunk_start + CHUNK_ROWS, stop_id)):
+            # 即使跳过区间之前的行也要生成，保证随机序列与起点无关
+            row = make_row(rng, row_id)
+            if row_id >= start_id:
+                yield row
+        chunk_index += 1
+
+
+def make_package(rng, pkg_id, seed=42):
+    """合成一个食材包（字段结构与演示数据一致）"""
+    region = rng.choice(REGION_POOL)
+    level = rng.choices(LEVELS, LEVEL_WEIGHTS)[0]
+    price = package_price(seed, pkg_id)
+
+    ingredients = []
+    for n, ing in enumerate(rng.sample(INGREDIENT_POOL, rng.randint(3, MAX_INGREDIENTS))):
+        ingredients.append({'id': str((pkg_id - 1) * MAX_INGREDIENTS + n + 1), **ing})
+
+    steps = rng.sample(STEP_POOL, rng.randint(3, 6))
+    recipe_name = f"{ingredients[0]['name']}{rng.choice(['汤', '煲', '小炒', '拼盘', '炖菜'])}"
+    recipes = [{
+        'id': str(pkg_id),
+        'name': recipe_name,
+        'description': f"选用{region}的{ingredients[0]['name']}，地道家常做法",
+        'steps': [
+            {'order': order, 'description': desc, 'duration': duration}
+            for order, (desc, duration) in enumerate(steps, 1)
+        ],
+        'tips': rng.sample(TIP_POOL, 2),
+    }]
+
+    seasonings = []
+    for n, s in enumerate(rng.sample(SEASONING_POOL, rng.randint(1, MAX_SEASONINGS))):
+        seasonings.append({'id': str((pkg_id - 1) * MAX_SEASONINGS + n + 1), **s})
+
+    is_limited = rng.random() < 0.2
+    return {
+        'id': pkg_id,
+        'name': f"{region}{rng.choice(DISH_SUFFIXES)}",
+        'description': f"精选{region}特色食材，{'、'.join(i['name'] for i in ingredients[:3])}等搭配，{recipe_name}一次学会",
+        'level': level,
+        'price': price,
+        'original_price': price + rng.randrange(10, 100),
+        'image': rng.choice(IMAGE_POOL),
+        'tags': rng.sample(TAG_POOL, rng.randint(2, 4)),
+        'ingredients': ingredients,
+        'recipes': recipes,
+        'seasonings': seasonings,
+        'nutrition_info': {
+            'calories': rng.randrange(180, 700),
+            'protein': rng.randrange(8, 60),
+            'carbs': rng.randrange(10, 90),
+            'fat': rng.randrange(3, 40),
+            'fiber': rng.randrange(1, 12),
+        },
+        'is_limited': is_limited,
+        'stock_quantity': rng.randrange(10, 60) if is_limited else rng.randrange(50, 500),
+        'merchant_id': 2,
+        'status': 'active',
+    }
+
+
+def generate_packages(count, start_id=1, seed=42):
+    """惰性生成 count 个合成食材包，内存占用与 count 无关"""
+    return iter_chunked(
+        'food_packages', start_id, start_id + count, seed,
+        lambda rng, pkg_id: make_package(rng, pkg_id, seed),
+    )
+
+
+def to_row(record, columns):
+    """把记录字典转换为与 columns 对齐的值元组，JSON 列序列化为字符串"""
+    return tuple(
+        json.dumps(record[col], ensure_ascii=False, separators=(',', ':')) if col in JSON_COLUMNS else record[col]
+        for col in columns
+    )
+
+
+def package_row(pkg):
+    """把食材包字典转换为与 PACKAGE_COLUMNS 对齐的值元组"""
+    return to_row(pkg, PACKAGE_COLUMNS)
+
+
+# ==================== 用户、订单、订阅等业务数据 ====================
+
+USER_COLUMNS = ['id', 'email', 'password', 'name', 'phone', 'role', 'created_at']
+ADDRESS_COLUMNS = [
+    'id', 'user_id', 'name', 'phone', 'province', 'city', 'district', 'detail_address', 'is_default',
+]
+DIET_PROFILE_COLUMNS = [
+    'id', 'user_id', 'age', 'gender', 'height', 'weight', 'activity_level',
+    'health_goals', 'dietary_restrictions', 'preferred_cuisines', 'allergies', 'calorie_target',
+]
+ORDER_COLUMNS = [
+    'id', 'user_id', 'package_id', 'quantity', 'total_amount', 'status', 'payment_method',
+    'payment_time', 'delivery_address', 'contact_name', 'contact_phone', 'remark', 'created_at',
+]
+SUBSCRIPTION_COLUMNS = [
+    'id', 'user_id', 'package_id', 'frequency', 'quantity', 'total_amount', 'status',
+    'start_date', 'next_delivery_date', 'delivery_address', 'contact_name', 'contact_phone', 'created_at',
+]
+
+# 合成用户的登录密码均为 user123（与 init-mysql.js 中演示用户一致），bcrypt cost=10
+DEFAULT_PASSWORD_HASH = '$2b$10$KwTFAzaIU5QNPJXuNMACFOP3YUlkXekLq5r8MWzCtjVvNyG4VCCxG'
+
+# 所有时间字段都落在 [WORKLOAD_START, WORKLOAD_START + days) 区间内
+WORKLOAD_START = datetime.datetime(2026, 1, 1)
+_EPOCH = datetime.datetime(1970, 1, 1)
+ZIPF_EXPONENT = 1.1
+
+SURNAMES = ['王', '李', '张', '刘', '陈', '杨', '黄', '赵', '吴', '周', '徐', '孙', '马', '朱', '胡', '郭']
+GIVEN_NAMES = ['伟', '芳', '娜', '敏', '静', '磊', '洋', '艳', '勇', '军', '杰', '娟', '涛', '明', '超', '秀英', '华', '平']
+DISTRICTS = [
+    ('北京市', '北京市', ['朝阳区', '海淀区', '东城区']),
+    ('上海市', '上海市', ['浦东新区', '徐汇区', '静安区']),
+    ('广东省', '广州市', ['天河区', '越秀区', '海珠区']),
+    ('广东省', '深圳市', ['南山区', '福田区', '宝安区']),
+    ('浙江省', '杭州市', ['西湖区', '余杭区', '拱墅区']),
+    ('四川省', '成都市', ['武侯区', '锦江区', '高新区']),
+    ('陕西省', '西安市', ['雁塔区', '碑林区', '未央区']),
+    ('湖北省', '武汉市', ['洪山区', '江汉区', '武昌区']),
+]
+STREETS = ['中山路', '人民路', '解放路', '建设路', '和平路', '长江路', '文化路', '科技路']
+HEALTH_GOALS = ['减脂', '增肌', '控糖', '养胃', '均衡营养', '提高免疫力']
+DIETARY_RESTRICTIONS = ['素食', '低盐', '低脂', '无麸质', '清真']
+CUISINES = ['川菜', '粤菜', '湘菜', '鲁菜', '苏菜', '浙菜', '闽菜', '徽菜', '东北菜', '西北菜']
+ALLERGIES = ['', '', '', '花生', '海鲜', '乳制品', '鸡蛋']
+
+ORDER_STATUSES = ['pending_payment', 'paid', 'preparing', 'delivered', 'completed', 'cancelled']
+ORDER_STATUS_WEIGHTS = [8, 10, 5, 10, 55, 12]
+SUBSCRIPTION_STATUSES = ['active', 'paused', 'cancelled', 'expired']
+SUBSCRIPTION_STATUS_WEIGHTS = [60, 15, 20, 5]
+FREQUENCY_DAYS = {'weekly': 7, 'biweekly': 14, 'monthly': 30}
+FREQUENCY_WEIGHTS = [6, 3, 1]
+PAYMENT_METHODS = ['wechat', 'alipay', 'mock']
+ORDER_REMARKS = ['', '', '', '', '请尽快发货', '放门口即可', '不要辣', '周末配送']
+# 一天中各小时的下单权重：午餐、晚餐前两个高峰，凌晨几乎没有订单
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 1, 2, 4, 6, 8, 12, 16, 14, 8, 6, 6, 10, 16, 18, 14, 10, 6, 3, 2]
+
+_MASK64 = (1 << 64) - 1
+# stable_hash 的数据流编号，保证不同用途的哈希互不相关
+_HASH_PACKAGE_PRICE = 1
+_HASH_USER = 2
+_HASH_PROMO_DAYS = 3
+
+
+def stable_hash(seed, stream, n):
+    """splitmix64 整数哈希：跨表共享的属性（用户姓名、食材包价格）由它按 ID 直接算出，无需查表"""
+    z = (seed * 0x9E3779B97F4A7C15 + stream * 0xD1B54A32D192ED03 + n) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+def package_price(seed, pkg_id):
+    """食材包售价，订单、订阅金额按同一价格计算"""
+    return 38 + stable_hash(seed, _HASH_PACKAGE_PRICE, pkg_id) % 360
+
+
+def user_contact(seed, user_id):
+    """返回用户的 (姓名, 手机号, 默认收货地址)，地址表、订单、订阅共用同一份联系人信息"""
+    h = stable_hash(seed, _HASH_USER, user_id)
+    name = SURNAMES[h % len(SURNAMES)] + GIVEN_NAMES[(h >> 8) % len(GIVEN_NAMES)]
+    phone = f"1{3 + (h >> 16) % 7}{(h >> 20) % 10 ** 9:09d}"
+    province, city, districts = DISTRICTS[(h >> 52) % len(DISTRICTS)]
+    address = {
+        'name': name,
+        'phone': phone,
+        'province': province,
+        'city': city,
+        'district': districts[(h >> 56) % len(districts)],
+        'detail_address': f"{STREETS[(h >> 58) % len(STREETS)]}{(h >> 40) % 999 + 1}号",
+    }
+    return name, phone, address
+
+
+def format_time(moment):
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def epoch_ms(moment):
+    """按 UTC 解释的毫秒时间戳，与本机时区无关"""
+    return (moment - _EPOCH) // datetime.timedelta(milliseconds=1)
+
+
+class ZipfSampler:
+    """按 Zipf 分布抽取 [1, n] 中的 ID：少数爆款承担大部分订单
+
+    排名通过与 n 互素的步长打散到 ID 上，爆款不会全部集中在最小的几个 ID。
+    """
+
+    def __init__(self, n, exponent=ZIPF_EXPONENT):
+        self.n = n
+        self.cum_weights = list(itertools.accumulate(1.0 / k ** exponent for k in range(1, n + 1)))
+        self.total = self.cum_weights[-1]
+        stride = max(1, n // 2 + 1)
+        while _gcd(stride, n) != 1:
+            stride += 1
+        self.stride = stride
+
+    def sample(self, rng):
+        rank = bisect.bisect(self.cum_weights, rng.random() * self.total)
+        return (min(rank, self.n - 1) * self.stride) % self.n + 1
+
+
+def _gcd(a, b):
+    while b:
+        a, b = b, a % b
+    return a
+
+
+class BurstyClock:
+    """生成带突发的时间戳：按小时的日内高峰，外加少数促销日订单量翻数倍"""
+
+    def __init__(self, seed, days):
+        promo_days = {stable_hash(seed, _HASH_PROMO_DAYS, n) % days for n in range(max(1, days // 15))}
+        self.cum_day_weights = list(itertools.accumulate(5 if d in promo_days else 1 for d in range(days)))
+        self.cum_hour_weights = list(itertools.accumulate(HOUR_WEIGHTS))
+
+    def sample(self, rng):
+        day = bisect.bisect(self.cum_day_weights, rng.random() * self.cum_day_weights[-1])
+        hour = bisect.bisect(self.cum_hour_weights, rng.random() * self.cum_hour_weights[-1])
+        return WORKLOAD_START + datetime.timedelta(days=day, hours=hour, seconds=rng.randrange(3600))
+
+
+def make_user(rng, user_id, seed):
+    name, phone, _ = user_contact(seed, user_id)
+    return {
+        'id': user_id,
+        'email': f"user{user_id}@example.com",
+        'password': DEFAULT_PASSWORD_HASH,
+        'name': name,
+        'phone': phone,
+        'role': 'user',
+        'created_at': format_time(WORKLOAD_START - datetime.timedelta(seconds=rng.randrange(365 * 86400))),
+    }
+
+
+def make_address(rng, user_id, seed):
+    _, _, address = user_contact(seed, user_id)
+    return {'id': user_id, 'user_id': user_id, **address, 'is_default': True}
+
+
+def make_diet_profile(rng, user_id, seed):
+    gender = rng.choice(['male', 'female', 'other'])
+    height = rng.randint(165, 190) if gender == 'male' else rng.randint(150, 178)
+    return {
+        'id': user_id,
+        'user_id': user_id,
+        'age': rng.randint(18, 70),
+        'gender': gender,
+        'height': height,
+        'weight': max(40, height - 105 + rng.randint(-15, 20)),
+        'activity_level': rng.choice(['low', 'moderate', 'high']),
+        'health_goals': rng.sample(HEALTH_GOALS, rng.randint(1, 3)),
+        'dietary_restrictions': rng.sample(DIETARY_RESTRICTIONS, rng.randint(0, 2)),
+        'preferred_cuisines': rng.sample(CUISINES, rng.randint(1, 3)),
+        'allergies': rng.choice(ALLERGIES),
+        'calorie_target': rng.randrange(1400, 2800, 50),
+    }
+
+
+def make_order(rng, order_no, seed, user_count, packages, clock):
+    user_id = rng.randint(1, user_count)
+    package_id = packages.sample(rng)
+    quantity = rng.choices([1, 2, 3], [80, 15, 5])[0]
+    status = rng.choices(ORDER_STATUSES, ORDER_STATUS_WEIGHTS)[0]
+    created = clock.sample(rng)
+    paid = status not in ('pending_payment', 'cancelled')
+    name, phone, address = user_contact(seed, user_id)
+    return {
+        'id': f"ORD{epoch_ms(created)}{order_no:09d}",
+        'user_id': user_id,
+        'package_id': package_id,
+        'quantity': quantity,
+        'total_amount': package_price(seed, package_id) * quantity,
+        'status': status,
+        'payment_method': rng.choice(PAYMENT_METHODS) if paid else None,
+        'payment_time': format_time(created + datetime.timedelta(seconds=rng.randrange(30, 900))) if paid else None,
+        'delivery_address': address,
+        'contact_name': name,
+        'contact_phone': phone,
+        'remark': rng.choice(ORDER_REMARKS),
+        'created_at': format_time(created),
+    }
+
+
+def make_subscription(rng, sub_no, seed, user_count, packages, clock):
+    user_id = rng.randint(1, user_count)
+    package_id = packages.sample(rng)
+    quantity = rng.choices([1, 2], [85, 15])[0]
+    frequency = rng.choices(list(FREQUENCY_DAYS), FREQUENCY_WEIGHTS)[0]
+    status = rng.choices(SUBSCRIPTION_STATUSES, SUBSCRIPTION_STATUS_WEIGHTS)[0]
+    start = clock.sample(rng)
+    next_delivery = start + datetime.timedelta(days=FREQUENCY_DAYS[frequency])
+    name, phone, address = user_contact(seed, user_id)
+    return {
+        'id': f"SUB{epoch_ms(start)}{sub_no:09d}",
+        'user_id': user_id,
+        'package_id': package_id,
+        'frequency': frequency,
+        'quantity': quantity,
+        'total_amount': package_price(seed, package_id) * quantity,
+        'status': status,
+        'start_date': format_time(start),
+        'next_delivery_date': format_time(next_delivery) if status == 'active' else None,
+        'delivery_address': address,
+        'contact_name': name,
+        'contact_phone': phone,
+        'created_at': format_time(start),
+    }
+
+
+# 表名 -> 输出列
+TABLE_COLUMNS = {
+    'food_packages': PACKAGE_COLUMNS,
+    'users': USER_COLUMNS,
+    'addresses': ADDRESS_COLUMNS,
+    'diet_profiles': DIET_PROFILE_COLUMNS,
+    'orders': ORDER_COLUMNS,
+    'subscriptions': SUBSCRIPTION_COLUMNS,
+}
+
+
+def generate_table(table, count, start_id=1, seed=42, user_count=1000, package_count=1000, days=90):
+    """惰性生成指定表的记录
+
+    user_id / package_id 只引用 [1, user_count] / [1, package_count]，
+    只要用同一个 seed 生成 users 和 food_packages，外键与金额就是一致的。
+    """
+    stop_id = start_id + count
+    if table == 'food_packages':
+        return generate_packages(count, start_id, seed)
+    if table == 'users':
+        make_row = lambda rng, n: make_user(rng, n, seed)
+    elif table == 'addresses':
+        make_row = lambda rng, n: make_address(rng, n, seed)
+    elif table == 'diet_profiles':
+        make_row = lambda rng, n: make_diet_profile(rng, n, seed)
+    elif table in ('orders', 'subscriptions'):
+        packages = ZipfSampler(package_count)
+        clock = BurstyClock(seed, days)
+        make = make_order if table == 'orders' else make_subscription
+        make_row = lambda rng, n: make(rng, n, seed, user_count, packages, clock)
+    else:
+        raise ValueError(f"不支持的表: {table}")
+    return iter_chunked(table, start_id, stop_id, seed, make_row)
+
+
+# ==================== 数据校验 ====================
+
+# 各表 ENUM 列的取值（与 backend/db/init-mysql.js 保持一致）
+ENUM_VALUES = {
+    'food_packages': {
+        'level': ('basic', 'intermediate', 'advanced'),
+        'status': ('active', 'inactive', 'sold_out'),
+        'difficulty': ('easy', 'medium', 'hard'),
+    },
+    'users': {'role': ('admin', 'merchant', 'user')},
+    'orders': {'status': tuple(ORDER_STATUSES)},
+    'subscriptions': {
+        'frequency': tuple(FREQUENCY_DAYS),
+        'status': tuple(SUBSCRIPTION_STATUSES),
+    },
+    'diet_profiles': {
+        'gender': ('male', 'female', 'other'),
+        'activity_level': ('low', 'moderate', 'high'),
+    },
+    'addresses': {},
+}
+# 必须为正数的金额 / 数量列（值为 None 时跳过）
+POSITIVE_COLUMNS = {
+    'food_packages': ('price', 'original_price'),
+    'orders': ('total_amount', 'quantity'),
+    'subscriptions': ('total_amount', 'quantity'),
+}
+
+
+class ValidationError(ValueError):
+    """种子数据不满足表结构约束"""
+
+
+def _check_ingredient_ids(pkg):
+    ids = [item['id'] for item in pkg['ingredients']]
+    if len(set(ids)) != len(ids):
+        return 'ingredients 中存在重复的食材 id'
+
+
+def _check_recipe_steps(pkg):
+    for recipe in pkg['recipes']:
+        orders = [step['order'] for step in recipe['steps']]
+        if orders != list(range(1, len(orders) + 1)):
+            return f"菜谱 {recipe['id']} 的步骤序号应为 1..{len(orders)}，实际为 {orders}"
+
+
+def compile_validator(table):
+    """按表结构预先生成校验函数列表，返回 validate(record) -> 错误信息列表
+
+    每个检查都是绑定好列名和取值集合的闭包，校验一条记录只需依次调用，
+    不做逐字段的类型反射，足以在批量生成时常开。
+    """
+    checks = []
+    for column, values in ENUM_VALUES[table].items():
+        allowed = frozenset(values)
+
+        def check_enum(record, column=column, allowed=allowed):
+            value = record.get(column)
+            if value is not None and value not in allowed:
+                return f"{column}={value!r} 不在 ENUM{tuple(sorted(allowed))} 中"
+        checks.append(check_enum)
+
+    for column in POSITIVE_COLUMNS.get(table, ()):
+        def check_positive(record, column=column):
+            value = record.get(column)
+            if value is not None and not value > 0:
+                return f"{column}={value!r} 必须大于 0"
+        checks.append(check_positive)
+
+    if table == 'food_packages':
+        checks.extend([_check_ingredient_ids, _check_recipe_steps])
+
+    def validate(record):
+        errors = []
+        for check in checks:
+            error = check(record)
+            if error:
+                errors.append(error)
+        return errors
+
+    return validate
+
+
+def validate_records(table, records):
+    """边生成边校验，遇到第一条非法记录即抛出 ValidationError，避免导入到一半才失败"""
+    validate = compile_validator(table)
+    for record in records:
+        errors = validate(record)
+        if errors:
+            raise ValidationError(f"{table} id={record.get('id')}: {'; '.join(errors)}")
+        yield record
+
+
+# ==================== 输出格式 ====================
+
+# MySQL 单引号字符串字面量需要转义的字符（反斜杠必须最先处理）
+_SQL_ESCAPES = [('\\', '\\\\'), ("'", "\\'"), ('\0', '\\0'), ('\n', '\\n'), ('\r', '\\r'), ('\x1a', '\\Z')]
+# LOAD DATA 默认格式（FIELDS ESCAPED BY '\\'）需要转义的字符
+_TSV_ESCAPES = [('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r'), ('\0', '\\0')]
+
+
+def _escape(text, escapes):
+    """逐个替换特殊字符；绝大多数字段不含特殊字符，in 判断比 str.translate 快得多"""
+    for char, replacement in escapes:
+        if char in text:
+            text = text.replace(char, replacement)
+    return text
+
+
+def sql_literal(value):
+    """把 Python 值转换为 SQL 字面量"""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + _escape(str(value), _SQL_ESCAPES) + "'"
+
+
+def tsv_field(value):
+    """把 Python 值转换为 LOAD DATA INFILE 可直接读取的字段"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return _escape(str(value), _TSV_ESCAPES)
+
+
+def insert_statement(table, columns, rows, upsert=False):
+    """多行 INSERT 语句；upsert 为 True 时主键冲突改为更新除 id 外的所有列"""
+    sql = (f"INSERT INTO `{table}` ({', '.join(f'`{c}`' for c in columns)}) VALUES\n"
+           + ',\n'.join('(' + ', '.join(map(sql_literal, row)) + ')' for row in rows))
+    if upsert:
+        sql += '\nON DUPLICATE KEY UPDATE ' + ', '.join(
+            f"`{c}` = VALUES(`{c}`)" for c in columns if c != 'id'
+        )
+    return sql + ';\n'
+
+
+def write_sql(rows, out, table, columns, batch_size=1000):
+    """以多行 INSERT 语句输出，每 batch_size 行一条语句，返回写出的行数"""
+    total = 0
+    for batch in batched(rows, batch_size):
+        out.write(insert_statement(table, columns, batch))
+        total += len(batch)
+    return total
+
+
+def write_tsv(rows, out):
+    """以制表符分隔格式输出（每行一条记录），返回写出的行数"""
+    total = 0
+    for row in rows:
+        out.write('\t'.join(map(tsv_field, row)) + '\n')
+        total += 1
+    return total
+
+
+def load_data_statement(table, columns, path):
+    """返回导入 write_tsv 输出文件所需的 LOAD DATA 语句"""
+    return (
+        f"LOAD DATA LOCAL INFILE {sql_literal(path)} INTO TABLE `{table}` "
+        f"CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+        f"LINES TERMINATED BY '\\n' ({', '.join(f'`{c}`' for c in columns)});"
+    )
+
+
+def open_output(path):
+    """打开输出文件，'-' 表示标准输出"""
+    if path == '-':
+        return sys.stdout
+    return open(path, 'w', encoding='utf-8', newline='\n', buffering=1 << 20)
+
+
+def write_rows(table, records, out, fmt, batch_size):
+    """按 fmt 把记录写入 out，返回行数"""
+    columns = TABLE_COLUMNS[table]
+    rows = (to_row(record, columns) for record in records)
+    if fmt == 'sql':
+        return write_sql(rows, out, table, columns, batch_size)
+    return write_tsv(rows, out)
+
+
+# ==================== 多进程分片生成 ====================
+
+def split_id_range(start_id, count, parts):
+    """把 [start_id, start_id + count) 切成最多 parts 段，边界对齐到 CHUNK_ROWS
+
+    对齐后每段都从完整分块开始生成，不会为了对齐随机序列重复生成前面的行。
+    """
+    stop_id = start_id + count
+    chunks = (count + CHUNK_ROWS - 1) // CHUNK_ROWS
+    per_part = max(1, (chunks + parts - 1) // parts)
+    ranges = []
+    lo = start_id
+    while lo < stop_id:
+        hi = min(((lo - 1) // CHUNK_ROWS + per_part) * CHUNK_ROWS + 1, stop_id)
+        ranges.append((lo, hi))
+        lo = hi
+    return ranges
+
+
+def write_shard(task):
+    """子进程入口：生成一段 ID 区间并写入独立的分片文件"""
+    started = time.monotonic()
+    records = generate_table(
+        task['table'], task['stop_id'] - task['start_id'], task['start_id'], task['seed'],
+        task['user_count'], task['package_count'], task['days'],
+    )
+    if task['validate']:
+        records = validate_records(task['table'], records)
+    with open_output(task['path']) as out:
+        rows = write_rows(task['table'], records, out, task['format'], task['batch_size'])
+    return {
+        'file': os.path.basename(task['path']),
+        'start_id': task['start_id'],
+        'stop_id': task['stop_id'],
+        'rows': rows,
+        'bytes': os.path.getsize(task['path']),
+        'seconds': round(time.monotonic() - started, 3),
+    }
+
+
+def generate_sharded(table, count, out_dir, workers, fmt='tsv', start_id=1, seed=42,
+                     user_count=1000, package_count=1000, days=90, batch_size=1000, validate=True):
+    """用进程池并行生成，每个进程写一个分片文件，最后写出 manifest.json
+
+    每段的数据只取决于 seed 和 ID，所以分片内容与 workers 数量无关，
+    合并后与单进程输出完全一致。返回 manifest 字典。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    ext = 'sql' if fmt == 'sql' else 'tsv'
+    tasks = [
+        {
+            'table': table, 'start_id': lo, 'stop_id': hi, 'seed': seed, 'format': fmt,
+            'user_count': user_count, 'package_count': package_count, 'days': days,
+            'batch_size': batch_size, 'validate': validate,
+            'path': os.path.join(out_dir, f"{table}-{n:04d}.{ext}"),
+        }
+        for n, (lo, hi) in enumerate(split_id_range(start_id, count, workers))
+    ]
+
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        shards = list(pool.map(write_shard, tasks))
+    elapsed = time.monotonic() - started
+
+    columns = TABLE_COLUMNS[table]
+    if fmt == 'tsv':
+        for shard in shards:
+            shard['load_statement'] = load_data_statement(table, columns, os.path.join(out_dir, shard['file']))
+    manifest = {
+        'table': table,
+        'format': fmt,
+        'columns': columns,
+        'seed': seed,
+        'start_id': start_id,
+        'count': count,
+        'workers': workers,
+        'seconds': round(elapsed, 3),
+        'shards': shards,
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+# ==================== 列式导出 (Parquet / Arrow IPC) ====================
+
+# 每个列式批次（Parquet row group / IPC record batch）包含的食材包数量
+COLUMNAR_BATCH_PACKAGES = 50000
+PACKAGE_STATUSES = ['active', 'inactive', 'sold_out']
+_GRAMS_IN_UNIT_RE = re.compile(r'约([\d.]+)\s*(kg|g)')
+
+
+def ingredient_grams(quantity, unit):
+    """把食材用量折算为克，无法折算（如“个”“根”）时返回 None"""
+    if unit == 'g':
+        return float(quantity)
+    if unit == 'kg':
+        return quantity * 1000.0
+    match = _GRAMS_IN_UNIT_RE.search(unit)
+    if match:
+        # 形如“只(约1.5kg)”“支(约10g)”
+        grams = float(match.group(1)) * (1000 if match.group(2) == 'kg' else 1)
+        return quantity * grams
+    return None
+
+
+class _Dictionary:
+    """固定的字典编码表：合成数据只从素材池取值，所有批次共用同一份字典，IPC 文件格式也能写"""
+
+    def __init__(self, values):
+        self.values = list(dict.fromkeys(values))
+        self.index = {v: i for i, v in enumerate(self.values)}
+
+    def encode(self, value):
+        if value not in self.index:
+            self.index[value] = len(self.values)
+            self.values.append(value)
+        return self.index[value]
+
+
+def _columnar_tables(pa):
+    """返回 {表名: (schema, 列 -> 字典编码表)}"""
+    def dict_type():
+        return pa.dictionary(pa.int32(), pa.string())
+
+    dicts = {
+        'packages': {
+            'level': _Dictionary(LEVELS),
+            'status': _Dictionary(PACKAGE_STATUSES),
+        },
+        'ingredients': {
+            'name': _Dictionary(i['name'] for i in INGREDIENT_POOL),
+            'category': _Dictionary(i['category'] for i in INGREDIENT_POOL),
+            'unit': _Dictionary(i['unit'] for i in INGREDIENT_POOL),
+            'origin': _Dictionary(i['origin'] for i in INGREDIENT_POOL),
+        },
+        'recipe_steps': {},
+        'nutrition': {},
+    }
+    schemas = {
+        'packages': pa.schema([
+            ('id', pa.int64()), ('name', pa.string()), ('level', dict_type()),
+            ('price', pa.float64()), ('original_price', pa.float64()),
+            ('tags', pa.list_(pa.string())), ('is_limited', pa.bool_()),
+            ('stock_quantity', pa.int32()), ('merchant_id', pa.int32()), ('status', dict_type()),
+        ]),
+        'ingredients': pa.schema([
+            ('package_id', pa.int64()), ('ingredient_id', pa.string()), ('name', dict_type()),
+            ('category', dict_type()), ('quantity', pa.float64()), ('unit', dict_type()),
+            ('origin', dict_type()), ('grams', pa.float64()),
+        ]),
+        'recipe_steps': pa.schema([
+            ('package_id', pa.int64()), ('recipe_id', pa.string()), ('step_order', pa.int16()),
+            ('description', pa.string()), ('duration', pa.int32()),
+        ]),
+        'nutrition': pa.schema([
+            ('package_id', pa.int64()), ('calories', pa.int32()), ('protein', pa.int32()),
+            ('carbs', pa.int32()), ('fat', pa.int32()), ('fiber', pa.int32()),
+        ]),
+    }
+    return {name: (schemas[name], dicts[name]) for name in schemas}
+
+
+def flatten_packages(packages):
+    """把一批嵌套的食材包拆成四张表的列（dict: 表名 -> {列名: list}）"""
+    cols = {
+        'packages': {k: [] for k in ['id', 'name', 'level', 'price', 'original_price', 'tags',
+                                     'is_limited', 'stock_quantity', 'merchant_id', 'status']},
+        'ingredients': {k: [] for k in ['package_id', 'ingredient_id', 'name', 'category',
+                                        'quantity', 'unit', 'origin', 'grams']},
+        'recipe_steps': {k: [] for k in ['package_id', 'recipe_id', 'step_order', 'description', 'duration']},
+        'nutrition': {k: [] for k in ['package_id', 'calories', 'protein', 'carbs', 'fat', 'fiber']},
+    }
+    p, ing, step, nut = cols['packages'], cols['ingredients'], cols['recipe_steps'], cols['nutrition']
+    for pkg in packages:
+        pkg_id = pkg['id']
+        for key in p:
+            p[key].append(pkg[key])
+        for item in pkg['ingredients']:
+            ing['package_id'].append(pkg_id)
+            ing['ingredient_id'].append(item['id'])
+            ing['name'].append(item['name'])
+            ing['category'].append(item['category'])
+            ing['quantity'].append(float(item['quantity']))
+            ing['unit'].append(item['unit'])
+            ing['origin'].append(item['origin'])
+            ing['grams'].append(ingredient_grams(item['quantity'], item['unit']))
+        for recipe in pkg['recipes']:
+            for s in recipe['steps']:
+                step['package_id'].append(pkg_id)
+                step['recipe_id'].append(recipe['id'])
+                step['step_order'].append(s['order'])
+                step['description'].append(s['description'])
+                step['duration'].append(s['duration'])
+        nut['package_id'].append(pkg_id)
+        for key in ('calories', 'protein', 'carbs', 'fat', 'fiber'):
+            nut[key].append(pkg['nutrition_info'].get(key))
+    return cols
+
+
+def export_columnar(packages, out_dir, fmt='parquet'):
+    """把食材包目录拆成 packages / ingredients / recipe_steps / nutrition 四张列式表
+
+    fmt 为 'parquet' 或 'arrow'（Arrow IPC 文件）。按 COLUMNAR_BATCH_PACKAGES 分批写出，
+    内存只与批大小有关。分类、产地等低基数列使用字典编码，例如按产地统计菌菇总克数:
+
+        t = pq.read_table('ingredients.parquet', columns=['category', 'origin', 'grams'])
+        t.filter(pc.equal(t['category'], '菌菇')).group_by('origin').aggregate([('grams', 'sum')])
+
+    返回 {表名: 行数}。
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("❌ 需要安装 pyarrow: pip install pyarrow")
+        sys.exit(1)
+
+    os.makedirs(out_dir, exist_ok=True)
+    tables = _columnar_tables(pa)
+    writers = {}
+    counts = {name: 0 for name in tables}
+
+    def to_batch(name, columns):
+        schema, dicts = tables[name]
+        arrays = []
+        for field in schema:
+            values = columns[field.name]
+            if field.name in dicts:
+                encoder = dicts[field.name]
+                indices = pa.array([encoder.encode(v) for v in values], type=pa.int32())
+                arrays.append(pa.DictionaryArray.from_arrays(indices, pa.array(encoder.values, pa.string())))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    try:
+        for chunk in batched(packages, COLUMNAR_BATCH_PACKAGES):
+            for name, columns in flatten_packages(chunk).items():
+                batch = to_batch(name, columns)
+                if name not in writers:
+                    path = os.path.join(out_dir, f"{name}.{'parquet' if fmt == 'parquet' else 'arrow'}")
+                    if fmt == 'parquet':
+                        writers[name] = pq.ParquetWriter(path, tables[name][0], compression='zstd')
+                    else:
+                        writers[name] = pa.ipc.new_file(path, tables[name][0])
+                if fmt == 'parquet':
+                    writers[name].write_table(pa.Table.from_batches([batch]))
+                else:
+                    writers[name].write_batch(batch)
+                counts[name] += batch.num_rows
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return counts
+
+
+def batched(items, size):
+    """把可迭代对象切成长度不超过 size 的列表"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ==================== 增量更新 ====================
+
+def package_fingerprint(pkg):
+    """食材包内容指纹：规范化（键排序、紧凑）JSON 的 blake2b 摘要"""
+    normalized = json.dumps(
+        {col: pkg[col] for col in PACKAGE_COLUMNS},
+        ensure_ascii=False, sort_keys=True, separators=(',', ':'),
+    )
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def read_fingerprints(path):
+    """按 ID 升序读取上一次运行的指纹清单（每行 'id\t指纹'），文件不存在视为空目录"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            pkg_id, digest = line.rstrip('\n').split('\t')
+            yield int(pkg_id), digest
+
+
+def write_catalog_diff(packages, manifest_path, out, batch_size=1000):
+    """与上一次的指纹清单对比，只输出变化的食材包
+
+    新增的食材包输出 INSERT，内容变化的输出 INSERT ... ON DUPLICATE KEY UPDATE（批量更新），
+    消失的输出 DELETE。packages 和清单都按 ID 升序，以归并方式对比，内存与目录大小无关。
+    新清单先写入临时文件，全部输出完成后再替换旧清单。返回各类变更的数量。
+    """
+    table = 'food_packages'
+    counts = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    pending = {'inserted': [], 'updated': [], 'deleted': []}
+
+    def flush(kind):
+        rows = pending[kind]
+        if not rows:
+            return
+        if kind == 'deleted':
+            out.write(f"DELETE FROM `{table}` WHERE `id` IN ({', '.join(map(str, rows))});\n")
+        else:
+            out.write(insert_statement(table, PACKAGE_COLUMNS, rows, upsert=(kind == 'updated')))
+        counts[kind] += len(rows)
+        pending[kind] = []
+
+    def record(kind, item):
+        pending[kind].append(item)
+        if len(pending[kind]) >= batch_size:
+            flush(kind)
+
+    old = read_fingerprints(manifest_path)
+    old_entry = next(old, None)
+    last_id = None
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='\n', buffering=1 << 20) as manifest:
+        for pkg in packages:
+            pkg_id = pkg['id']
+            if last_id is not None and pkg_id <= last_id:
+                raise ValueError(f"食材包 ID 必须严格递增: {last_id} -> {pkg_id}")
+            last_id = pkg_id
+
+            while old_entry is not None and old_entry[0] < pkg_id:
+                record('deleted', old_entry[0])
+                old_entry = next(old, None)
+
+            digest = package_fingerprint(pkg)
+            manifest.write(f"{pkg_id}\t{digest}\n")
+            if old_entry is not None and old_entry[0] == pkg_id:
+                if old_entry[1] == digest:
+                    counts['unchanged'] += 1
+                else:
+                    record('updated', package_row(pkg))
+                old_entry = next(old, None)
+            else:
+                record('inserted', package_row(pkg))
+
+        while old_entry is not None:
+            record('deleted', old_entry[0])
+            old_entry = next(old, None)
+
+    for kind in pending:
+        flush(kind)
+    os.replace(tmp_path, manifest_path)
+    return counts
+
+
+def print_demo_sql():
+    """输出演示食材包的 SQL 值列表（可直接粘贴到 init-mysql.js 的 INSERT 中）"""
+    print("-- 新增食材包数据")
+    for pkg in food_packages:
+        print('(' + ', '.join(map(sql_literal, package_row(pkg))) + '),')
+    print(f"\n共生成 {len(food_packages)} 个食材包")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成食材包种子数据')
+    parser.add_argument('--table', choices=list(TABLE_COLUMNS), default='food_packages', help='要生成的表')
+    parser.add_argument('--count', type=int,
+                        help='生成行数（不指定时：food_packages 输出演示数据，addresses/diet_profiles 每个用户一行）')
+    parser.add_argument('--start-id', type=int, default=1, help='起始 ID（默认 1）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子，相同种子生成相同数据')
+    parser.add_argument('--format', choices=['sql', 'tsv', 'parquet', 'arrow'], default='sql',
+                        help='输出格式；parquet/arrow 仅用于 food_packages，按列式拆表输出到 -o 目录')
+    parser.add_argument('--users', type=int, default=1000, help='用户总数（外键引用范围）')
+    parser.add_argument('--packages', type=int, default=1000, help='食材包总数（外键引用范围）')
+    parser.add_argument('--days', type=int, default=90, help='订单/订阅时间跨度（天）')
+    parser.add_argument('--batch-size', type=int, default=1000, help='每条 INSERT 包含的行数')
+    parser.add_argument('-o', '--output', default='-',
+                        help="输出文件（默认 '-' 标准输出）；--workers 大于 1 时为分片输出目录")
+    parser.add_argument('--workers', type=int, default=1, help='并行生成的进程数，每个进程写一个分片')
+    parser.add_argument('--no-validate', action='store_true', help='跳过按表结构校验记录')
+    parser.add_argument('--diff-manifest',
+                        help='增量模式：与该指纹清单对比，只输出变化食材包的 INSERT/UPDATE/DELETE，并更新清单')
+    args = parser.parse_args()
+
+    count = args.count
+    if args.format in ('parquet', 'arrow'):
+        if args.table != 'food_packages' or args.output == '-' or args.workers > 1:
+            parser.error('列式导出只支持 food_packages 单进程输出，并需要用 -o 指定目录')
+        packages = food_packages if count is None else generate_packages(count, args.start_id, args.seed)
+        if not args.no_validate:
+            packages = validate_records('food_packages', packages)
+        started = time.monotonic()
+        counts = export_columnar(packages, args.output, args.format)
+        summary = '，'.join(f"{name} {rows} 行" for name, rows in counts.items())
+        print(f"已导出到 {args.output}: {summary}（{time.monotonic() - started:.1f}s）", file=sys.stderr)
+        return
+
+    if args.diff_manifest:
+        if args.table != 'food_packages' or args.format != 'sql' or args.workers > 1:
+            parser.error('增量模式只支持 food_packages 单进程 SQL 输出')
+        packages = food_packages if count is None else generate_packages(count, args.start_id, args.seed)
+        if not args.no_validate:
+            packages = validate_records('food_packages', packages)
+        out = open_output(args.output)
+        try:
+            counts = write_catalog_diff(packages, args.diff_manifest, out, args.batch_size)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(f"新增 {counts['inserted']}，更新 {counts['updated']}，删除 {counts['deleted']}，"
+              f"未变化 {counts['unchanged']}", file=sys.stderr)
+        return
+
+    if count is None:
+        if args.table == 'food_packages':
+            print_demo_sql()
+            return
+        if args.table in ('addresses', 'diet_profiles', 'users'):
+            count = args.users
+        else:
+            parser.error(f"生成 {args.table} 需要指定 --count")
+
+    if args.workers > 1:
+        if args.output == '-':
+            parser.error('--workers 大于 1 时需要用 -o 指定输出目录')
+        manifest = generate_sharded(
+            args.table, count, args.output, args.workers, args.format, args.start_id, args.seed,
+            args.users, args.packages, args.days, args.batch_size, not args.no_validate,
+        )
+        total = sum(shard['rows'] for shard in manifest['shards'])
+        print(f"共生成 {total} 行 {args.table}，{len(manifest['shards'])} 个分片，"
+              f"耗时 {manifest['seconds']:.1f}s（{total / max(manifest['seconds'], 1e-9):.0f} 行/秒）", file=sys.stderr)
+        print(f"清单: {os.path.join(args.output, 'manifest.json')}", file=sys.stderr)
+        return
+
+    columns = TABLE_COLUMNS[args.table]
+    records = generate_table(args.table, count, args.start_id, args.seed, args.users, args.packages, args.days)
+    if not args.no_validate:
+        records = validate_records(args.table, records)
+    out = open_output(args.output)
+    try:
+        total = write_rows(args.table, records, out, args.format, args.batch_size)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"共生成 {total} 行 {args.table}", file=sys.stderr)
+    if args.format == 'tsv' and args.output != '-':
+        print(f"导入: {load_data_statement(args.table, columns, args.output)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except ValidationError as e:
+        print(f"❌ 数据校验失败: {e}", file=sys.stderr)
+        sys.exit(1)
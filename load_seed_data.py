@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+种子数据批量导入工具
+把 generate_food_data.py 生成的数据批量写入 init-mysql.js 建好的表中
+
+用法:
+  # 直接生成并导入（不落地中间文件）
+  python3 load_seed_data.py --table food_packages --count 100000
+  # 导入 --workers 生成的 TSV 分片（MySQL 下使用 LOAD DATA，多连接并行）
+  python3 load_seed_data.py --manifest seed/packages/manifest.json --jobs 4
+  # 使用 SQLite 代替 MySQL 做本地测试
+  python3 load_seed_data.py --sqlite /tmp/seed.db --table orders --count 50000
+
+MySQL 连接参数读取 DB_HOST / DB_USER / DB_PASSWORD / DB_NAME 环境变量，默认值与 init-mysql.js 相同。
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import generate_food_data as gen
+
+# 导入期间临时删除、导入后重建的二级索引（与 init-mysql.js 一致；唯一索引保留，用于校验数据）
+SECONDARY_INDEXES = {
+    'users': {'idx_role': ['role']},
+    'food_packages': {'idx_level': ['level'], 'idx_status': ['status'], 'idx_merchant': ['merchant_id']},
+    'orders': {'idx_user_id': ['user_id'], 'idx_status': ['status'], 'idx_created_at': ['created_at']},
+    'subscriptions': {'idx_user_id': ['user_id'], 'idx_status': ['status']},
+    'diet_profiles': {'idx_user_id': ['user_id']},
+    'addresses': {'idx_user_id': ['user_id']},
+}
+
+SQLITE_NUMERIC_COLUMNS = {
+    'id', 'user_id', 'package_id', 'merchant_id', 'price', 'original_price', 'total_amount',
+    'quantity', 'stock_quantity', 'is_limited', 'is_default', 'age', 'height', 'weight', 'calorie_target',
+}
+
+_TSV_UNESCAPES = {'\\': '\\', 't': '\t', 'n': '\n', 'r': '\r', '0': '\0'}
+_TSV_ESCAPE_RE = re.compile(r'\\(.)')
+
+
+def parse_tsv_field(field):
+    """tsv_field 的逆操作"""
+    if field == '\\N':
+        return None
+    if '\\' not in field:
+        return field
+    return _TSV_ESCAPE_RE.sub(lambda m: _TSV_UNESCAPES.get(m.group(1), m.group(1)), field)
+
+
+def read_tsv(path):
+    """逐行读取 TSV 分片，产出值元组"""
+    with open(path, 'r', encoding='utf-8', newline='\n') as f:
+        for line in f:
+            yield tuple(parse_tsv_field(field) for field in line.rstrip('\n').split('\t'))
+
+
+class Progress:
+    """线程安全的行数统计，定期打印导入速率"""
+
+    def __init__(self, table, interval=5.0):
+        self.table = table
+        self.interval = interval
+        self.rows = 0
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.lock = threading.Lock()
+
+    def add(self, rows):
+        with self.lock:
+            self.rows += rows
+            now = time.monotonic()
+            if now - self.last_report >= self.interval:
+                self.last_report = now
+                print(f"  {self.table}: {self.rows} 行，{self.rate():.0f} 行/秒")
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def rate(self):
+        return self.rows / max(self.elapsed(), 1e-9)
+
+
+class MySQLTarget:
+    """MySQL / MariaDB 目标库（需要 pymysql）"""
+
+    placeholder = '%s'
+    supports_load_data = True
+    supports_parallel = True
+
+    def __init__(self):
+        try:
+            import pymysql
+        except ImportError:
+            print("❌ 需要安装 pymysql: pip install pymysql")
+            sys.exit(1)
+        self.pymysql = pymysql
+        self.conn = self.connect()
+
+    def connect(self):
+        return self.pymysql.connect(
+            host=os.environ.get('DB_HOST', 'localhost'),
+            user=os.environ.get('DB_USER', 'food_user'),
+            password=os.environ.get('DB_PASSWORD', 'food123456'),
+            database=os.environ.get('DB_NAME', 'food_subscription'),
+            charset='utf8mb4',
+            autocommit=False,
+            local_infile=True,
+        )
+
+    def session(self):
+        """为并行导入创建独立连接，关闭唯一性和外键检查"""
+        conn = self.connect()
+        with conn.cursor() as cur:
+            cur.execute("SET unique_checks = 0")
+            cur.execute("SET foreign_key_checks = 0")
+        return conn
+
+    def existing_indexes(self, table):
+        with self.conn.cursor() as cur:
+            cur.execute(f"SHOW INDEX FROM `{table}`")
+            return {row[2] for row in cur.fetchall()}
+
+    def drop_indexes(self, table, names):
+        present = [name for name in names if name in self.existing_indexes(table)]
+        if present:
+            with self.conn.cursor() as cur:
+                cur.execute(f"ALTER TABLE `{table}` " + ', '.join(f"DROP INDEX `{n}`" for n in present))
+        return present
+
+    def create_indexes(self, table, indexes):
+        # 一条 ALTER TABLE 同时建所有索引，只需扫描一遍表
+        with self.conn.cursor() as cur:
+            cur.execute(f"ALTER TABLE `{table}` " + ', '.join(
+                f"ADD INDEX `{name}` ({', '.join(f'`{c}`' for c in cols)})" for name, cols in indexes.items()
+            ))
+
+    def load_file(self, conn, table, columns, path):
+        with conn.cursor() as cur:
+            rows = cur.execute(gen.load_data_statement(table, columns, os.path.abspath(path)))
+        conn.commit()
+        return rows
+
+
+class SQLiteTarget:
+    """SQLite 替身，用于在没有 MySQL 的环境中测试导入流程"""
+
+    placeholder = '?'
+    supports_load_data = False
+    supports_parallel = False
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+
+    def session(self):
+        return self.conn
+
+    def ensure_table(self, table, columns):
+        # 数值列声明 NUMERIC 亲和性，TSV 读出的 '1' 与直接生成的 1 才能相等
+        cols = ', '.join(
+            f'"{c}"' + (' NUMERIC' if c in SQLITE_NUMERIC_COLUMNS else '') + (' PRIMARY KEY' if c == 'id' else '')
+            for c in columns
+        )
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({cols})')
+        self.create_indexes(table, SECONDARY_INDEXES.get(table, {}))
+
+    def drop_indexes(self, table, names):
+        for name in names:
+            self.conn.execute(f'DROP INDEX IF EXISTS "{table}_{name}"')
+        return list(names)
+
+    def create_indexes(self, table, indexes):
+        for name, cols in indexes.items():
+            self.conn.execute(
+                f'CREATE INDEX IF NOT EXISTS "{table}_{name}" ON "{table}" ({", ".join(cols)})'
+            )
+
+
+def insert_batches(target, conn, table, columns, rows, batch_size, progress):
+    """executemany 分批插入，每批提交一次"""
+    sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+           f"VALUES ({', '.join([target.placeholder] * len(columns))})")
+    total = 0
+    cur = conn.cursor()
+    for batch in gen.batched(rows, batch_size):
+        cur.executemany(sql, batch)
+        conn.commit()
+        total += len(batch)
+        progress.add(len(batch))
+    cur.close()
+    return total
+
+
+def load_table(target, table, columns, sources, method='insert', batch_size=2000, jobs=1, keep_indexes=False):
+    """导入一张表
+
+    sources 是若干个数据源，每个要么是 TSV 文件路径，要么是值元组的可迭代对象；
+    多个数据源可在 jobs 个连接上并行导入。
+    """
+    print(f"\n导入 {table}（{len(sources)} 个数据源，方式: {method}，并行: {jobs}）")
+    if isinstance(target, SQLiteTarget):
+        target.ensure_table(table, columns)
+
+    indexes = SECONDARY_INDEXES.get(table, {})
+    dropped = [] if keep_indexes else target.drop_indexes(table, list(indexes))
+    if dropped:
+        print(f"  已临时删除二级索引: {', '.join(dropped)}")
+
+    progress = Progress(table)
+
+    def load_source(source):
+        conn = target.session()
+        try:
+            if method == 'load-data':
+                rows = target.load_file(conn, table, columns, source)
+                progress.add(rows)
+                return rows
+            rows = read_tsv(source) if isinstance(source, str) else source
+            return insert_batches(target, conn, table, columns, rows, batch_size, progress)
+        finally:
+            if conn is not target.conn:
+                conn.close()
+
+    index_seconds = 0.0
+    try:
+        if jobs > 1 and len(sources) > 1:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                total = sum(pool.map(load_source, sources))
+        else:
+            total = sum(load_source(source) for source in sources)
+        load_seconds = progress.elapsed()
+    finally:
+        # 导入中途失败（包括边生成边校验抛出的 ValidationError）也要把索引建回来
+        if dropped:
+            started = time.monotonic()
+            target.create_indexes(table, {name: indexes[name] for name in dropped})
+            index_seconds = time.monotonic() - started
+            print(f"  ✓ 索引重建完成，耗时 {index_seconds:.1f}s")
+
+    print(f"  ✓ {table}: {total} 行，导入 {load_seconds:.1f}s（{total / max(load_seconds, 1e-9):.0f} 行/秒）")
+    return {'table': table, 'rows': total, 'load_seconds': load_seconds, 'index_seconds': index_seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量导入种子数据')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--manifest', help='generate_food_data.py --workers 生成的 manifest.json')
+    source.add_argument('--table', choices=list(gen.TABLE_COLUMNS), help='直接生成并导入的表')
+    parser.add_argument('--count', type=int, help='直接生成的行数')
+    parser.add_argument('--start-id', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--packages', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--sqlite', help='导入到 SQLite 文件而不是 MySQL')
+    parser.add_argument('--method', choices=['load-data', 'insert'], default='load-data',
+                        help='TSV 分片的导入方式（SQLite 和直接生成时总是 insert）')
+    parser.add_argument('--batch-size', type=int, default=2000, help='executemany 每批行数')
+    parser.add_argument('--jobs', type=int, default=1, help='并行导入分片的连接数')
+    parser.add_argument('--keep-indexes', action='store_true', help='导入期间不删除二级索引')
+    args = parser.parse_args()
+
+    target = SQLiteTarget(args.sqlite) if args.sqlite else MySQLTarget()
+    jobs = args.jobs if target.supports_parallel else 1
+
+    if args.manifest:
+        with open(args.manifest, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest['format'] != 'tsv':
+            print("❌ 只支持导入 TSV 格式的分片（生成时使用 --format tsv）")
+            sys.exit(1)
+        base_dir = os.path.dirname(os.path.abspath(args.manifest))
+        table = manifest['table']
+        columns = manifest['columns']
+        sources = [os.path.join(base_dir, shard['file']) for shard in manifest['shards']]
+        method = args.method if target.supports_load_data else 'insert'
+    else:
+        table = args.table
+        columns = gen.TABLE_COLUMNS[table]
+        count = args.count if args.count is not None else args.users
+        records = gen.generate_table(table, count, args.start_id, args.seed, args.users, args.packages, args.days)
+        records = gen.validate_records(table, records)
+        sources = [(gen.to_row(record, columns) for record in records)]
+        method = 'insert'
+
+    try:
+        load_table(target, table, columns, sources, method, args.batch_size, jobs, args.keep_indexes)
+    except gen.ValidationError as e:
+        print(f"✗ 数据校验失败: {e}")
+        sys.exit(1)
+    finally:
+        target.conn.close()
+
+
+if __name__ == "__main__":
+    main()
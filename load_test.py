@@ -0,0 +1,619 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后端 API 压测工具
+按目标 RPS 回放真实用户会话（登录 → 浏览 → 下单 → 支付 → 订阅），
+统计每个接口的 p50/p95/p99 延迟和错误率。
+
+两种负载模型:
+  closed  固定数量的虚拟用户循环执行会话（发一个、等一个），服务端变慢时请求速率也随之下降
+  open    会话按到达时刻表（泊松或匀速，恒定/阶梯/斜坡速率）独立到达，不等待前面的请求；
+          延迟从"计划发送时刻"开始计算，排队时间不会被隐藏（避免 coordinated omission）
+
+用法:
+  # 压测已启动的后端
+  python3 load_test.py --url http://localhost:3001 --rps 200 --duration 60
+  # 自动用内存数据库在本地启动后端再压测
+  python3 load_test.py --start-backend --rps 100 --duration 30 --concurrency 50
+  # 开环：每秒 20 个会话按泊松过程到达
+  python3 load_test.py --arrival poisson --rate 20 --duration 60
+  # 开环阶梯：10 → 20 → 40 会话/秒，每档 30 秒
+  python3 load_test.py --arrival poisson --profile step --steps 10,20,40 --duration 90
+  # 开环斜坡：60 秒内从 5 线性升到 50 会话/秒
+  python3 load_test.py --arrival uniform --profile ramp --ramp-from 5 --rate 50 --duration 60
+
+只依赖标准库：HTTP/1.1 keep-alive 客户端基于 asyncio 实现，连接池大小等于 --concurrency。
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.parse
+
+DEFAULT_EMAIL = 'user@example.com'
+DEFAULT_PASSWORD = 'user123'
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+REQUEST_TIMEOUT = 30
+
+
+class HTTPError(Exception):
+    """连接失败、超时或响应无法解析"""
+
+
+class HTTPConnectionPool:
+    """最小化的 HTTP/1.1 keep-alive 连接池
+
+    空闲连接放在队列里复用，最多同时打开 size 个连接；
+    连接出错或服务端要求关闭时丢弃该连接。
+    """
+
+    def __init__(self, base_url, size=10, timeout=REQUEST_TIMEOUT):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self.idle = asyncio.Queue()
+        self.slots = asyncio.Semaphore(size)
+        self.opened = 0
+
+    async def _acquire(self):
+        await self.slots.acquire()
+        while not self.idle.empty():
+            reader, writer = self.idle.get_nowait()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        self.opened += 1
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+            # 请求是小包，关闭 Nagle 避免与延迟 ACK 叠加出 40ms 级的假延迟
+            writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return reader, writer
+        except Exception:
+            self.slots.release()
+            raise
+
+    def _release(self, conn, reusable):
+        if reusable:
+            self.idle.put_nowait(conn)
+        else:
+            conn[1].close()
+        self.slots.release()
+
+    async def request(self, method, path, body=None, headers=None):
+        """发送请求，返回 (状态码, 响应体 bytes)"""
+        payload = b'' if body is None else json.dumps(body, ensure_ascii=False).encode('utf-8')
+        lines = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Connection: keep-alive",
+            f"Content-Length: {len(payload)}",
+        ]
+        if body is not None:
+            lines.append("Content-Type: application/json")
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        raw = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload
+
+        try:
+            conn = await self._acquire()
+        except (OSError, asyncio.TimeoutError) as e:
+            raise HTTPError(f"连接失败: {e}") from e
+        reusable = False
+        try:
+            conn[1].write(raw)
+            status, data, reusable = await asyncio.wait_for(self._read_response(conn[0]), self.timeout)
+            return status, data
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            raise HTTPError(f"{method} {path}: {type(e).__name__} {e}") from e
+        finally:
+            self._release(conn, reusable)
+
+    async def _read_response(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise HTTPError('连接被服务端关闭')
+        parts = status_line.split()
+        if len(parts) < 2 or not parts[0].startswith(b'HTTP/') or not parts[1].isdigit():
+            raise HTTPError(f"无效的状态行: {status_line[:80]!r}")
+        status = int(parts[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            data = b''.join(chunks)
+        elif 'content-length' in headers:
+            data = await reader.readexactly(int(headers['content-length']))
+        else:
+            return status, await reader.read(), False
+        return status, data, headers.get('connection', '').lower() != 'close'
+
+    async def close(self):
+        while not self.idle.empty():
+            _, writer = self.idle.get_nowait()
+            writer.close()
+
+
+class HdrHistogram:
+    """HDR 直方图：对数分桶、桶内线性细分，在 [lowest, highest] 范围内保持 significant_figures 位有效数字
+
+    记录是 O(1) 的计数器自增，内存与样本数无关，长时间压测也不需要保存每个样本；
+    分桶方式与 HdrHistogram 的标准实现相同。
+    """
+
+    def __init__(self, lowest=1, highest=3600 * 1000 * 1000, significant_figures=3):
+        largest_single_unit = 2 * 10 ** significant_figures
+        sub_bucket_count_magnitude = math.ceil(math.log2(largest_single_unit))
+        self.sub_bucket_half_count_magnitude = max(sub_bucket_count_magnitude, 1) - 1
+        self.unit_magnitude = int(math.floor(math.log2(lowest)))
+        self.sub_bucket_count = 1 << (self.sub_bucket_half_count_magnitude + 1)
+        self.sub_bucket_half_count = self.sub_bucket_count // 2
+        self.sub_bucket_mask = (self.sub_bucket_count - 1) << self.unit_magnitude
+        self.highest = highest
+
+        smallest_untrackable = self.sub_bucket_count << self.unit_magnitude
+        bucket_count = 1
+        while smallest_untrackable <= highest:
+            smallest_untrackable <<= 1
+            bucket_count += 1
+        self.counts = [0] * ((bucket_count + 1) * self.sub_bucket_half_count)
+        self.total = 0
+        self.max_value = 0
+
+    def _index(self, value):
+        bucket = (value | self.sub_bucket_mask).bit_length() - self.unit_magnitude - (self.sub_bucket_half_count_magnitude + 1)
+        sub_bucket = value >> (bucket + self.unit_magnitude)
+        return ((bucket + 1) << self.sub_bucket_half_count_magnitude) + (sub_bucket - self.sub_bucket_half_count)
+
+    def _highest_equivalent(self, index):
+        bucket = (index >> self.sub_bucket_half_count_magnitude) - 1
+        sub_bucket = (index & (self.sub_bucket_half_count - 1)) + self.sub_bucket_half_count
+        if bucket < 0:
+            sub_bucket -= self.sub_bucket_half_count
+            bucket = 0
+        shift = bucket + self.unit_magnitude
+        return (sub_bucket << shift) + (1 << shift) - 1
+
+    def record(self, value):
+        value = min(max(int(value), 0), self.highest)
+        self.counts[self._index(value)] += 1
+        self.total += 1
+        if value > self.max_value:
+            self.max_value = value
+
+    def add(self, other):
+        for i, n in enumerate(other.counts):
+            if n:
+                self.counts[i] += n
+        self.total += other.total
+        self.max_value = max(self.max_value, other.max_value)
+
+    def percentile(self, pct):
+        """返回 pct 百分位所在桶的上界（与最大值取小）"""
+        if not self.total:
+            return 0
+        target = max(1, math.ceil(pct / 100 * self.total))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(self._highest_equivalent(i), self.max_value)
+        return self.max_value
+
+
+class LatencyStats:
+    """按接口汇总延迟、状态码和错误
+
+    延迟以微秒记录在 HdrHistogram 中，汇总时换算成毫秒。
+    dropped 是开环模式下因在途会话达到上限而未能发出的到达数。
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.errors = {}
+        self.statuses = {}
+        self.dropped = 0
+
+    def record(self, route, latency_ms, status):
+        hist = self.histograms.get(route)
+        if hist is None:
+            hist = self.histograms[route] = HdrHistogram()
+        hist.record(latency_ms * 1000)
+        counts = self.statuses.setdefault(route, {})
+        counts[status] = counts.get(status, 0) + 1
+        if status == 0 or status >= 400:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def combined(self):
+        total = HdrHistogram()
+        for hist in self.histograms.values():
+            total.add(hist)
+        return total
+
+    @staticmethod
+    def _describe(hist, errors):
+        return {
+            'count': hist.total,
+            'errors': errors,
+            'error_rate': errors / hist.total if hist.total else 0.0,
+            'p50': hist.percentile(50) / 1000,
+            'p95': hist.percentile(95) / 1000,
+            'p99': hist.percentile(99) / 1000,
+            'p999': hist.percentile(99.9) / 1000,
+            'max': hist.max_value / 1000,
+        }
+
+    def summary(self):
+        """返回 {接口: {count, errors, error_rate, p50, p95, p99, p999, max, statuses}}"""
+        result = {}
+        for route, hist in self.histograms.items():
+            result[route] = self._describe(hist, self.errors.get(route, 0))
+            result[route]['statuses'] = {str(k): v for k, v in sorted(self.statuses[route].items())}
+        return result
+
+    def overall(self):
+        return self._describe(self.combined(), sum(self.errors.values()))
+
+
+class Pacer:
+    """全局请求节拍器：所有会话共享，把总请求速率限制在 rps（0 表示不限速）"""
+
+    def __init__(self, rps):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self.next_slot = time.monotonic()
+
+    async def wait(self):
+        """等到下一个发送时隙，返回该时隙（计划发送时刻）"""
+        now = time.monotonic()
+        if not self.interval:
+            return now
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        return slot
+
+
+class ArrivalSchedule:
+    """开环到达时刻表
+
+    profile 决定速率随时间的变化（单位：会话/秒）:
+      constant  始终为 rate
+      step      把 duration 均分给 steps 中的每一档速率
+      ramp      从 ramp_from 线性变化到 rate
+    process 决定到达间隔: poisson 为指数分布（非齐次时用 thinning 法），uniform 为按速率积分的等间隔。
+    """
+
+    def __init__(self, profile, rate, duration, steps=None, ramp_from=0.0, process='poisson'):
+        if profile == 'step' and not steps:
+            raise ValueError('阶梯速率需要 --steps')
+        self.profile = profile
+        self.rate = rate
+        self.duration = duration
+        self.steps = list(steps or [])
+        self.ramp_from = ramp_from
+        self.process = process
+
+    def rate_at(self, t):
+        if self.profile == 'step':
+            n = min(int(t / self.duration * len(self.steps)), len(self.steps) - 1)
+            return self.steps[n]
+        if self.profile == 'ramp':
+            return self.ramp_from + (self.rate - self.ramp_from) * min(t / self.duration, 1.0)
+        return self.rate
+
+    def peak(self):
+        if self.profile == 'step':
+            return max(self.steps)
+        if self.profile == 'ramp':
+            return max(self.ramp_from, self.rate)
+        return self.rate
+
+    def arrivals(self, rng):
+        """按时间顺序产出到达时刻（相对压测开始的秒数）"""
+        peak = self.peak()
+        if peak <= 0:
+            return
+        t = 0.0
+        if self.process == 'poisson':
+            while True:
+                t += rng.expovariate(peak)
+                if t >= self.duration:
+                    return
+                if rng.random() * peak < self.rate_at(t):
+                    yield t
+        else:
+            # 以 1ms 步长积分速率，累计满一个到达就发出，速率变化时间隔也随之变化
+            step = 0.001
+            credit = 1.0
+            while t < self.duration:
+                credit += self.rate_at(t) * step
+                if credit >= 1.0:
+                    credit -= 1.0
+                    yield t
+                t += step
+
+    def describe(self):
+        if self.profile == 'step':
+            shape = '→'.join(f"{r:g}" for r in self.steps)
+        elif self.profile == 'ramp':
+            shape = f"{self.ramp_from:g}→{self.rate:g}"
+        else:
+            shape = f"{self.rate:g}"
+        return f"{self.process} {self.profile} {shape} 会话/秒"
+
+
+class Session:
+    """一个虚拟用户：持有登录令牌，每次请求都记录从计划发送时刻算起的延迟
+
+    闭环模式下计划发送时刻由节拍器给出；开环模式下没有节拍器，
+    第一个请求的计划时刻是会话的到达时刻 due，后续请求依赖前一个响应，计划时刻即上一步完成的时刻。
+    """
+
+    def __init__(self, pool, stats, pacer, rng, due=None):
+        self.pool = pool
+        self.stats = stats
+        self.pacer = pacer
+        self.rng = rng
+        self.due = due
+        self.token = None
+
+    async def call(self, method, path, route, body=None):
+        if self.pacer is not None:
+            intended = await self.pacer.wait()
+        elif self.due is not None:
+            intended, self.due = self.due, None
+        else:
+            intended = time.monotonic()
+        headers = {'Authorization': f"Bearer {self.token}"} if self.token else None
+        try:
+            status, data = await self.pool.request(method, path, body, headers)
+        except HTTPError:
+            status, data = 0, b''
+        self.stats.record(route, (time.monotonic() - intended) * 1000, status)
+        if 200 <= status < 300 and data:
+            try:
+                return json.loads(data)
+            except ValueError:
+                return None
+        return None
+
+
+async def user_journey(session, email, password):
+    """一次完整的用户会话：登录 → 浏览 → 下单 → 支付，部分用户再订阅并暂停"""
+    if session.token is None:
+        login = await session.call('POST', '/api/auth/login', 'POST /api/auth/login',
+                                   {'email': email, 'password': password})
+        if not login:
+            return
+        session.token = login.get('token')
+        contact = login.get('user', {})
+        session.contact = (contact.get('name') or '压测用户', contact.get('phone') or '13800000000')
+
+    packages = await session.call('GET', '/api/food-packages', 'GET /api/food-packages')
+    await session.call('GET', '/api/food-packages/recommended', 'GET /api/food-packages/recommended')
+    await session.call('GET', '/api/food-packages/limited', 'GET /api/food-packages/limited')
+    if not packages:
+        return
+    pkg = session.rng.choice(packages)
+    await session.call('GET', f"/api/food-packages/{pkg['id']}", 'GET /api/food-packages/:id')
+
+    name, phone = session.contact
+    address = {'province': '北京市', 'city': '北京市', 'district': '朝阳区', 'detail': '压测路1号'}
+    order = await session.call('POST', '/api/orders', 'POST /api/orders', {
+        'packageId': pkg['id'], 'quantity': 1, 'deliveryAddress': address,
+        'contactName': name, 'contactPhone': phone, 'remark': 'load-test',
+    })
+    if order and order.get('id'):
+        await session.call('POST', f"/api/orders/{order['id']}/pay", 'POST /api/orders/:id/pay',
+                           {'paymentMethod': 'mock'})
+
+    if session.rng.random() < 0.2:
+        sub = await session.call('POST', '/api/subscriptions', 'POST /api/subscriptions', {
+            'packageId': pkg['id'], 'frequency': 'weekly', 'quantity': 1, 'duration': 1,
+            'deliveryAddress': address, 'contactName': name, 'contactPhone': phone,
+        })
+        if sub and sub.get('id'):
+            await session.call('POST', f"/api/subscriptions/{sub['id']}/pause",
+                               'POST /api/subscriptions/:id/pause')
+
+
+async def run_load(base_url, rps, duration, concurrency, email=DEFAULT_EMAIL, password=DEFAULT_PASSWORD, seed=1):
+    """以 concurrency 个虚拟用户循环执行会话，持续 duration 秒，返回 (LatencyStats, 实际耗时)"""
+    pool = HTTPConnectionPool(base_url, size=concurrency)
+    stats = LatencyStats()
+    pacer = Pacer(rps)
+    deadline = time.monotonic() + duration
+
+    async def virtual_user(n):
+        session = Session(pool, stats, pacer, random.Random(seed * 100003 + n))
+        while time.monotonic() < deadline:
+            await user_journey(session, email, password)
+            if session.token is None:
+                # 登录失败时稍作等待，避免空转
+                await asyncio.sleep(0.5)
+
+    started = time.monotonic()
+    try:
+        await asyncio.gather(*(virtual_user(n) for n in range(concurrency)))
+    finally:
+        await pool.close()
+    return stats, time.monotonic() - started
+
+
+async def run_open_loop(base_url, schedule, concurrency, email=DEFAULT_EMAIL, password=DEFAULT_PASSWORD, seed=1,
+                        max_inflight=10000):
+    """按 schedule 的到达时刻发起会话，不等待前面的会话完成，返回 (LatencyStats, 实际耗时)
+
+    concurrency 是连接池大小，等待空闲连接的时间也计入延迟；
+    在途会话数达到 max_inflight 时新的到达会被丢弃并计数，报告中会给出提示。
+    """
+    pool = HTTPConnectionPool(base_url, size=concurrency)
+    stats = LatencyStats()
+    rng = random.Random(seed)
+
+    # 所有会话共用一个登录令牌，避免登录接口主导负载。
+    # 这次登录兼预热会话单独计数后丢弃：冷启动请求不计入报告，耗时也不在 elapsed 内
+    first = Session(pool, LatencyStats(), None, rng)
+    await user_journey(first, email, password)
+    if first.token is None:
+        await pool.close()
+        raise RuntimeError(f"登录失败: {email}")
+
+    inflight = set()
+    started = time.monotonic()
+    try:
+        for n, offset in enumerate(schedule.arrivals(rng)):
+            due = started + offset
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(inflight) >= max_inflight:
+                stats.dropped += 1
+                continue
+            session = Session(pool, stats, None, random.Random(seed * 100003 + n), due=due)
+            session.token = first.token
+            session.contact = first.contact
+            task = asyncio.ensure_future(user_journey(session, email, password))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+        if inflight:
+            await asyncio.gather(*inflight)
+    finally:
+        await pool.close()
+    return stats, time.monotonic() - started
+
+
+def print_report(stats, elapsed):
+    summary = stats.summary()
+    overall = stats.overall()
+    print(f"\n{'=' * 106}")
+    print(f"{'接口':<40}{'请求数':>8}{'错误率':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'p99.9(ms)':>10}{'max(ms)':>10}")
+    print('-' * 106)
+    for route, r in sorted(summary.items()) + [('全部', overall)]:
+        if route == '全部':
+            print('-' * 106)
+        print(f"{route:<40}{r['count']:>8}{r['error_rate']:>9.2%}"
+              f"{r['p50']:>10.1f}{r['p95']:>10.1f}{r['p99']:>10.1f}{r['p999']:>10.1f}{r['max']:>10.1f}")
+    print('-' * 106)
+    print(f"总请求 {overall['count']}，错误 {overall['errors']}，耗时 {elapsed:.1f}s，"
+          f"吞吐 {overall['count'] / max(elapsed, 1e-9):.1f} req/s")
+    if stats.dropped:
+        print(f"⚠️  {stats.dropped} 个会话因在途会话达到上限未发出，实际负载低于计划")
+    print('=' * 106)
+    return summary
+
+
+def start_local_backend(port):
+    """用内存数据库（backend/db/memory-db-simple.js）在本地启动后端，返回进程对象"""
+    env = dict(os.environ, PORT=str(port))
+    proc = subprocess.Popen(
+        ['node', 'server.js'], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+
+    async def wait_ready():
+        pool = HTTPConnectionPool(url, size=1, timeout=2)
+        try:
+            for _ in range(100):
+                if proc.poll() is not None:
+                    raise RuntimeError(f"后端进程已退出，返回码 {proc.returncode}")
+                try:
+                    status, _ = await pool.request('GET', '/api/health')
+                    if status == 200:
+                        return
+                except HTTPError:
+                    pass
+                await asyncio.sleep(0.2)
+            raise RuntimeError('等待后端启动超时')
+        finally:
+            await pool.close()
+
+    try:
+        asyncio.run(wait_ready())
+    except Exception:
+        proc.terminate()
+        raise
+    print(f"  ✓ 本地后端已启动: {url} (pid {proc.pid})")
+    return proc, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description='后端 API 压测')
+    parser.add_argument('--url', default='http://localhost:3001', help='后端地址')
+    parser.add_argument('--rps', type=float, default=50, help='闭环模式的目标总请求速率（0 表示不限速）')
+    parser.add_argument('--duration', type=float, default=30, help='压测时长（秒）')
+    parser.add_argument('--concurrency', type=int, default=20,
+                        help='闭环模式的虚拟用户数；两种模式下都是连接池大小')
+    parser.add_argument('--arrival', choices=['closed', 'poisson', 'uniform'], default='closed',
+                        help='closed 为闭环；poisson/uniform 为开环到达过程')
+    parser.add_argument('--profile', choices=['constant', 'step', 'ramp'], default='constant', help='开环速率曲线')
+    parser.add_argument('--rate', type=float, default=10, help='开环模式每秒到达的会话数（ramp 的终点速率）')
+    parser.add_argument('--steps', help='阶梯速率，逗号分隔，如 10,20,40（会话/秒）')
+    parser.add_argument('--ramp-from', type=float, default=0.0, help='斜坡起点速率（会话/秒）')
+    parser.add_argument('--max-inflight', type=int, default=10000, help='开环模式在途会话上限')
+    parser.add_argument('--email', default=DEFAULT_EMAIL)
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--start-backend', action='store_true', help='在本地用内存数据库启动后端')
+    parser.add_argument('--port', type=int, default=3101, help='--start-backend 使用的端口')
+    parser.add_argument('--report', help='把统计结果写入 JSON 文件')
+    args = parser.parse_args()
+    steps = [float(x) for x in args.steps.split(',')] if args.steps else None
+    if args.arrival != 'closed' and args.profile == 'step' and not steps:
+        parser.error('--profile step 需要 --steps')
+
+    proc = None
+    url = args.url
+    if args.start_backend:
+        proc, url = start_local_backend(args.port)
+
+    try:
+        if args.arrival == 'closed':
+            print(f"压测 {url}: 目标 {args.rps:g} req/s，{args.concurrency} 个虚拟用户，持续 {args.duration:g}s")
+            stats, elapsed = asyncio.run(run_load(
+                url, args.rps, args.duration, args.concurrency, args.email, args.password, args.seed,
+            ))
+            model = {'arrival': 'closed', 'rps': args.rps, 'concurrency': args.concurrency}
+        else:
+            schedule = ArrivalSchedule(args.profile, args.rate, args.duration, steps, args.ramp_from, args.arrival)
+            print(f"压测 {url}: 开环 {schedule.describe()}，连接池 {args.concurrency}，持续 {args.duration:g}s")
+            stats, elapsed = asyncio.run(run_open_loop(
+                url, schedule, args.concurrency, args.email, args.password, args.seed, args.max_inflight,
+            ))
+            model = {'arrival': args.arrival, 'profile': args.profile, 'rate': args.rate, 'steps': steps,
+                     'ramp_from': args.ramp_from, 'concurrency': args.concurrency}
+        summary = print_report(stats, elapsed)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump({'url': url, 'elapsed': elapsed, 'model': model, 'dropped': stats.dropped,
+                           'overall': stats.overall(), 'routes': summary}, f, ensure_ascii=False, indent=2)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
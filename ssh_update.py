@@ -1,55 +1,768 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""SSH 更新服务器脚本"""
+"""SSH 更新服务器脚本
 
+用法:
+  # 更新默认服务器
+  python3 ssh_update.py
+  # 按主机清单并行更新多台后端节点（每台主机复用一条 SSH 连接）
+  python3 ssh_update.py --inventory hosts.txt --parallel 4 --host-timeout 300
+  python3 ssh_update.py --host root@10.0.0.11 --host 10.0.0.12:2222
+  # 本地打包一次，只把相对服务器上一次构建包变化的块上传，服务器解包为新版本目录（不依赖服务器 git）
+  python3 ssh_update.py --artifact --inventory hosts.txt
+  python3 ssh_update.py --artifact v1.2.1
+  # 注意：首次 --artifact 部署会把服务器上的 git 工作目录迁移为版本目录布局（单向，不含 .git），
+  # 此后不带 --artifact 的 git pull 更新和 git reset 回滚都会直接报错，只能继续使用 --artifact
+  # 分批灰度：先更新 1 台金丝雀并与未更新主机对比 p95/p99 和错误率，通过后再更新一半、全部，否则自动回滚
+  python3 ssh_update.py --canary --waves 1,50%,100% --inventory hosts.txt
+  # 本地演练门控（不连接服务器），清单第二列是各主机的探测地址
+  python3 ssh_update.py --canary --dry-run --host "a http://127.0.0.1:3001" --host "b http://127.0.0.1:3002"
+
+主机清单每行一台主机，格式为 [user@]host[:port] [探测地址]，# 开头为注释；
+探测地址默认为 http://host（节点上的 nginx）。
+密码读取 SSH_PASSWORD 环境变量；未设置时使用默认密码，也会尝试 ssh-agent 和本地密钥。
+"""
+
+import argparse
+import asyncio
+import codecs
+import hashlib
+import io
+import math
+import os
+import select
+import shutil
+import subprocess
 import sys
+import tarfile
+import tempfile
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def main():
-    hostname = "39.104.25.212"
-    username = "root"
-    password = "y6Z+Y8.=zpegxfCZPYX0"
-    
-    commands = [
-        "cd /var/www/food-subscription-v01.1-backup",
-        "git pull origin main",
-        "pm2 restart food-subscription || (pkill -f 'node server.js' && cd backend && nohup node server.js > app.log 2>&1 &)",
-        "echo '更新完成'"
+import delta_transfer
+import load_test
+
+HOSTNAME = "39.104.25.212"
+USERNAME = "root"
+PASSWORD = os.environ.get('SSH_PASSWORD', "y6Z+Y8.=zpegxfCZPYX0")
+REMOTE_DIR = "/var/www/food-subscription-v01.1-backup"
+ARTIFACT_DIR = "/var/www/food-subscription-artifacts"      # 与 update-server.py 一致
+ARTIFACT_BASIS = f"{ARTIFACT_DIR}/current.tar"               # 服务器上一次部署的构建包，作为增量基准
+ARTIFACT_TOOLS = ["delta_transfer.py", "update-server.py"]   # 随构建包上传到 ARTIFACT_DIR 的脚本
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CONNECT_TIMEOUT = 30
+COMMAND_TIMEOUT = 60
+HOST_TIMEOUT = 300
+KEEPALIVE_SECONDS = 30
+READ_CHUNK = 4096         # 每次从通道读取的字节数
+TAIL_LINES = 50           # 每条命令保留的末尾输出行数
+POLL_SECONDS = 0.2
+
+_print_lock = threading.Lock()
+
+# 灰度发布：每批更新后用只读接口对新旧主机同时施加短时负载，比较延迟和错误率
+CANARY_WAVES = "1,50%,100%"       # 每批结束时累计更新的主机数（数量或百分比）
+PROBE_ROUTES = ['/api/health', '/api/food-packages', '/api/food-packages/recommended', '/api/food-packages/limited']
+PROBE_SECONDS = 15
+PROBE_RPS = 20                    # 每台主机的探测请求速率
+PROBE_CONCURRENCY = 4
+CANARY_MAX_RATIO = 1.5            # p95/p99 超过对照组的倍数视为回归
+CANARY_MIN_MS = 20.0              # 且至少比对照组慢这么多毫秒，避免毫秒级抖动误报
+CANARY_MAX_ERROR_DELTA = 0.01     # 错误率比对照组高出的上限
+CANARY_MIN_TAIL_SAMPLES = 5       # 分位数以上至少要有这么多个样本才参与门控（p95 需 100 个请求，p99 需 500 个）
+
+# 每条命令都在独立的 exec 通道里执行，cd 不会延续到下一条命令，
+# 所以统一在 REMOTE_DIR 下执行
+RESTART_COMMAND = "pm2 restart food-subscription || (pkill -f 'node server.js' && cd backend && nohup node server.js > app.log 2>&1 &)"
+PULL_COMMAND = "git pull origin main"
+# --artifact 部署后 REMOTE_DIR 是指向版本目录的符号链接，里面没有 .git，git 步骤前先检查并给出明确提示
+GIT_LAYOUT_CHECK = (f"test ! -L {REMOTE_DIR} || {{ echo '{REMOTE_DIR} 已通过 --artifact 切换为版本目录布局，"
+                    f"不能再用 git 更新或回滚，请使用 --artifact' >&2; exit 1; }}")
+COMMANDS = [
+    GIT_LAYOUT_CHECK,
+    PULL_COMMAND,
+    RESTART_COMMAND,
+    "echo '更新完成'"
+]
+# git pull 会把更新前的提交记在 ORIG_HEAD
+ROLLBACK_COMMANDS = [
+    GIT_LAYOUT_CHECK,
+    "git reset --hard ORIG_HEAD",
+    RESTART_COMMAND,
+]
+
+
+def log(label, message):
+    """带主机前缀输出一行；整行一次写出，并发的主机之间不会交错"""
+    with _print_lock:
+        sys.stdout.write(f"[{label}] {message}\n")
+        sys.stdout.flush()
+
+
+class Host:
+    """主机清单中的一台主机"""
+
+    def __init__(self, hostname, username=USERNAME, port=22, url=None):
+        self.hostname = hostname
+        self.username = username
+        self.port = port
+        self.url = url or f"http://{hostname}"
+
+    @classmethod
+    def parse(cls, spec):
+        """解析 [user@]host[:port] [探测地址]"""
+        spec, _, url = spec.strip().partition(' ')
+        username = USERNAME
+        if '@' in spec:
+            username, spec = spec.split('@', 1)
+        port = 22
+        if ':' in spec:
+            spec, port = spec.rsplit(':', 1)
+            port = int(port)
+        return cls(spec, username, port, url.strip() or None)
+
+    @property
+    def label(self):
+        return self.hostname if self.port == 22 else f"{self.hostname}:{self.port}"
+
+
+def load_inventory(path):
+    """读取主机清单文件"""
+    hosts = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                hosts.append(Host.parse(line))
+    return hosts
+
+
+class SSHConnectionPool:
+    """每台主机保持一条 SSH 连接（一个 Transport），命令在其上多路复用各自的通道"""
+
+    def __init__(self, paramiko, password=PASSWORD, connect_timeout=CONNECT_TIMEOUT):
+        self.paramiko = paramiko
+        self.password = password
+        self.connect_timeout = connect_timeout
+        self.clients = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def host_lock(self, host):
+        with self.lock:
+            return self.locks.setdefault(host.label, threading.Lock())
+
+    def get(self, host):
+        """取得主机的连接；断开时自动重连"""
+        with self.host_lock(host):
+            client = self.clients.get(host.label)
+            transport = client.get_transport() if client else None
+            if transport is not None and transport.is_active():
+                return client
+            if client:
+                client.close()
+            client = self.paramiko.SSHClient()
+            client.set_missing_host_key_policy(self.paramiko.AutoAddPolicy())
+            client.connect(host.hostname, port=host.port, username=host.username, password=self.password,
+                           timeout=self.connect_timeout, banner_timeout=self.connect_timeout,
+                           auth_timeout=self.connect_timeout)
+            client.get_transport().set_keepalive(KEEPALIVE_SECONDS)
+            self.clients[host.label] = client
+            return client
+
+    def close_all(self):
+        with self.lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients.clear()
+
+
+class CommandStream:
+    """一条远程命令的输出流：按行切分、带主机前缀输出、保留末尾若干行并记录耗时"""
+
+    def __init__(self, channel, label, command, timeout, tail_lines=TAIL_LINES):
+        self.channel = channel
+        self.label = label
+        self.command = command
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout
+        self.seconds = None
+        self.status = None
+        self.timed_out = False
+        self.tail = deque(maxlen=tail_lines)
+        self.decoders = {name: codecs.getincrementaldecoder('utf-8')(errors='replace') for name in ('out', 'err')}
+        self.partial = {'out': '', 'err': ''}
+        self.done = threading.Event()
+
+    def fileno(self):
+        # paramiko 的通道在 stdout 或 stderr 有数据、或通道关闭时变为可读，可直接交给 select
+        return self.channel.fileno()
+
+    def feed(self, name, data, final=False):
+        lines = (self.partial[name] + self.decoders[name].decode(data, final)).split('\n')
+        self.partial[name] = lines.pop()
+        if final and self.partial[name]:
+            lines.append(self.partial[name])
+            self.partial[name] = ''
+        for line in lines:
+            line = line.rstrip('\r')
+            self.tail.append((name, line))
+            log(self.label, f"{'! ' if name == 'err' else ''}{line}")
+
+    def drain(self):
+        """非阻塞地读出通道里已经到达的数据，返回读到的字节数"""
+        received = 0
+        while self.channel.recv_ready():
+            data = self.channel.recv(READ_CHUNK)
+            if not data:
+                break
+            self.feed('out', data)
+            received += len(data)
+        while self.channel.recv_stderr_ready():
+            data = self.channel.recv_stderr(READ_CHUNK)
+            if not data:
+                break
+            self.feed('err', data)
+            received += len(data)
+        return received
+
+    def finish(self, status):
+        self.feed('out', b'', final=True)
+        self.feed('err', b'', final=True)
+        self.status = status
+        self.seconds = time.monotonic() - self.started
+        self.done.set()
+
+    def wait(self):
+        self.done.wait()
+        return self.status
+
+
+class ChannelMux:
+    """单个读线程用 select 同时读取所有主机所有通道的 stdout/stderr
+
+    两路输出都随到随读，不会出现 stderr 缓冲区写满后远程命令阻塞的情况；
+    命令输出按行带主机前缀打印，不同主机的行不会互相截断。
+    """
+
+    def __init__(self, poll_seconds=POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.streams = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name='ssh-output', daemon=True)
+        self.thread.start()
+
+    def watch(self, channel, label, command, timeout):
+        stream = CommandStream(channel, label, command, timeout)
+        log(label, f"$ {command}")
+        with self.lock:
+            self.streams.append(stream)
+        self.wakeup.set()
+        return stream
+
+    def run(self):
+        while not self.stopped:
+            with self.lock:
+                streams = list(self.streams)
+            if not streams:
+                self.wakeup.wait(self.poll_seconds)
+                self.wakeup.clear()
+                continue
+            try:
+                select.select(streams, [], [], self.poll_seconds)
+            except (OSError, ValueError):
+                time.sleep(self.poll_seconds)
+            now = time.monotonic()
+            finished = []
+            waiting_exit = False
+            for stream in streams:
+                try:
+                    channel = stream.channel
+                    received = stream.drain()
+                    drained = not received and not channel.recv_ready() and not channel.recv_stderr_ready()
+                    # 退出码可能先于最后一段输出到达，只有通道已 EOF/关闭且两路都读空后才算结束
+                    if drained and (channel.closed or (channel.eof_received and channel.exit_status_ready())):
+                        stream.finish(channel.recv_exit_status() if channel.exit_status_ready() else -1)
+                    elif now > stream.deadline:
+                        stream.timed_out = True
+                        stream.channel.close()
+                        stream.finish(None)
+                    else:
+                        # 已 EOF 的通道在退出码到达前会一直可读，记下来避免空转
+                        waiting_exit = waiting_exit or (drained and channel.eof_received)
+                        continue
+                except Exception as e:
+                    stream.feed('err', f"读取输出失败: {e}".encode())
+                    stream.finish(-1)
+                finished.append(stream)
+            if finished:
+                with self.lock:
+                    self.streams = [stream for stream in self.streams if stream not in finished]
+            elif waiting_exit:
+                time.sleep(min(self.poll_seconds, 0.05))
+
+    def close(self):
+        self.stopped = True
+        self.wakeup.set()
+        self.thread.join()
+
+
+class HostSession:
+    """一台主机上的一次执行：复用连接池中的连接，记录每条命令的耗时和输出末尾"""
+
+    def __init__(self, pool, mux, host, host_timeout=HOST_TIMEOUT, command_timeout=COMMAND_TIMEOUT):
+        self.pool = pool
+        self.mux = mux
+        self.host = host
+        self.host_timeout = host_timeout
+        self.command_timeout = command_timeout
+        self.started = time.monotonic()
+        self.deadline = self.started + host_timeout
+        self.client = None
+        self.result = {'host': host.label, 'ok': False, 'commands': [], 'error': None, 'tail': []}
+
+    def connect(self):
+        log(self.host.label, "正在连接...")
+        self.client = self.pool.get(self.host)
+
+    def remaining(self):
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"超过主机时限 {self.host_timeout}s")
+        return remaining
+
+    def run(self, cmd, timeout=None):
+        """在 REMOTE_DIR 下执行一条命令，超时或退出码非 0 时抛出异常"""
+        timeout = min(timeout or self.command_timeout, self.remaining())
+        stdin, stdout, stderr = self.client.exec_command(f"cd {REMOTE_DIR} && {cmd}")
+        # 如果需要输入密码（sudo等情况）
+        if 'sudo' in cmd:
+            stdin.write(self.pool.password + '\n')
+            stdin.flush()
+
+        stream = self.mux.watch(stdout.channel, self.host.label, cmd, timeout)
+        status = stream.wait()
+        self.result['commands'].append({'command': cmd, 'status': status, 'seconds': stream.seconds})
+        self.result['tail'] = list(stream.tail)
+        log(self.host.label, f"({stream.seconds:.1f}s，{'超时' if stream.timed_out else f'退出码 {status}'})")
+        if stream.timed_out:
+            raise TimeoutError(f"命令超时（{timeout:.0f}s）: {cmd}")
+        if status != 0:
+            raise RuntimeError(f"命令退出码 {status}: {cmd}")
+
+
+def run_plan(pool, mux, host, steps, host_timeout=HOST_TIMEOUT, command_timeout=COMMAND_TIMEOUT):
+    """在一台主机上依次执行计划，失败或超过主机总时限即停止
+
+    计划中的字符串是远程命令，可调用对象以 HostSession 为参数执行（上传文件等本地步骤）。
+    """
+    session = HostSession(pool, mux, host, host_timeout, command_timeout)
+    result = session.result
+    try:
+        session.connect()
+        for step in steps:
+            if callable(step):
+                step(session)
+            else:
+                session.run(step)
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+        log(host.label, f"❌ {result['error']}")
+    result['seconds'] = time.monotonic() - session.started
+    return result
+
+
+def build_artifact(revision, out_path):
+    """用 git archive 打包 revision，返回提交号
+
+    成员的修改时间和属主统一归零：内容没变的文件在新旧两个包里字节完全相同，增量才能复用这些块。
+    提交号写入包末尾的 REVISION 文件，供 update-server.py 添加版本标识。
+    """
+    commit = subprocess.run(['git', 'rev-parse', '--short', revision], cwd=REPO_DIR,
+                            capture_output=True, text=True, check=True).stdout.strip()
+    proc = subprocess.Popen(['git', 'archive', '--format=tar', revision], cwd=REPO_DIR, stdout=subprocess.PIPE)
+    try:
+        with tarfile.open(fileobj=proc.stdout, mode='r|') as src, \
+                tarfile.open(out_path, 'w', format=tarfile.PAX_FORMAT) as dst:
+            for member in src:
+                member.mtime = 0
+                member.uid = member.gid = 0
+                member.uname = member.gname = ''
+                member.pax_headers = {}
+                dst.addfile(member, src.extractfile(member) if member.isfile() else None)
+            data = commit.encode()
+            info = tarfile.TarInfo('REVISION')
+            info.size = len(data)
+            info.mode = 0o644
+            dst.addfile(info, io.BytesIO(data))
+    finally:
+        proc.stdout.close()
+        if proc.wait() != 0:
+            raise RuntimeError(f"git archive {revision} 失败")
+    return commit
+
+
+class ArtifactUpload:
+    """本地构建包；按服务器返回的签名生成增量，签名相同的主机共用同一份增量"""
+
+    def __init__(self, revision, block_size=delta_transfer.BLOCK_SIZE):
+        self.workdir = tempfile.mkdtemp(prefix='food-artifact-')
+        self.path = os.path.join(self.workdir, 'release.tar')
+        self.block_size = block_size
+        self.commit = build_artifact(revision, self.path)
+        self.size = os.path.getsize(self.path)
+        self.deltas = {}
+        self.lock = threading.Lock()
+        print(f"✓ 构建包 {self.commit}: {self.size / 1024 / 1024:.1f} MB")
+
+    def delta_for(self, sig_path):
+        """返回 (增量文件路径, 统计)；生成增量是 CPU 密集的，串行执行并按签名内容缓存"""
+        with open(sig_path, 'rb') as f:
+            key = hashlib.sha256(f.read()).hexdigest()
+        with self.lock:
+            if key not in self.deltas:
+                delta_path = os.path.join(self.workdir, f"{key[:16]}.delta")
+                self.deltas[key] = (delta_path, delta_transfer.write_delta(sig_path, self.path, delta_path))
+            return self.deltas[key]
+
+    def cleanup(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def artifact_plan(artifact, server_args=''):
+    """构建包部署计划：上传脚本 → 服务器生成旧包签名 → 本地算增量并上传 → 服务器还原并解包上线"""
+    remote_new = f"{ARTIFACT_DIR}/{artifact.commit}.tar"
+    remote_sig = f"{ARTIFACT_DIR}/{artifact.commit}.sig"
+    remote_delta = f"{ARTIFACT_DIR}/{artifact.commit}.delta"
+    delta_tool = f"python3 {ARTIFACT_DIR}/delta_transfer.py"
+
+    def upload_tools(session):
+        session.run(f"mkdir -p {ARTIFACT_DIR}")
+        with session.client.open_sftp() as sftp:
+            for name in ARTIFACT_TOOLS:
+                sftp.put(os.path.join(REPO_DIR, name), f"{ARTIFACT_DIR}/{name}")
+
+    def upload_delta(session):
+        label = session.host.label
+        local_sig = os.path.join(artifact.workdir, f"{label.replace(':', '_')}.sig")
+        with session.client.open_sftp() as sftp:
+            sftp.get(remote_sig, local_sig)
+            delta_path, stats = artifact.delta_for(local_sig)
+            started = time.monotonic()
+            sftp.put(delta_path, remote_delta)
+        seconds = time.monotonic() - started
+        session.result['uploaded'] = stats['delta_size']
+        log(label, f"✓ 已上传增量 {stats['delta_size'] / 1024:.1f} KB（构建包 {stats['size'] / 1024 / 1024:.1f} MB，"
+                   f"复用 {stats['copied_bytes'] * 100 / max(stats['size'], 1):.0f}%，上传 {seconds:.1f}s）")
+
+    def deploy(session):
+        # 部署包含依赖安装和健康检查，只受主机总时限约束
+        session.run(f"python3 {ARTIFACT_DIR}/update-server.py --artifact {remote_new} {server_args}".rstrip(),
+                    timeout=session.host_timeout)
+
+    return [
+        upload_tools,
+        f"{delta_tool} signature {ARTIFACT_BASIS} {remote_sig} --block-size {artifact.block_size}",
+        upload_delta,
+        f"{delta_tool} patch {ARTIFACT_BASIS} {remote_delta} {remote_new} && rm -f {remote_sig} {remote_delta}",
+        deploy,
     ]
-    
+
+
+def fan_out(pool, hosts, steps, parallel, host_timeout=HOST_TIMEOUT, command_timeout=COMMAND_TIMEOUT):
+    """在最多 parallel 台主机上并发执行计划，返回按清单顺序排列的结果"""
+    results = {}
+    mux = ChannelMux()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(hosts)))) as executor:
+            futures = {executor.submit(run_plan, pool, mux, host, steps, host_timeout, command_timeout): host
+                       for host in hosts}
+            for future in as_completed(futures):
+                result = future.result()
+                results[result['host']] = result
+                mark = '✓' if result['ok'] else '✗'
+                log(result['host'], f"{mark} 执行 {len(result['commands'])} 条命令，耗时 {result['seconds']:.1f}s")
+    finally:
+        mux.close()
+    return [results[host.label] for host in hosts]
+
+
+def parse_waves(spec, total):
+    """把 "1,50%,100%" 解析为每批结束时累计更新的主机数；最后一批总是覆盖全部主机"""
+    targets = []
+    for item in spec.split(','):
+        item = item.strip()
+        count = -(-int(item[:-1]) * total // 100) if item.endswith('%') else int(item)
+        count = max(1, min(total, count))
+        if not targets or count > targets[-1]:
+            targets.append(count)
+    if not targets or targets[-1] < total:
+        targets.append(total)
+    return targets
+
+
+async def probe_backend(url, seconds=PROBE_SECONDS, rps=PROBE_RPS, concurrency=PROBE_CONCURRENCY,
+                        routes=PROBE_ROUTES):
+    """以固定速率轮流请求只读接口，返回 load_test.LatencyStats（延迟从计划发送时刻算起）"""
+    pool = load_test.HTTPConnectionPool(url, size=concurrency, timeout=5)
+    stats = load_test.LatencyStats()
+    pacer = load_test.Pacer(rps)
+    deadline = time.monotonic() + seconds
+
+    async def worker(n):
+        while True:
+            intended = await pacer.wait()
+            if intended >= deadline:
+                return
+            route = routes[n % len(routes)]
+            n += concurrency
+            try:
+                status, _ = await pool.request('GET', route)
+            except load_test.HTTPError:
+                status = 0
+            stats.record(route, (time.monotonic() - intended) * 1000, status)
+
+    try:
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    finally:
+        await pool.close()
+    return stats
+
+
+def probe_hosts(hosts, seconds=PROBE_SECONDS, rps=PROBE_RPS):
+    """同时探测多台主机，返回 {主机: LatencyStats}；同时进行保证新旧主机处在相同的外部条件下"""
+    async def probe_all():
+        return await asyncio.gather(*(probe_backend(host.url, seconds, rps) for host in hosts))
+
+    return dict(zip((host.label for host in hosts), asyncio.run(probe_all())))
+
+
+def describe_stats(stats_list):
+    """合并若干台主机的探测结果，返回 {count, errors, error_rate, p50, p95, p99}（毫秒）"""
+    total = load_test.HdrHistogram()
+    errors = 0
+    for stats in stats_list:
+        total.add(stats.combined())
+        errors += sum(stats.errors.values())
+    return {
+        'count': total.total,
+        'errors': errors,
+        'error_rate': errors / total.total if total.total else 0.0,
+        'p50': total.percentile(50) / 1000,
+        'p95': total.percentile(95) / 1000,
+        'p99': total.percentile(99) / 1000,
+    }
+
+
+def pulled(result):
+    """git pull 是否已在这台主机上成功执行"""
+    return any(command['command'] == PULL_COMMAND and command['status'] == 0 for command in result['commands'])
+
+
+def min_samples(percentile, tail_samples=CANARY_MIN_TAIL_SAMPLES):
+    """percentile 分位数至少需要的请求数，样本更少时分位数只由一两个离群值决定"""
+    return math.ceil(tail_samples * 100 / (100 - percentile))
+
+
+def latency_gate(candidate, reference, max_ratio=CANARY_MAX_RATIO, min_ms=CANARY_MIN_MS,
+                 max_error_delta=CANARY_MAX_ERROR_DELTA):
+    """比较新版本主机与对照组，返回未通过的原因（空列表表示通过）
+
+    样本数不足 min_samples() 的分位数不参与门控，只打印提示。
+    """
+    if not candidate['count']:
+        return ["探测没有得到任何响应"]
+    problems = []
+    for key in ('p95', 'p99'):
+        needed = min_samples(int(key[1:]))
+        count = min(candidate['count'], reference['count'])
+        if count < needed:
+            print(f"  ⚠️ {key} 样本不足（{count} < {needed}），跳过 {key} 门控；可增大 --probe-seconds 或 --probe-rps")
+            continue
+        if candidate[key] > reference[key] * max_ratio and candidate[key] - reference[key] > min_ms:
+            problems.append(f"{key} {candidate[key]:.1f}ms，对照组 {reference[key]:.1f}ms")
+    if candidate['error_rate'] > reference['error_rate'] + max_error_delta:
+        problems.append(f"错误率 {candidate['error_rate']:.2%}，对照组 {reference['error_rate']:.2%}")
+    return problems
+
+
+def print_probe_table(rows):
+    print(f"  {'':<28}{'请求数':>8}{'错误率':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for name, r in rows:
+        print(f"  {name:<28}{r['count']:>8}{r['error_rate']:>9.2%}{r['p50']:>10.1f}{r['p95']:>10.1f}{r['p99']:>10.1f}")
+
+
+def canary_rollout(pool, hosts, steps, rollback_steps, waves=CANARY_WAVES, parallel=4, host_timeout=HOST_TIMEOUT,
+                   command_timeout=COMMAND_TIMEOUT, probe_seconds=PROBE_SECONDS, probe_rps=PROBE_RPS,
+                   max_ratio=CANARY_MAX_RATIO, on_failure='rollback', dry_run=False):
+    """分批更新主机，每批更新后与仍在运行旧版本的主机对比延迟，不通过则停止并按 on_failure 处理
+
+    第一批即金丝雀。最后一批没有未更新的主机可作对照，改为与发布前同一批主机的基线比较。
+    回滚更新步骤成功的主机，以及 git pull 已成功、后续步骤失败的主机（代码已经变了）；
+    制品发布中失败的主机由 update-server.py 自己的健康检查处理，避免重复回滚。
+    返回 (是否全部通过, 各主机更新结果)。
+    """
+    targets = parse_waves(waves, len(hosts))
+    print(f"\n发布计划: {len(hosts)} 台主机，分 {len(targets)} 批（累计 {' → '.join(map(str, targets))} 台）")
+    expected = int(probe_seconds * probe_rps)
+    if expected < min_samples(99):
+        print(f"  ⚠️ 每台主机每次探测约 {expected} 个请求，p99 至少需要 {min_samples(99)} 个，"
+              f"请求数不足的批次不检查 p99")
+    print(f"\n采集发布前基线（{probe_seconds}s，每台 {probe_rps} req/s）...")
+    baseline = probe_hosts(hosts, probe_seconds, probe_rps)
+    print_probe_table([(label, describe_stats([stats])) for label, stats in baseline.items()])
+
+    results = []
+    updated = []
+    done = 0
+    for n, target in enumerate(targets, 1):
+        wave = hosts[done:target]
+        control = hosts[target:]
+        print(f"\n{'=' * 50}\n第 {n}/{len(targets)} 批{'（金丝雀）' if n == 1 else ''}: "
+              f"{', '.join(host.label for host in wave)}\n{'=' * 50}")
+        if dry_run:
+            wave_results = [{'host': host.label, 'ok': True, 'commands': [], 'error': None, 'tail': [], 'seconds': 0.0}
+                            for host in wave]
+            print("  （演练模式，跳过更新）")
+        else:
+            wave_results = fan_out(pool, wave, steps, parallel, host_timeout, command_timeout)
+        results += wave_results
+        updated += [host for host, result in zip(wave, wave_results) if result['ok'] or pulled(result)]
+        done = target
+
+        problems = [f"{result['host']} 更新失败: {result['error']}" for result in wave_results if not result['ok']]
+        if not problems:
+            print(f"\n探测本批主机{'与未更新主机' if control else ''}（{probe_seconds}s）...")
+            probed = probe_hosts(wave + control, probe_seconds, probe_rps)
+            candidate = describe_stats([probed[host.label] for host in wave])
+            if control:
+                reference = describe_stats([probed[host.label] for host in control])
+                reference_name = f"对照组（{len(control)} 台未更新）"
+            else:
+                reference = describe_stats([baseline[host.label] for host in wave])
+                reference_name = "对照组（发布前基线）"
+            print_probe_table([(host.label, describe_stats([probed[host.label]])) for host in wave] +
+                              [("本批合计", candidate), (reference_name, reference)])
+            problems = latency_gate(candidate, reference, max_ratio)
+
+        if problems:
+            print(f"\n❌ 第 {n} 批未通过:")
+            for problem in problems:
+                print(f"  - {problem}")
+            if on_failure == 'rollback' and updated:
+                print(f"\n回滚已更新的 {len(updated)} 台主机: {', '.join(host.label for host in updated)}")
+                if not dry_run:
+                    rollback_results = fan_out(pool, updated, rollback_steps, parallel, host_timeout, command_timeout)
+                    for result in rollback_results:
+                        if not result['ok']:
+                            print(f"  ✗ {result['host']} 回滚失败: {result['error']}")
+            else:
+                print(f"\n已停止发布，{len(hosts) - done} 台主机保持旧版本")
+            return False, results
+        print(f"\n✓ 第 {n} 批通过")
+    return True, results
+
+
+def print_summary(results, elapsed):
+    print("\n更新汇总:")
+    for result in results:
+        status = '✓ 成功' if result['ok'] else f"✗ 失败（{result['error']}）"
+        uploaded = f"  上传 {result['uploaded'] / 1024:.1f} KB" if 'uploaded' in result else ''
+        print(f"  {result['host']:<24} {result['seconds']:>6.1f}s  {status}{uploaded}")
+        for command in result['commands']:
+            print(f"      {command['seconds']:>6.1f}s  {command['command']}")
+    slowest = max(result['seconds'] for result in results)
+    print(f"  共 {len(results)} 台，总耗时 {elapsed:.1f}s（最慢主机 {slowest:.1f}s）")
+
+    for result in results:
+        if not result['ok'] and result['tail']:
+            print(f"\n{result['host']} 最后 {len(result['tail'])} 行输出:")
+            for name, line in result['tail']:
+                print(f"  {'! ' if name == 'err' else ''}{line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='通过 SSH 更新服务器')
+    parser.add_argument('--inventory', help='主机清单文件，每行 [user@]host[:port] [探测地址]')
+    parser.add_argument('--host', action='append', default=[], help='要更新的主机，可重复指定')
+    parser.add_argument('--parallel', type=int, default=4, help='同时更新的主机数')
+    parser.add_argument('--host-timeout', type=float, default=HOST_TIMEOUT, help='每台主机的总时限（秒）')
+    parser.add_argument('--command-timeout', type=float, default=COMMAND_TIMEOUT, help='单条命令的时限（秒）')
+    parser.add_argument('--artifact', nargs='?', const='HEAD', metavar='REV',
+                        help='本地打包 REV（默认 HEAD）并增量上传，服务器不再执行 git pull；'
+                             '首次使用会把服务器迁移为版本目录布局，之后只能继续使用 --artifact')
+    parser.add_argument('--block-size', type=int, default=delta_transfer.BLOCK_SIZE, help='增量比对的块大小（字节）')
+    parser.add_argument('--server-args', default='', help='传给服务器上 update-server.py 的额外参数，如 "--rolling"')
+    parser.add_argument('--canary', action='store_true', help='分批灰度发布，每批更新后对比延迟再继续')
+    parser.add_argument('--waves', default=CANARY_WAVES, help='每批结束时累计更新的主机数，如 1,50%%,100%%')
+    parser.add_argument('--probe-seconds', type=float, default=PROBE_SECONDS, help='每次探测的时长（秒）')
+    parser.add_argument('--probe-rps', type=float, default=PROBE_RPS, help='每台主机的探测请求速率')
+    parser.add_argument('--max-ratio', type=float, default=CANARY_MAX_RATIO, help='p95/p99 超过对照组多少倍视为回归')
+    parser.add_argument('--on-failure', choices=['rollback', 'halt'], default='rollback',
+                        help='某批未通过时回滚已更新的主机，或只停止发布')
+    parser.add_argument('--dry-run', action='store_true', help='配合 --canary 演练探测和门控，不连接服务器')
+    args = parser.parse_args()
+    if args.dry_run and not args.canary:
+        parser.error("--dry-run 只能与 --canary 一起使用")
+
+    paramiko = None
+    if not args.dry_run:
+        try:
+            import paramiko
+        except ImportError:
+            print("❌ 需要安装 paramiko: pip install paramiko")
+            sys.exit(1)
+
+    hosts = [Host.parse(spec) for spec in args.host]
+    if args.inventory:
+        hosts += load_inventory(args.inventory)
+    if not hosts:
+        hosts = [Host(HOSTNAME)]
+
+    artifact = None
+    steps = COMMANDS
+    rollback_steps = ROLLBACK_COMMANDS
+    if args.artifact and not args.dry_run:
+        try:
+            artifact = ArtifactUpload(args.artifact, args.block_size)
+        except (subprocess.CalledProcessError, RuntimeError) as e:
+            print(f"❌ 打包失败: {e}")
+            sys.exit(1)
+        steps = artifact_plan(artifact, args.server_args)
+        rollback_steps = [f"python3 {ARTIFACT_DIR}/update-server.py --rollback {args.server_args}".rstrip()]
+
+    pool = SSHConnectionPool(paramiko) if paramiko else None
+    started = time.monotonic()
+    passed = True
     try:
-        import paramiko
-        
-        print(f"正在连接 {hostname}...")
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        client.connect(hostname, username=username, password=password, timeout=30)
-        
-        for cmd in commands:
-            print(f"\n执行: {cmd}")
-            stdin, stdout, stderr = client.exec_command(cmd, timeout=60)
-            # 如果需要输入密码（sudo等情况）
-            if 'sudo' in cmd:
-                stdin.write(password + '\n')
-                stdin.flush()
-            
-            output = stdout.read().decode()
-            error = stderr.read().decode()
-            
-            if output:
-                print(f"输出:\n{output}")
-            if error:
-                print(f"错误:\n{error}")
-        
-        client.close()
-        print("\n✅ 服务器更新完成！")
-        
-    except ImportError:
-        print("❌ 需要安装 paramiko: pip install paramiko")
+        if args.canary:
+            passed, results = canary_rollout(
+                pool, hosts, steps, rollback_steps, args.waves, args.parallel, args.host_timeout,
+                args.command_timeout, args.probe_seconds, args.probe_rps, args.max_ratio, args.on_failure,
+                args.dry_run)
+        else:
+            results = fan_out(pool, hosts, steps, args.parallel, args.host_timeout, args.command_timeout)
+    finally:
+        if pool:
+            pool.close_all()
+        if artifact:
+            artifact.cleanup()
+
+    print_summary(results, time.monotonic() - started)
+    if not passed:
+        print("\n❌ 灰度发布未通过，已停止")
         sys.exit(1)
-    except Exception as e:
-        print(f"❌ 连接失败: {e}")
+    if not all(result['ok'] for result in results):
+        print("\n❌ 部分服务器更新失败")
         sys.exit(1)
+    print("\n✅ 服务器更新完成！")
+
 
 if __name__ == "__main__":
     main()
@@ -5,28 +5,125 @@
 自动处理换行符问题，支持跨平台使用
 支持非git仓库部署环境
 用法: python3 update-server.py
+      python3 update-server.py --rollback   # 切换回上一个版本目录（仅非 git 部署）
+      python3 update-server.py --rolling    # 零停机滚动重启（需要 nginx upstream 配置）
+      python3 update-server.py --artifact release.tar   # 解包 ssh_update.py --artifact 上传的构建包，不执行 git
 """
 
 import os
 import sys
+import json
+import argparse
+import stat
+import time
 import shutil
+import io
+import re
+import zlib
+import queue
+import fnmatch
+import tarfile
+import random
+import signal
+import hashlib
+import http.client
+import platform
 import subprocess
 import datetime
 from pathlib import Path
 import tempfile
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # 配置
 PROJECT_DIR = "/var/www/food-subscription-v01.1-backup"
 GIT_REPO = "https://codehub.devcloud.cn-north-4.huaweicloud.com/a384bf0b99f140dbaa16281939ab38b1/huawei_food_subscription.git"
 BACKUP_DIR = f"/var/www/backups/food-subscription-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}"
 
-# 需要保留的目录和文件（不会被覆盖）
-PRESERVE_ITEMS = ['uploads', '.env', 'data', 'node_modules']
+# 需要保留的目录和文件（不会被覆盖），按相对项目根目录的路径匹配
+# backend/uploads 是 server.js 保存上传文件的目录，backend/.env 供后端读取环境变量
+PRESERVE_ITEMS = ['uploads', '.env', 'data', 'node_modules', 'backend/uploads', 'backend/.env']
+
+# 版本目录布局（非 git 部署）:
+#   RELEASES_DIR/<时间戳>/   每次部署的完整代码，保留项是指向 SHARED_DIR 的符号链接
+#   SHARED_DIR/<保留项>      各版本共享的 uploads、.env、data、node_modules、backend/uploads 等
+#   PROJECT_DIR              指向当前版本的符号链接，nginx 和 PM2 都通过它访问代码
+RELEASES_DIR = "/var/www/food-subscription-releases"
+SHARED_DIR = "/var/www/food-subscription-shared"
+RELEASE_ID = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+KEEP_RELEASES = 5
+ARTIFACT_DIR = "/var/www/food-subscription-artifacts"
+ARTIFACT_BASIS = os.path.join(ARTIFACT_DIR, "current.tar")   # 下次增量上传的基准
+
+# 后端 node_modules 缓存：以 lockfile、Node 版本和平台的哈希为键，依赖未变化时直接链接，不再运行 npm
+DEPS_CACHE_DIR = "/var/www/food-subscription-cache/node_modules"
+DEPS_CACHE_KEEP = 3
+DEPS_INPUT_FILES = ["package.json", "package-lock.json", "npm-shrinkwrap.json"]
+
+# 部署步骤执行器的并行度（步骤内部的文件复制另有 COPY_WORKERS 线程）
+DEPLOY_WORKERS = 4
+
+# 部署耗时历史（每次部署追加一行 JSON），--report 据此统计各步骤的 p50/p95
+DEPLOY_HISTORY = "/var/www/backups/deploy-history.jsonl"
+REPORT_LAST = 20
+REGRESSION_RATIO = 1.5     # 本次耗时超过历史中位数的倍数
+REGRESSION_MIN_SECONDS = 1.0
+
+# 重启后的就绪检查与冒烟压测
+BACKEND_HOST = "localhost"
+BACKEND_PORT = 3001
+READY_DEADLINE = 60        # 等待 /api/health 就绪的最长时间（秒）
+READY_MAX_DELAY = 2.0      # 轮询间隔指数退避的上限（秒）
+SMOKE_ROUTES = ['/api/food-packages', '/api/food-packages/recommended', '/api/food-packages/limited']
+SMOKE_WARMUP = 5           # 每个接口预热请求数（不计入统计）
+SMOKE_REQUESTS = 30        # 每个接口计入统计的请求数
+SMOKE_MAX_RATIO = 1.5      # p95 超过上次部署基线的倍数视为回归
+SMOKE_MIN_MS = 20.0        # 且至少比基线慢这么多毫秒，避免毫秒级抖动误报
+SMOKE_ON_REGRESSION = 'rollback'   # warn / fail / rollback
+
+# 滚动重启：新实例在另一个端口启动，就绪后改写 nginx upstream 并 reload，旧实例处理完请求后停止
+NGINX_UPSTREAM_FILE = "/etc/nginx/food-subscription-upstream.conf"
+BACKEND_PORTS = (3001, 3002)
+PM2_APP = "food-subscription-backend"
+PID_DIR = "/var/run/food-subscription"
+DRAIN_SECONDS = 10         # reload 后等待旧 nginx worker 处理完转发中请求的时间
+STOP_TIMEOUT = 15          # 发送 SIGTERM 后等待旧实例退出的最长时间
+
+# 当前线程所属部署步骤的上下文（输出缓冲和耗时指标），由 run_steps 设置
+_step_context = threading.local()
+
+# 备份快照的文件索引（相对路径 -> 大小、修改时间、内容哈希），存放在每个快照目录内
+BACKUP_PREFIX = "food-subscription-"
+BACKUP_INDEX = ".backup-index.json"
+
+# 归档备份（--backup-format tar.gz / tar.zst）：整个项目流式打包成一个压缩文件
+ARCHIVE_SUFFIXES = {'tar.gz': '.tar.gz', 'tar.zst': '.tar.zst'}
+ARCHIVE_EXCLUDES = ['node_modules']   # 按路径或文件名匹配（fnmatch），node_modules 可由依赖缓存重建
+ARCHIVE_CHUNK = 1024 * 1024           # 打包线程交给压缩线程的块大小
+ARCHIVE_QUEUE_CHUNKS = 16             # 在途块数上限，内存占用不超过 ARCHIVE_CHUNK * ARCHIVE_QUEUE_CHUNKS
+
+# 复制引擎：大量小文件时瓶颈在逐个 open/stat/close 的等待上，多线程可以把这些 I/O 重叠起来
+COPY_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+COPY_CHUNK = 64 * 1024 * 1024     # 单次 copy_file_range 的最大字节数
+COPY_BUFFER = 1024 * 1024         # 不支持零拷贝时的用户态缓冲区大小
+
+def record_metric(name, value):
+    """给当前部署步骤累加一项指标（不在步骤中执行时忽略）"""
+    metrics = getattr(_step_context, 'metrics', None)
+    if metrics is not None:
+        metrics[name] = metrics.get(name, 0) + value
 
 def run_command(cmd, cwd=None, check=True):
     """执行命令并返回结果"""
     print(f"  执行: {cmd}")
+    started = time.monotonic()
     result = subprocess.run(cmd, shell=True, cwd=cwd, capture_output=True, text=True)
+    elapsed = time.monotonic() - started
+    record_metric('subprocess_seconds', elapsed)
+    metrics = getattr(_step_context, 'metrics', None)
+    if metrics is not None:
+        metrics.setdefault('subprocesses', []).append({'cmd': cmd, 'seconds': round(elapsed, 3), 'returncode': result.returncode})
     if result.stdout:
         print(result.stdout.strip())
     if result.stderr:
@@ -57,34 +154,461 @@ def is_git_repo(path):
     git_dir = os.path.join(path, '.git')
     return os.path.isdir(git_dir)
 
-def backup_current():
-    """备份当前版本"""
+def copy_file_fast(src, dst):
+    """复制单个文件内容和元数据，返回复制的字节数
+
+    优先使用 os.copy_file_range（内核内复制，支持时还会走 reflink），
+    不可用（跨文件系统、旧内核、特殊文件系统）时退回 1MB 缓冲区的 copyfileobj。
+    """
+    copied = 0
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while True:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), COPY_CHUNK)
+                    if not n:
+                        break
+                    copied += n
+            except OSError:
+                fsrc.seek(copied)
+                fdst.seek(copied)
+                fdst.truncate()
+                copied += copy_stream(fsrc, fdst)
+        else:
+            copied = copy_stream(fsrc, fdst)
+    shutil.copystat(src, dst)
+    return copied
+
+def copy_stream(fsrc, fdst):
+    """用大缓冲区在两个文件对象之间复制，返回字节数"""
+    copied = 0
+    while True:
+        block = fsrc.read(COPY_BUFFER)
+        if not block:
+            return copied
+        fdst.write(block)
+        copied += len(block)
+
+class CopyEngine:
+    """共享的并行复制引擎
+
+    目录和符号链接在调用线程中按遍历顺序创建，文件的复制（或自定义的 file_op）
+    提交到有界线程池执行；待执行任务数有上限，且不保留已完成任务的 Future，只记下第一个异常，
+    遍历再大的目录树内存也不会随文件数增长。collect=True 时收集 file_op 的返回值到 results，
+    供需要逐文件结果的调用方（如 snapshot_tree）使用，此时内存与返回值个数成正比。
+    用法:
+        engine = CopyEngine()
+        engine.copy_tree(src, dst)
+        engine.copy_file(src_file, dst_file)
+        engine.finish("前端文件")
+    """
+
+    def __init__(self, workers=COPY_WORKERS, collect=False):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.pending = threading.BoundedSemaphore(workers * 64)
+        self.lock = threading.Lock()
+        self.collect = collect
+        self.error = None
+        self.dir_pairs = []
+        self.results = []
+        self.files = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+
+    def _run(self, fn, args):
+        try:
+            # 已有任务失败时跳过剩余任务，finish 会抛出第一个异常
+            if self.error is not None:
+                return
+            result = fn(*args)
+            with self.lock:
+                self.files += 1
+                if self.collect and result is not None:
+                    self.results.append(result)
+        except BaseException as e:
+            with self.lock:
+                if self.error is None:
+                    self.error = e
+        finally:
+            self.pending.release()
+
+    def submit(self, fn, *args):
+        """在线程池中执行 fn(*args)；collect=True 时返回值收集到 results（None 除外）"""
+        self.pending.acquire()
+        self.pool.submit(self._run, fn, args)
+
+    def add_bytes(self, n):
+        with self.lock:
+            self.bytes += n
+
+    def _copy(self, src, dst):
+        self.add_bytes(copy_file_fast(src, dst))
+
+    def copy_file(self, src, dst):
+        self.submit(self._copy, src, dst)
+
+    def copy_tree(self, src_dir, dst_dir, file_op=None, follow=()):
+        """把 src_dir 镜像到 dst_dir
+
+        file_op(src, dst, rel, st) 处理每个普通文件，默认直接复制；
+        rel 是相对 src_dir 的路径，st 是 lstat 结果。
+        符号链接默认按链接本身保存，follow 中列出的相对路径则复制链接指向的内容。
+        """
+        file_op = file_op or (lambda src, dst, rel, st: self._copy(src, dst))
+        follow = set(follow)
+        try:
+            self._walk(src_dir, dst_dir, file_op, follow)
+        except BaseException:
+            # 遍历中途出错时没有人会再调用 finish，这里关闭线程池，避免工作线程泄漏
+            self.close()
+            raise
+
+    def _walk(self, src_dir, dst_dir, file_op, follow):
+        # followlinks=True 只是允许进入 follow 中的目录，其余指向目录的链接在下面被剔除
+        for root, dirs, files in os.walk(src_dir, followlinks=True):
+            rel_root = os.path.relpath(root, src_dir)
+            out_root = dst_dir if rel_root == '.' else os.path.join(dst_dir, rel_root)
+            os.makedirs(out_root, exist_ok=True)
+            self.dir_pairs.append((root, out_root))
+
+            kept = []
+            for name in dirs:
+                src = os.path.join(root, name)
+                if not os.path.islink(src) or os.path.normpath(os.path.join(rel_root, name)) in follow:
+                    kept.append(name)
+                else:
+                    os.symlink(os.readlink(src), os.path.join(out_root, name))
+            dirs[:] = kept
+
+            for name in files:
+                src = os.path.join(root, name)
+                dst = os.path.join(out_root, name)
+                rel = os.path.normpath(os.path.join(rel_root, name))
+                st = os.lstat(src)
+                if stat.S_ISLNK(st.st_mode) and rel in follow and os.path.exists(src):
+                    st = os.stat(src)
+                if stat.S_ISLNK(st.st_mode):
+                    os.symlink(os.readlink(src), dst)
+                elif stat.S_ISREG(st.st_mode):
+                    self.submit(file_op, src, dst, rel, st)
+
+    def close(self):
+        """取消尚未开始的任务并关闭线程池，等待正在执行的任务结束"""
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def finish(self, label=None):
+        """等待全部任务完成并恢复目录属性；任一任务失败时抛出第一个异常"""
+        self.pool.shutdown(wait=True)
+        if self.error is not None:
+            raise self.error
+        # 子目录写完后再恢复目录属性，否则修改时间会被后续写入覆盖
+        for root, out_root in reversed(self.dir_pairs):
+            shutil.copystat(root, out_root)
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        record_metric('files', self.files)
+        record_metric('bytes_copied', self.bytes)
+        if label:
+            print(f"    {label}: {self.files} 个文件，{self.bytes / 1024 / 1024:.1f} MB，"
+                  f"耗时 {elapsed:.1f}s（{self.bytes / 1024 / 1024 / elapsed:.1f} MB/s，{self.files / elapsed:.0f} 文件/秒）")
+        return {'files': self.files, 'bytes': self.bytes, 'seconds': elapsed}
+
+def file_digest(path):
+    """计算文件内容哈希（blake2b-128）"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def backup_timestamp(backup_path):
+    """从备份目录名中提取时间戳，返回 datetime 对象"""
+    dir_name = os.path.basename(backup_path)
+    for suffix in ARCHIVE_SUFFIXES.values():
+        if dir_name.endswith(suffix):
+            dir_name = dir_name[:-len(suffix)]
+    try:
+        # 目录名格式: food-subscription-YYYYMMDD-HHMMSS（归档文件再加 .tar.gz / .tar.zst）
+        if dir_name.startswith(BACKUP_PREFIX):
+            timestamp_str = dir_name[len(BACKUP_PREFIX):]
+            # 格式: YYYYMMDD-HHMMSS
+            return datetime.datetime.strptime(timestamp_str, "%Y%m%d-%H%M%S")
+    except (ValueError, IndexError):
+        pass
+    # 如果解析失败，使用文件修改时间
+    return datetime.datetime.fromtimestamp(os.path.getmtime(backup_path))
+
+def list_backups(backup_parent):
+    """列出已完成的备份（快照目录和归档文件），最新的在前（忽略未完成的 .partial）"""
+    backup_dirs = []
+    for item in os.listdir(backup_parent):
+        backup_path = os.path.join(backup_parent, item)
+        if not item.startswith(BACKUP_PREFIX) or item.endswith('.partial'):
+            continue
+        if os.path.isdir(backup_path) or item.endswith(tuple(ARCHIVE_SUFFIXES.values())):
+            backup_dirs.append(backup_path)
+    backup_dirs.sort(key=backup_timestamp, reverse=True)
+    return backup_dirs
+
+def load_backup_index(backup_dir):
+    """读取快照的文件索引；旧版本的完整复制备份没有索引，返回空字典"""
+    try:
+        with open(os.path.join(backup_dir, BACKUP_INDEX), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def snapshot_tree(src_dir, dst_dir, base_dir=None, follow=()):
+    """把 src_dir 做成快照 dst_dir，未变化的文件硬链接到上一个快照 base_dir
+
+    判断文件未变化的顺序:
+      1. 大小和修改时间都与上一个快照索引一致 -> 直接硬链接，不读文件内容
+      2. 否则计算内容哈希，上一个快照中有相同内容的文件（任意路径）-> 硬链接
+      3. 都不满足 -> 复制
+    git clone 方式更新会刷新所有文件的修改时间，第 2 步保证内容没变的文件仍然共享存储。
+    快照中的文件只读不改，硬链接共享是安全的；删除旧快照只会减少链接数。
+    follow 中的符号链接（版本目录里指向 shared 的保留项）按内容备份。
+    """
+    base_index = load_backup_index(base_dir) if base_dir else {}
+    by_digest = {entry['digest']: rel for rel, entry in base_index.items()}
+    engine = CopyEngine(collect=True)
+
+    def link_from_base(rel_base, dst):
+        try:
+            os.link(os.path.join(base_dir, rel_base), dst)
+            return True
+        except OSError:
+            # 跨文件系统、链接数达到上限或基准文件已被删除时退回复制
+            return False
+
+    def snapshot_file(src, dst, rel, st):
+        prev = base_index.get(rel)
+        if prev and prev['size'] == st.st_size and prev['mtime_ns'] == st.st_mtime_ns:
+            digest = prev['digest']
+        else:
+            digest = file_digest(src)
+        match = rel if prev and prev['digest'] == digest else by_digest.get(digest)
+
+        linked = match is not None and link_from_base(match, dst)
+        if not linked:
+            engine.add_bytes(copy_file_fast(src, dst))
+        return rel, {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'digest': digest}, linked
+
+    engine.copy_tree(src_dir, dst_dir, snapshot_file, follow)
+    engine.finish()
+
+    index = {}
+    stats = {'linked': 0, 'copied': 0, 'copied_bytes': engine.bytes, 'total_bytes': 0, 'seconds': 0.0}
+    for rel, entry, linked in engine.results:
+        index[rel] = entry
+        stats['linked' if linked else 'copied'] += 1
+        stats['total_bytes'] += entry['size']
+    stats['seconds'] = time.monotonic() - engine.started
+
+    with open(os.path.join(dst_dir, BACKUP_INDEX), 'w', encoding='utf-8') as f:
+        json.dump(index, f, separators=(',', ':'))
+    return stats
+
+class _ChunkWriter:
+    """tarfile 的输出端：把小块写入攒成 ARCHIVE_CHUNK 大小后放入有界队列"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = bytearray()
+        self.bytes = 0
+
+    def write(self, data):
+        self.buffer += data
+        self.bytes += len(data)
+        if len(self.buffer) >= ARCHIVE_CHUNK:
+            self.chunks.put(bytes(self.buffer))
+            self.buffer.clear()
+        return len(data)
+
+    def close(self):
+        if self.buffer:
+            self.chunks.put(bytes(self.buffer))
+            self.buffer.clear()
+        self.chunks.put(None)
+
+def archive_compressor(fmt, out):
+    """返回 (compress, finish)：compress(data) 压缩一块并写入 out，finish() 写出剩余数据
+
+    tar.gz 使用 zlib；tar.zst 优先使用 zstandard 模块，没有时通过 zstd 命令行在独立进程中压缩。
+    zlib 和 zstandard 压缩时都会释放 GIL，与打包线程的磁盘读取可以真正并行。
+    """
+    if fmt == 'tar.gz':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        return (lambda data: out.write(compressor.compress(data))), (lambda: out.write(compressor.flush()))
+    try:
+        import zstandard
+    except ImportError:
+        zstandard = None
+    if zstandard is not None:
+        writer = zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(out, closefd=False)
+        return writer.write, writer.close
+    if shutil.which('zstd') is None:
+        raise RuntimeError("tar.zst 需要安装 zstandard (pip install zstandard) 或 zstd 命令")
+    out.flush()
+    proc = subprocess.Popen(['zstd', '-q', '-3', '-T0', '-c'], stdin=subprocess.PIPE, stdout=out.fileno())
+
+    def finish():
+        proc.stdin.close()
+        if proc.wait() != 0:
+            raise RuntimeError(f"zstd 退出码 {proc.returncode}")
+    return proc.stdin.write, finish
+
+def is_excluded(rel, excludes):
+    """rel 或其中任一级目录名匹配 excludes 中的模式"""
+    parts = rel.split(os.sep)
+    return any(fnmatch.fnmatch(rel, pattern) or any(fnmatch.fnmatch(part, pattern) for part in parts)
+               for pattern in excludes)
+
+def archive_tree(src_dir, archive_path, fmt='tar.gz', excludes=ARCHIVE_EXCLUDES, follow=()):
+    """把 src_dir 流式打包压缩为 archive_path，返回统计信息
+
+    打包（读文件）在调用线程，压缩和写盘在另一个线程，中间是有界队列：
+    内存占用与项目大小无关，读盘、压缩、写盘三者重叠进行。
+    先写入 .partial 临时文件，完成后改名，中断时不会留下看似完整的归档。
+    follow 中的符号链接（版本目录里指向 shared 的保留项）按内容打包。
+    """
+    follow = set(follow)
+    partial_path = archive_path + '.partial'
+    chunks = queue.Queue(maxsize=ARCHIVE_QUEUE_CHUNKS)
+    written = {'error': None}
+    started = time.monotonic()
+
+    try:
+        with open(partial_path, 'wb') as out:
+            compress, finish = archive_compressor(fmt, out)
+
+            def compress_loop():
+                try:
+                    while True:
+                        chunk = chunks.get()
+                        if chunk is None:
+                            break
+                        compress(chunk)
+                    finish()
+                except Exception as e:
+                    written['error'] = e
+                    # 继续取走剩余的块，避免打包线程阻塞在满队列上
+                    while chunks.get() is not None:
+                        pass
+
+            worker = threading.Thread(target=compress_loop, name='backup-compress')
+            worker.start()
+            writer = _ChunkWriter(chunks)
+            files = 0
+            try:
+                with tarfile.open(fileobj=writer, mode='w|', format=tarfile.PAX_FORMAT) as tar:
+                    for root, dirs, names in os.walk(src_dir, followlinks=True):
+                        rel_root = os.path.relpath(root, src_dir)
+                        kept = []
+                        for name in sorted(dirs):
+                            path = os.path.join(root, name)
+                            rel = os.path.normpath(os.path.join(rel_root, name))
+                            if is_excluded(rel, excludes):
+                                continue
+                            if os.path.islink(path) and rel not in follow:
+                                tar.add(path, rel, recursive=False)
+                                continue
+                            info = tar.gettarinfo(path, rel)
+                            if info.issym():
+                                st = os.stat(path)
+                                info.type, info.linkname, info.mode = tarfile.DIRTYPE, '', st.st_mode & 0o7777
+                            tar.addfile(info)
+                            kept.append(name)
+                        dirs[:] = kept
+
+                        for name in sorted(names):
+                            path = os.path.join(root, name)
+                            rel = os.path.normpath(os.path.join(rel_root, name))
+                            if is_excluded(rel, excludes):
+                                continue
+                            if os.path.islink(path) and (rel not in follow or not os.path.exists(path)):
+                                tar.add(path, rel, recursive=False)
+                            elif os.path.isfile(path):
+                                with open(path, 'rb') as f:
+                                    tar.addfile(tar.gettarinfo(arcname=rel, fileobj=f), f)
+                                files += 1
+                        if written['error']:
+                            raise written['error']
+            finally:
+                writer.close()
+                worker.join()
+            if written['error']:
+                raise RuntimeError(f"压缩失败: {written['error']}")
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        # 失败或中断时删除写了一半的临时文件
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    archive_bytes = os.path.getsize(partial_path)
+    os.replace(partial_path, archive_path)
+    seconds = time.monotonic() - started
+    record_metric('files', files)
+    record_metric('bytes_copied', archive_bytes)
+    return {'files': files, 'raw_bytes': writer.bytes, 'archive_bytes': archive_bytes, 'seconds': seconds}
+
+def backup_current(fmt='snapshot', excludes=ARCHIVE_EXCLUDES):
+    """备份当前版本
+
+    fmt 为 snapshot 时做增量快照（未变化的文件硬链接到上一个快照目录）；
+    为 tar.gz / tar.zst 时流式打包成单个压缩归档，excludes 中的路径不打包。
+    """
     print("\n[1/8] 备份当前版本...")
-    if os.path.exists(PROJECT_DIR):
-        os.makedirs(os.path.dirname(BACKUP_DIR), exist_ok=True)
-        shutil.copytree(PROJECT_DIR, BACKUP_DIR)
-        print(f"  ✓ 备份完成: {BACKUP_DIR}")
+    if not os.path.exists(PROJECT_DIR):
+        raise RuntimeError(f"项目目录不存在: {PROJECT_DIR}")
+    backup_parent = os.path.dirname(BACKUP_DIR)
+    os.makedirs(backup_parent, exist_ok=True)
 
-        # 清理旧备份，只保留最近5个版本
-        print("  清理旧备份...")
-        cleanup_old_backups(keep_count=5)
+    if fmt in ARCHIVE_SUFFIXES:
+        archive_path = BACKUP_DIR + ARCHIVE_SUFFIXES[fmt]
+        if excludes:
+            print(f"  排除: {', '.join(excludes)}")
+        stats = archive_tree(PROJECT_DIR, archive_path, fmt, excludes, follow=PRESERVE_ITEMS)
+        mb = 1024 * 1024
+        print(f"  ✓ 备份完成: {archive_path}")
+        print(f"    {stats['files']} 个文件，{stats['raw_bytes'] / mb:.1f} MB -> {stats['archive_bytes'] / mb:.1f} MB"
+              f"（压缩率 {stats['archive_bytes'] / max(stats['raw_bytes'], 1):.0%}），耗时 {stats['seconds']:.1f}s"
+              f"（读取 {stats['raw_bytes'] / mb / max(stats['seconds'], 1e-9):.1f} MB/s）")
     else:
-        raise RuntimeError(f"项目目录不存在: {PROJECT_DIR}")
+        previous = [path for path in list_backups(backup_parent) if os.path.isdir(path)]
+        base_dir = previous[0] if previous else None
+        if base_dir:
+            print(f"  基准快照: {os.path.basename(base_dir)}")
+
+        # 先写到 .partial 目录，完成后再改名，中断的备份不会被当作基准
+        partial_dir = BACKUP_DIR + '.partial'
+        if os.path.exists(partial_dir):
+            shutil.rmtree(partial_dir)
+        stats = snapshot_tree(PROJECT_DIR, partial_dir, base_dir, follow=PRESERVE_ITEMS)
+        os.rename(partial_dir, BACKUP_DIR)
+        print(f"  ✓ 备份完成: {BACKUP_DIR}")
+        print(f"    硬链接 {stats['linked']} 个文件，复制 {stats['copied']} 个文件"
+              f"（{stats['copied_bytes'] / 1024 / 1024:.1f} MB / 共 {stats['total_bytes'] / 1024 / 1024:.1f} MB），"
+              f"耗时 {stats['seconds']:.1f}s（{stats['copied_bytes'] / 1024 / 1024 / max(stats['seconds'], 1e-9):.1f} MB/s）")
+
+    # 清理旧备份，只保留最近5个版本
+    print("  清理旧备份...")
+    cleanup_old_backups(keep_count=5)
 
 def cleanup_old_backups(keep_count=5):
-    """清理旧的备份，只保留指定数量的最新备份"""
+    """清理旧的备份，只保留指定数量的最新备份
+
+    备份之间通过硬链接共享未变化的文件，删除旧备份不会影响其余备份。
+    """
     backup_parent = os.path.dirname(BACKUP_DIR)  # /var/www/backups
     if not os.path.exists(backup_parent):
         print(f"  ! 备份目录不存在: {backup_parent}")
         return
 
-    # 查找所有 food-subscription- 开头的备份目录
-    backup_dirs = []
+    # 查找所有 food-subscription- 开头的备份目录，按目录名中的时间戳排序（最新的在前）
     try:
-        for item in os.listdir(backup_parent):
-            if item.startswith("food-subscription-") and os.path.isdir(os.path.join(backup_parent, item)):
-                backup_path = os.path.join(backup_parent, item)
-                backup_dirs.append(backup_path)
+        backup_dirs = list_backups(backup_parent)
     except Exception as e:
         print(f"  ! 读取备份目录失败: {e}")
         return
@@ -93,23 +617,6 @@ def cleanup_old_backups(keep_count=5):
         print(f"  ! 未找到备份目录")
         return
 
-    # 按目录名中的时间戳排序（最新的在前）
-    def get_backup_timestamp(backup_path):
-        """从备份目录名中提取时间戳，返回 datetime 对象"""
-        dir_name = os.path.basename(backup_path)
-        try:
-            # 目录名格式: food-subscription-YYYYMMDD-HHMMSS
-            if dir_name.startswith("food-subscription-"):
-                timestamp_str = dir_name[len("food-subscription-"):]
-                # 格式: YYYYMMDD-HHMMSS
-                return datetime.datetime.strptime(timestamp_str, "%Y%m%d-%H%M%S")
-        except (ValueError, IndexError):
-            pass
-        # 如果解析失败，使用文件修改时间
-        return datetime.datetime.fromtimestamp(os.path.getmtime(backup_path))
-
-    backup_dirs.sort(key=get_backup_timestamp, reverse=True)
-
     total_backups = len(backup_dirs)
     if total_backups <= keep_count:
         print(f"  ✓ 备份数量 ({total_backups}) 未超过保留限制 ({keep_count})")
@@ -125,7 +632,10 @@ def cleanup_old_backups(keep_count=5):
     deleted_count = 0
     for backup_dir in backups_to_delete:
         try:
-            shutil.rmtree(backup_dir)
+            if os.path.isdir(backup_dir):
+                shutil.rmtree(backup_dir)
+            else:
+                os.remove(backup_dir)
             print(f"    删除旧备份: {os.path.basename(backup_dir)}")
             deleted_count += 1
         except Exception as e:
@@ -159,7 +669,10 @@ def fix_git_http2():
         pass
 
 def pull_or_clone():
-    """拉取或克隆最新代码"""
+    """拉取或克隆最新代码，返回后续步骤要处理的代码目录
+
+    git 仓库原地更新，返回 PROJECT_DIR；否则构建新的版本目录并返回它，由 restart_service 前切换上线。
+    """
     print("\n[2/8] 拉取最新代码...")
     
     # 先修复可能的 Git 所有权和网络问题
@@ -188,67 +701,213 @@ def pull_or_clone():
             run_command("git fetch origin", cwd=PROJECT_DIR)
             run_command("git reset --hard origin/main", cwd=PROJECT_DIR)
             print("  ✓ 代码更新成功 (git reset --hard)")
-            return
+            return PROJECT_DIR
         except RuntimeError as e:
             print(f"  ✗ git pull 失败: {e}")
             raise
     else:
-        # 不是 git 仓库，使用 git clone + 合并
-        print("  ! 当前目录不是 git 仓库，使用克隆方式更新...")
-        
-        # 创建临时目录
-        temp_dir = tempfile.mkdtemp(prefix="food-subscription-new-")
-        
-        try:
-            # 克隆最新代码到临时目录
-            print(f"  正在克隆仓库到临时目录...")
-            run_command(f"git clone --depth 1 {GIT_REPO} {temp_dir}")
-            
-            # 保留原目录中的特定文件/目录
-            preserve_paths = {}
-            for item in PRESERVE_ITEMS:
-                src_path = os.path.join(PROJECT_DIR, item)
-                if os.path.exists(src_path):
-                    preserve_paths[item] = src_path
-                    print(f"  将保留: {item}")
-            
-            # 删除旧代码（保留保留项）
-            print("  清理旧代码...")
-            for item in os.listdir(PROJECT_DIR):
-                if item in PRESERVE_ITEMS or item.startswith('.'):
-                    continue
-                item_path = os.path.join(PROJECT_DIR, item)
-                if os.path.isdir(item_path):
-                    shutil.rmtree(item_path)
-                else:
-                    os.remove(item_path)
-            
-            # 复制新代码
-            print("  复制新代码...")
-            for item in os.listdir(temp_dir):
-                if item in PRESERVE_ITEMS or item.startswith('.'):
-                    continue
-                src = os.path.join(temp_dir, item)
-                dst = os.path.join(PROJECT_DIR, item)
-                if os.path.isdir(src):
-                    shutil.copytree(src, dst)
-                else:
-                    shutil.copy2(src, dst)
-            
-            print("  ✓ 代码更新成功 (git clone + merge)")
-            
-        finally:
-            # 清理临时目录
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
+        # 不是 git 仓库，克隆到新的版本目录，切换 current 链接前线上代码不受影响
+        print("  ! 当前目录不是 git 仓库，使用版本目录方式更新...")
+        migrate_to_releases()
+        return build_release()
+
+def release_path(release_id):
+    return os.path.join(RELEASES_DIR, release_id)
+
+def list_releases():
+    """列出已完成的版本目录（按时间戳从旧到新）"""
+    if not os.path.isdir(RELEASES_DIR):
+        return []
+    return sorted(
+        item for item in os.listdir(RELEASES_DIR)
+        if not item.endswith('.partial') and os.path.isdir(release_path(item))
+    )
+
+def current_release():
+    """当前 PROJECT_DIR 链接指向的版本号；PROJECT_DIR 还是普通目录时返回 None"""
+    if not os.path.islink(PROJECT_DIR):
+        return None
+    return os.path.basename(os.path.realpath(PROJECT_DIR))
+
+def is_preserved(rel_path):
+    """rel_path（相对项目根目录）是否是保留项或位于保留项之内"""
+    return any(rel_path == item or rel_path.startswith(item + '/') for item in PRESERVE_ITEMS)
+
+def remove_preserved_items(release_dir):
+    """删除版本目录中随代码带来的保留项（如仓库里的 backend/uploads/README.md），为共享链接让位"""
+    for item in PRESERVE_ITEMS:
+        path = os.path.join(release_dir, item)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        elif os.path.lexists(path):
+            os.remove(path)
+
+def link_shared_items(release_dir):
+    """把保留项链接到 SHARED_DIR 中的共享副本"""
+    for item in PRESERVE_ITEMS:
+        shared = os.path.join(SHARED_DIR, item)
+        target = os.path.join(release_dir, item)
+        if os.path.lexists(shared) and not os.path.lexists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.symlink(shared, target)
+            print(f"  将保留: {item}")
+
+def activate_release(release_dir):
+    """原子地把 PROJECT_DIR 链接切换到 release_dir
+
+    先在旁边建好新链接，再 os.replace 覆盖旧链接（rename 是原子的），
+    任何时刻 PROJECT_DIR 要么指向旧版本要么指向新版本。
+    """
+    next_link = PROJECT_DIR + '.next'
+    if os.path.lexists(next_link):
+        os.remove(next_link)
+    os.symlink(release_dir, next_link)
+    os.replace(next_link, PROJECT_DIR)
+    print(f"  ✓ 当前版本已切换到: {os.path.basename(release_dir)}")
+
+def adopt_shared_items(release_dir):
+    """把版本目录中还不是共享链接的保留项移到 SHARED_DIR，再在原位置留下链接"""
+    for item in PRESERVE_ITEMS:
+        src = os.path.join(release_dir, item)
+        shared = os.path.join(SHARED_DIR, item)
+        if os.path.lexists(src) and not os.path.islink(src) and not os.path.lexists(shared):
+            os.makedirs(os.path.dirname(shared), exist_ok=True)
+            os.rename(src, shared)
+            os.symlink(shared, src)
+            print(f"  已移到共享目录: {item}")
+
+def migrate_to_releases():
+    """首次使用版本目录时，把现有的 PROJECT_DIR 迁移为第一个版本
+
+    保留项移动到 SHARED_DIR 并在原位置留下符号链接，PROJECT_DIR 改为指向该版本的链接。
+    只在迁移时有一次极短的改名间隙，之后的切换都是原子的。
+    已经是版本目录布局时，把当前版本里新加入 PRESERVE_ITEMS、还是普通文件的项移到 SHARED_DIR。
+    """
+    if os.path.islink(PROJECT_DIR):
+        adopt_shared_items(os.path.realpath(PROJECT_DIR))
+        return
+    if not os.path.isdir(PROJECT_DIR):
+        return
+    os.makedirs(RELEASES_DIR, exist_ok=True)
+    os.makedirs(SHARED_DIR, exist_ok=True)
+    legacy_id = datetime.datetime.fromtimestamp(os.path.getmtime(PROJECT_DIR)).strftime('%Y%m%d-%H%M%S')
+    if legacy_id >= RELEASE_ID:
+        legacy_id = '00000000-000000'
+    legacy_dir = release_path(legacy_id)
+    print(f"  迁移现有目录为版本 {legacy_id}...")
+
+    adopt_shared_items(PROJECT_DIR)
+    os.rename(PROJECT_DIR, legacy_dir)
+    os.symlink(legacy_dir, PROJECT_DIR)
+    link_shared_items(legacy_dir)
+    print(f"  ✓ {PROJECT_DIR} -> {legacy_dir}")
+
+def build_release():
+    """克隆最新代码到新的版本目录并链接保留项，返回版本目录（尚未上线）"""
+    os.makedirs(RELEASES_DIR, exist_ok=True)
+    release_dir = release_path(RELEASE_ID)
+    partial_dir = release_dir + '.partial'
+    if os.path.exists(partial_dir):
+        shutil.rmtree(partial_dir)
+
+    print(f"  正在克隆仓库到版本目录 {RELEASE_ID}...")
+    run_command(f"git clone --depth 1 {GIT_REPO} {partial_dir}")
+    revision = subprocess.run(
+        "git rev-parse --short HEAD",
+        shell=True, cwd=partial_dir, capture_output=True, text=True
+    )
+    with open(os.path.join(partial_dir, "REVISION"), 'w', encoding='utf-8') as f:
+        f.write(revision.stdout.strip() if revision.returncode == 0 else "unknown")
+
+    # 与原先的复制方式一致：不带入点开头的文件（.git 等）和保留项
+    for item in os.listdir(partial_dir):
+        if item.startswith('.'):
+            item_path = os.path.join(partial_dir, item)
+            if os.path.isdir(item_path) and not os.path.islink(item_path):
+                shutil.rmtree(item_path)
+            else:
+                os.remove(item_path)
+    remove_preserved_items(partial_dir)
+
+    link_shared_items(partial_dir)
+    os.rename(partial_dir, release_dir)
+    print(f"  ✓ 新版本已就绪: {release_dir}")
+    return release_dir
+
+def unpack_artifact(artifact_path):
+    """把构建包解包到新的版本目录并链接保留项，返回版本目录（尚未上线）
+
+    构建包由 ssh_update.py --artifact 在本地打包、增量上传；解包成功后它成为下次增量的基准 ARTIFACT_BASIS。
+    """
+    print("\n[2/8] 解包构建包...")
+    migrate_to_releases()
+    os.makedirs(RELEASES_DIR, exist_ok=True)
+    release_dir = release_path(RELEASE_ID)
+    partial_dir = release_dir + '.partial'
+    if os.path.exists(partial_dir):
+        shutil.rmtree(partial_dir)
 
-def fix_all_scripts():
+    started = time.monotonic()
+    with tarfile.open(artifact_path, 'r:') as tar:
+        # 与 build_release 一致：不带入点开头的文件和保留项；包内时间统一为 0，解包时改为当前时间
+        members = []
+        for member in tar.getmembers():
+            name = os.path.normpath(member.name)
+            if name.startswith('.') or is_preserved(name):
+                continue
+            member.mtime = time.time()
+            members.append(member)
+        if hasattr(tarfile, 'data_filter'):
+            tar.extractall(partial_dir, members=members, filter='data')
+        else:
+            tar.extractall(partial_dir, members=members)
+    record_metric('unpack_seconds', round(time.monotonic() - started, 3))
+
+    link_shared_items(partial_dir)
+    os.rename(partial_dir, release_dir)
+    if os.path.abspath(artifact_path) != ARTIFACT_BASIS:
+        os.makedirs(ARTIFACT_DIR, exist_ok=True)
+        os.replace(artifact_path, ARTIFACT_BASIS)
+    print(f"  ✓ 新版本已就绪: {release_dir}（{len(members)} 个文件，耗时 {time.monotonic() - started:.1f}s）")
+    return release_dir
+
+def rollback_release():
+    """回滚到上一个版本：只切换一次链接，不复制任何文件"""
+    releases = list_releases()
+    current = current_release()
+    if current not in releases:
+        raise RuntimeError(f"{PROJECT_DIR} 不是版本目录链接，无法回滚")
+    index = releases.index(current)
+    if index == 0:
+        raise RuntimeError(f"当前版本 {current} 已是最早的版本")
+    activate_release(release_path(releases[index - 1]))
+    return releases[index - 1]
+
+def cleanup_old_releases(keep_count=KEEP_RELEASES):
+    """删除最旧的版本目录，只保留 keep_count 个；当前版本和上一个版本永远不删"""
+    releases = list_releases()
+    current = current_release()
+    protected = {current}
+    if current in releases and releases.index(current) > 0:
+        protected.add(releases[releases.index(current) - 1])
+    removable = [r for r in releases[:-keep_count] if r not in protected] if len(releases) > keep_count else []
+    for release_id in removable:
+        shutil.rmtree(release_path(release_id))
+        print(f"    删除旧版本: {release_id}")
+    if os.path.isdir(RELEASES_DIR):
+        # 清理中断的部署留下的 .partial 目录
+        for item in os.listdir(RELEASES_DIR):
+            if item.endswith('.partial') and item != RELEASE_ID + '.partial':
+                shutil.rmtree(release_path(item))
+    return len(removable)
+
+def fix_all_scripts(project_dir=PROJECT_DIR):
     """修复所有脚本的换行符"""
     print("\n[3/8] 修复脚本换行符...")
     scripts = ["deploy.sh", "auto-deploy.sh", "v1_2.sh", "fix-v1.2.sh", "update-server.sh"]
     fixed_count = 0
     for script in scripts:
-        script_path = os.path.join(PROJECT_DIR, script)
+        script_path = os.path.join(project_dir, script)
         if os.path.exists(script_path):
             if fix_line_endings(script_path):
                 os.chmod(script_path, 0o755)
@@ -257,61 +916,108 @@ def fix_all_scripts():
     # 同时修复 Python 脚本
     py_scripts = ["update-server.py", "fix-crlf.py"]
     for script in py_scripts:
-        script_path = os.path.join(PROJECT_DIR, script)
+        script_path = os.path.join(project_dir, script)
         if os.path.exists(script_path):
             if fix_line_endings(script_path):
                 fixed_count += 1
     
     print(f"  ✓ 修复了 {fixed_count} 个脚本")
 
-def sync_frontend_dist():
-    """同步前端 dist 文件到部署目录"""
+def sync_frontend_dist(project_dir=PROJECT_DIR):
+    """增量同步前端 dist 文件到部署目录
+
+    nginx 直接以 frontend/dist 为根目录，同步过程中不能出现空目录或写了一半的文件:
+      1. 与线上文件比较大小/修改时间（不一致时再比较内容哈希），只把新增或变化的文件复制到暂存目录
+      2. 逐个 os.replace 到线上目录（同一文件系统内的原子改名），index.html 最后替换，
+         保证新的 index.html 上线时它引用的资源都已就位
+      3. 新 index.html 上线后再删除旧版本残留的文件，仍在使用旧页面的客户端不会拿到 404
+    """
     print("\n[4/8] 同步前端文件...")
-    src_dist = os.path.join(PROJECT_DIR, "frontend-src", "dist")
-    dst_dist = os.path.join(PROJECT_DIR, "frontend", "dist")
+    src_dist = os.path.join(project_dir, "frontend-src", "dist")
+    dst_dist = os.path.join(project_dir, "frontend", "dist")
     
     if not os.path.exists(src_dist):
         print(f"  ! 警告: 源目录不存在 {src_dist}")
         return
     
-    # 确保目标目录存在
+    # 确保目标目录存在；暂存目录与目标目录在同一文件系统，改名才是原子的
     os.makedirs(dst_dist, exist_ok=True)
+    staging = os.path.join(os.path.dirname(dst_dist), ".dist-staging")
+    if os.path.exists(staging):
+        shutil.rmtree(staging)
     
-    # 清空旧文件
-    for item in os.listdir(dst_dist):
-        item_path = os.path.join(dst_dist, item)
-        if os.path.isdir(item_path):
-            shutil.rmtree(item_path)
-        else:
-            os.remove(item_path)
-    
-    # 复制新文件
-    for item in os.listdir(src_dist):
-        src = os.path.join(src_dist, item)
-        dst = os.path.join(dst_dist, item)
-        if os.path.isdir(src):
-            shutil.copytree(src, dst)
-        else:
-            shutil.copy2(src, dst)
+    # 复制新增或变化的文件到暂存目录
+    engine = CopyEngine(collect=True)
+
+    def stage_file(src, staged, rel, st):
+        try:
+            live = os.stat(os.path.join(dst_dist, rel))
+        except OSError:
+            live = None
+        if live is not None and live.st_size == st.st_size and (
+                live.st_mtime_ns == st.st_mtime_ns or file_digest(os.path.join(dst_dist, rel)) == file_digest(src)):
+            return None
+        engine.add_bytes(copy_file_fast(src, staged))
+        return rel
+
+    engine.copy_tree(src_dist, staging, stage_file)
+    engine.finish("暂存变化的文件")
+
+    # 暂存目录中的普通文件和符号链接就是需要上线的内容
+    changed = []
+    for root, dirs, files in os.walk(staging):
+        for name in files + [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+            changed.append(os.path.relpath(os.path.join(root, name), staging))
+    changed.sort(key=lambda rel: rel == "index.html")
+
+    for rel in changed:
+        live = os.path.join(dst_dist, rel)
+        os.makedirs(os.path.dirname(live), exist_ok=True)
+        if os.path.isdir(live) and not os.path.islink(live):
+            shutil.rmtree(live)
+        os.replace(os.path.join(staging, rel), live)
+    shutil.rmtree(staging)
+
+    # 新版本已上线，删除源目录中已不存在的旧文件和空目录
+    keep = set()
+    for root, dirs, files in os.walk(src_dist):
+        for name in files + dirs:
+            keep.add(os.path.relpath(os.path.join(root, name), src_dist))
+    pruned = 0
+    for root, dirs, files in os.walk(dst_dist, topdown=False):
+        for name in files + dirs:
+            path = os.path.join(root, name)
+            if os.path.relpath(path, dst_dist) in keep:
+                continue
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            pruned += 1
     
-    print(f"  ✓ 前端文件已同步到 {dst_dist}")
+    print(f"  ✓ 前端文件已同步到 {dst_dist}（更新 {len(changed)} 个，未变化 {engine.files - len(engine.results)} 个，删除 {pruned} 个）")
 
-def add_version_marker():
+def add_version_marker(project_dir=PROJECT_DIR):
     """在 index.html 中添加版本标识"""
     print("\n[5/8] 添加版本标识...")
     
-    index_path = os.path.join(PROJECT_DIR, "frontend", "dist", "index.html")
+    index_path = os.path.join(project_dir, "frontend", "dist", "index.html")
     if not os.path.exists(index_path):
         print(f"  ! 警告: 找不到 {index_path}")
         return
     
     try:
-        # 获取版本信息
-        result = subprocess.run(
-            "git rev-parse --short HEAD",
-            shell=True, cwd=PROJECT_DIR, capture_output=True, text=True
-        )
-        commit_hash = result.stdout.strip() if result.returncode == 0 else "unknown"
+        # 获取版本信息（版本目录没有 .git，使用构建时记录的 REVISION）
+        revision_path = os.path.join(project_dir, "REVISION")
+        if os.path.exists(revision_path):
+            with open(revision_path, 'r', encoding='utf-8') as f:
+                commit_hash = f.read().strip() or "unknown"
+        else:
+            result = subprocess.run(
+                "git rev-parse --short HEAD",
+                shell=True, cwd=project_dir, capture_output=True, text=True
+            )
+            commit_hash = result.stdout.strip() if result.returncode == 0 else "unknown"
         
         # 获取当前时间
         update_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -389,32 +1095,265 @@ def add_version_marker():
             import re
             content = re.sub(r'(<body[^>]*>)', r'\1\n' + version_marker, content)
         
-        # 写回文件
-        with open(index_path, 'w', encoding='utf-8') as f:
+        # 写到临时文件再原子替换，nginx 不会读到写了一半的 index.html
+        tmp_path = index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             f.write(content)
+        shutil.copystat(index_path, tmp_path)
+        os.replace(tmp_path, index_path)
         
         print(f"  ✓ 版本标识已添加: {commit_hash} @ {update_time}")
         
     except Exception as e:
         print(f"  ! 添加版本标识失败: {e}")
 
-def install_dependencies():
-    """安装后端依赖"""
-    print("\n[6/8] 安装后端依赖...")
-    backend_dir = os.path.join(PROJECT_DIR, "backend")
-    
-    # 检查是否存在 node_modules，如果不存在或需要更新则安装
-    if not os.path.exists(os.path.join(backend_dir, "node_modules")):
-        run_command("npm install --production", cwd=backend_dir)
+def dependency_cache_key(backend_dir):
+    """依赖缓存键：package.json / lockfile 内容 + Node 版本 + 平台"""
+    result = subprocess.run("node --version", shell=True, capture_output=True, text=True)
+    node_version = result.stdout.strip() if result.returncode == 0 else "unknown"
+    h = hashlib.sha256()
+    h.update(f"{node_version}|{sys.platform}|{platform.machine()}|production\n".encode())
+    for name in DEPS_INPUT_FILES:
+        path = os.path.join(backend_dir, name)
+        if os.path.exists(path):
+            h.update(name.encode() + b'\0')
+            with open(path, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+def link_node_modules(backend_dir, cached):
+    """把 backend/node_modules 原子地替换为指向缓存条目的符号链接"""
+    target = os.path.join(backend_dir, "node_modules")
+    next_link = target + '.next'
+    if os.path.lexists(next_link):
+        os.remove(next_link)
+    os.symlink(cached, next_link)
+    if os.path.isdir(target) and not os.path.islink(target):
+        # 旧的实体目录不能被 rename 覆盖，先挪开
+        stale = target + '.old'
+        if os.path.exists(stale):
+            shutil.rmtree(stale)
+        os.rename(target, stale)
+        os.replace(next_link, target)
+        shutil.rmtree(stale)
     else:
-        # 尝试更新依赖
-        run_command("npm install --production", cwd=backend_dir, check=False)
+        os.replace(next_link, target)
+    # 更新修改时间，清理缓存时按最近使用排序
+    os.utime(os.path.dirname(cached))
+
+def cleanup_dependency_cache(keep_count=DEPS_CACHE_KEEP):
+    """删除最久未使用的缓存条目；任何版本目录仍在链接的条目都保留（保证回滚可用）"""
+    if not os.path.isdir(DEPS_CACHE_DIR):
+        return 0
+    in_use = set()
+    candidates = [PROJECT_DIR] + [release_path(r) for r in list_releases()]
+    for project in candidates:
+        link = os.path.join(project, "backend", "node_modules")
+        if os.path.islink(link):
+            in_use.add(os.path.basename(os.path.dirname(os.path.realpath(link))))
+    entries = sorted(
+        (item for item in os.listdir(DEPS_CACHE_DIR) if not item.endswith('.partial')),
+        key=lambda item: os.path.getmtime(os.path.join(DEPS_CACHE_DIR, item)),
+        reverse=True,
+    )
+    removed = 0
+    for item in entries[keep_count:]:
+        if item not in in_use:
+            shutil.rmtree(os.path.join(DEPS_CACHE_DIR, item))
+            removed += 1
+    return removed
+
+def install_dependencies(project_dir=PROJECT_DIR):
+    """安装后端依赖
+
+    依赖集合（lockfile、Node 版本、平台）没有变化时直接链接缓存中已安装好的 node_modules；
+    未命中缓存才在缓存的 .partial 暂存目录里运行 npm install（以当前 node_modules 的副本为起点），
+    成功后改名为缓存条目再原子切换链接。安装期间或 npm 失败时线上的 node_modules 保持不变；
+    已完成的缓存条目只读共享，npm 永远不会在其中运行。
+    """
+    print("\n[6/8] 安装后端依赖...")
+    backend_dir = os.path.join(project_dir, "backend")
+    node_modules = os.path.join(backend_dir, "node_modules")
+    key = dependency_cache_key(backend_dir)
+    entry = os.path.join(DEPS_CACHE_DIR, key)
+    cached = os.path.join(entry, "node_modules")
+
+    if os.path.isdir(cached):
+        started = time.time()
+        link_node_modules(backend_dir, cached)
+        print(f"  ✓ 依赖未变化，复用缓存 {key}（{(time.time() - started) * 1000:.0f}ms）")
+        cleanup_dependency_cache()
+        return
+
+    print(f"  依赖缓存未命中 ({key})，运行 npm install...")
+    partial = entry + '.partial'
+    if os.path.exists(partial):
+        shutil.rmtree(partial)
+    os.makedirs(partial)
+    try:
+        for name in DEPS_INPUT_FILES:
+            if os.path.exists(os.path.join(backend_dir, name)):
+                shutil.copy2(os.path.join(backend_dir, name), os.path.join(partial, name))
+        # 复制（而不是链接）现有依赖作为起点，npm 只需增量安装，也不会改写共享的缓存条目
+        if os.path.isdir(node_modules):
+            engine = CopyEngine()
+            engine.copy_tree(os.path.realpath(node_modules), os.path.join(partial, "node_modules"))
+            engine.finish("复制现有 node_modules")
+        run_command("npm install --production", cwd=partial)
+        os.makedirs(os.path.join(partial, "node_modules"), exist_ok=True)
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    os.rename(partial, entry)
+    link_node_modules(backend_dir, cached)
+    cleanup_dependency_cache()
     
-    print("  ✓ 依赖安装成功")
+    print(f"  ✓ 依赖安装成功，已缓存为 {key}")
+
+def upstream_backend_port():
+    """nginx upstream 文件中配置的后端端口；没有 upstream 文件或其中没有 server 行时为 None"""
+    try:
+        with open(NGINX_UPSTREAM_FILE, 'r', encoding='utf-8') as f:
+            match = re.search(r'^\s*server\s+[\w.\-]+:(\d+)', f.read(), re.MULTILINE)
+        if match:
+            return int(match.group(1))
+    except OSError:
+        pass
+    return None
+
+def active_backend_port():
+    """nginx upstream 当前指向的后端端口；没有 upstream 文件时为默认端口"""
+    return upstream_backend_port() or BACKEND_PORT
+
+def has_pm2():
+    return subprocess.run("which pm2", shell=True, capture_output=True).returncode == 0
+
+def instance_pid_file(port):
+    return os.path.join(PID_DIR, f"backend-{port}.pid")
+
+def start_backend_instance(port):
+    """在指定端口启动一个后端实例（PM2 进程名带端口号，否则 nohup 启动并记录 pid）"""
+    backend_dir = os.path.join(PROJECT_DIR, "backend")
+    if has_pm2():
+        name = f"{PM2_APP}-{port}"
+        run_command(f"pm2 delete {name}", check=False)
+        run_command(f"PORT={port} pm2 start server.js --name {name} --update-env", cwd=backend_dir)
+        return
+    os.makedirs(PID_DIR, exist_ok=True)
+    proc = subprocess.Popen(
+        ["nohup", "node", "server.js"],
+        cwd=backend_dir,
+        env=dict(os.environ, PORT=str(port)),
+        stdout=open("/dev/null", "w"),
+        stderr=open("/dev/null", "w"),
+        start_new_session=True
+    )
+    with open(instance_pid_file(port), 'w') as f:
+        f.write(str(proc.pid))
+    print(f"  已启动新实例: 端口 {port}，pid {proc.pid}")
+
+def stop_pid(pid, timeout=STOP_TIMEOUT):
+    """发送 SIGTERM 让进程优雅退出，超时后 SIGKILL"""
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            # 同一次运行中启动的实例是本进程的子进程，退出后需要回收，否则会一直以僵尸进程存在
+            if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                return
+        except ChildProcessError:
+            pass
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return
+        time.sleep(0.2)
+    print(f"  ! 进程 {pid} 未在 {timeout}s 内退出，强制结束")
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+def stop_backend_instance(port):
+    """停止指定端口上的后端实例，让它处理完进行中的请求后退出
 
-def restart_service():
-    """重启服务"""
+    兼容滚动重启之前的启动方式：PM2 的 food-subscription-backend、systemd 服务或手动 nohup 的进程。
+    """
+    if has_pm2():
+        # PM2 stop 先发 SIGINT，超过 kill_timeout 才强制结束
+        result = run_command(f"pm2 stop {PM2_APP}-{port} && pm2 delete {PM2_APP}-{port}", check=False)
+        if result.returncode == 0:
+            return
+        if port == BACKEND_PORT:
+            run_command(f"pm2 stop {PM2_APP} && pm2 delete {PM2_APP}", check=False)
+            return
+    pid_file = instance_pid_file(port)
+    if os.path.exists(pid_file):
+        with open(pid_file) as f:
+            stop_pid(int(f.read().strip()))
+        os.remove(pid_file)
+        return
+    if port == BACKEND_PORT and subprocess.run(
+            "systemctl is-active --quiet food-subscription", shell=True, capture_output=True).returncode == 0:
+        # systemd 服务设置了 Restart=always，必须通过 systemctl 停止
+        run_command("systemctl stop food-subscription", check=False)
+        return
+    # 手动启动、没有记录 pid 的旧实例：按端口找到进程并发送 SIGTERM
+    subprocess.run(f"fuser -k -TERM {port}/tcp", shell=True, capture_output=True)
+
+def switch_upstream(port):
+    """改写 nginx upstream 指向新端口并平滑 reload；配置检查失败时恢复原文件"""
+    with open(NGINX_UPSTREAM_FILE, 'r', encoding='utf-8') as f:
+        previous = f.read()
+    content = re.sub(r'^(\s*server\s+[\w.\-]+:)\d+', rf'\g<1>{port}', previous, flags=re.MULTILINE)
+    tmp_path = NGINX_UPSTREAM_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, NGINX_UPSTREAM_FILE)
+    if run_command("nginx -t", check=False).returncode != 0:
+        with open(NGINX_UPSTREAM_FILE, 'w', encoding='utf-8') as f:
+            f.write(previous)
+        raise RuntimeError("nginx 配置检查失败，已恢复 upstream")
+    # reload 时旧 worker 处理完已接收的请求才退出，新 worker 只连新实例
+    run_command("nginx -s reload")
+    print(f"  ✓ nginx upstream 已切换到端口 {port}")
+
+def rolling_restart():
+    """零停机重启：新实例在备用端口启动并就绪 -> 切换 nginx upstream -> 等待排空 -> 停止旧实例"""
+    old_port = active_backend_port()
+    new_port = next(p for p in BACKEND_PORTS if p != old_port)
+    print(f"  滚动重启: {old_port} -> {new_port}")
+    start_backend_instance(new_port)
+    if wait_until_ready(port=new_port) is None:
+        stop_backend_instance(new_port)
+        raise RuntimeError(f"新实例（端口 {new_port}）未能就绪，旧实例继续提供服务")
+    switch_upstream(new_port)
+    print(f"  等待 {DRAIN_SECONDS}s 让进行中的请求完成...")
+    time.sleep(DRAIN_SECONDS)
+    stop_backend_instance(old_port)
+    print(f"  ✓ 旧实例（端口 {old_port}）已停止")
+
+def restart_service(release_dir=None, rolling=False):
+    """重启服务；release_dir 是新构建的版本目录时，先原子切换 current 链接再重启
+
+    rolling 为 True 时使用 rolling_restart 零停机切换（需要 nginx 使用 NGINX_UPSTREAM_FILE）。
+    只要 upstream 文件中配置了端口，即使没有指定 rolling 也走滚动重启：之前的滚动部署可能已把
+    nginx 切到备用端口，普通重启只会重启默认端口上没人访问的实例（回滚也就不会生效）。
+    """
     print("\n[7/8] 重启后端服务...")
+    if release_dir and release_dir != PROJECT_DIR:
+        activate_release(release_dir)
+    if upstream_backend_port() is not None:
+        if not rolling:
+            print(f"  nginx upstream 指向端口 {upstream_backend_port()}，使用滚动重启")
+        rolling_restart()
+        return
+    if rolling:
+        print(f"  ! 未找到 {NGINX_UPSTREAM_FILE}，无法滚动重启，改为普通重启")
+        print("    安装方法: cp nginx/food-subscription-upstream.conf /etc/nginx/ 并使用新的 nginx/food-subscription.conf")
     
     # 尝试使用 PM2
     result = subprocess.run("which pm2", shell=True, capture_output=True)
@@ -453,25 +1392,417 @@ def restart_service():
     except Exception as e:
         print(f"  ! 启动失败: {e}")
 
-def check_health():
-    """检查服务状态"""
+def http_get(path, timeout=5, conn=None, port=None):
+    """GET 后端接口，返回 (状态码, 响应体)；conn 为复用的 keep-alive 连接"""
+    own = conn is None
+    conn = conn or http.client.HTTPConnection(BACKEND_HOST, port or BACKEND_PORT, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        if own:
+            conn.close()
+
+def wait_until_ready(deadline=READY_DEADLINE, max_delay=READY_MAX_DELAY, port=None):
+    """轮询 /api/health 直到返回 ok，间隔从 0.1s 开始指数退避（带抖动），超过 deadline 返回 None
+
+    成功时返回等待的秒数。
+    """
+    started = time.monotonic()
+    delay = 0.1
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            status, body = http_get('/api/health', timeout=2, port=port)
+            if status == 200 and b'ok' in body:
+                waited = time.monotonic() - started
+                print(f"  ✓ 服务已就绪（{waited:.1f}s，第 {attempts} 次检查）")
+                return waited
+        except (OSError, http.client.HTTPException):
+            pass
+        remaining = deadline - (time.monotonic() - started)
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay * random.uniform(0.8, 1.2), remaining))
+        delay = min(delay * 2, max_delay)
+
+def smoke_benchmark(routes=SMOKE_ROUTES, warmup=SMOKE_WARMUP, requests=SMOKE_REQUESTS, port=None):
+    """对关键接口做短时间的顺序压测，返回 {接口: {p50, p95, errors}}（毫秒）"""
+    port = port or BACKEND_PORT
+    results = {}
+    for route in routes:
+        conn = http.client.HTTPConnection(BACKEND_HOST, port, timeout=5)
+        latencies = []
+        errors = 0
+        try:
+            for i in range(warmup + requests):
+                started = time.monotonic()
+                try:
+                    status, _ = http_get(route, conn=conn)
+                except (OSError, http.client.HTTPException):
+                    status = 0
+                    conn.close()
+                    conn = http.client.HTTPConnection(BACKEND_HOST, port, timeout=5)
+                elapsed = (time.monotonic() - started) * 1000
+                if i < warmup:
+                    continue
+                latencies.append(elapsed)
+                if not 200 <= status < 300:
+                    errors += 1
+        finally:
+            conn.close()
+        results[route] = {
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'errors': errors,
+        }
+    return results
+
+def smoke_baseline():
+    """最近一次成功部署记录的冒烟压测结果，没有则返回 None"""
+    for record in reversed(load_deploy_history()):
+        smoke = record.get('steps', {}).get('health', {}).get('smoke')
+        if record.get('status') == 'ok' and smoke:
+            return record['id'], smoke
+    return None
+
+def check_health(on_regression=SMOKE_ON_REGRESSION, max_ratio=SMOKE_MAX_RATIO, rolling=False):
+    """检查服务状态：就绪轮询 + 冒烟压测，与上次部署的 p95 基线比较
+
+    未就绪、冒烟请求出错或 p95 回归时按 on_regression 处理:
+    warn 只提示；fail 让本次部署失败；rollback 在版本目录部署下切回上一个版本后再失败。
+    """
     print("\n[8/8] 检查服务状态...")
-    import time
-    time.sleep(2)
-    
-    result = subprocess.run(
-        "curl -s http://localhost:3001/api/health",
-        shell=True, capture_output=True, text=True
-    )
-    if result.returncode == 0 and "ok" in result.stdout:
-        print("  ✓ 服务运行正常")
+    port = active_backend_port()
+    problems = []
+    if wait_until_ready(port=port) is None:
+        problems.append(f"{READY_DEADLINE}s 内 /api/health 未就绪")
     else:
-        print("  ✗ 服务可能未正常启动，请检查日志")
-        print("  查看日志: pm2 logs food-subscription-backend")
-        print("  或: tail -f /var/log/food-subscription.log")
+        smoke = smoke_benchmark(port=port)
+        metrics = getattr(_step_context, 'metrics', None)
+        if metrics is not None:
+            metrics['smoke'] = smoke
+        baseline = smoke_baseline()
+        for route, result in smoke.items():
+            line = f"    {route:<36} p50 {result['p50']:>7.1f}ms  p95 {result['p95']:>7.1f}ms"
+            base = baseline[1].get(route) if baseline else None
+            if base:
+                line += f"  （基线 p95 {base['p95']:.1f}ms）"
+            print(line)
+            if result['errors']:
+                problems.append(f"{route} 有 {result['errors']} 个请求失败")
+            elif base and result['p95'] > base['p95'] * max_ratio and result['p95'] - base['p95'] > SMOKE_MIN_MS:
+                problems.append(f"{route} p95 {result['p95']:.1f}ms 超过基线 {base['p95']:.1f}ms 的 {max_ratio:g} 倍")
+        if baseline:
+            print(f"  基线来自部署 {baseline[0]}")
+
+    if not problems:
+        print("  ✓ 服务运行正常")
+        return
+    for problem in problems:
+        print(f"  ✗ {problem}")
+    print("  查看日志: pm2 logs food-subscription-backend")
+    print("  或: tail -f /var/log/food-subscription.log")
+    if on_regression == 'warn':
+        return
+    if on_regression == 'rollback':
+        if current_release() in list_releases() and list_releases().index(current_release()) > 0:
+            previous = rollback_release()
+            restart_service(rolling=rolling)
+            wait_until_ready(port=active_backend_port())
+            raise RuntimeError(f"健康检查未通过，已回滚到 {previous}")
+        print("  ! 当前不是版本目录部署，无法自动回滚")
+    raise RuntimeError("健康检查未通过")
+
+class DeployStep:
+    """部署步骤：func(results) 的返回值存入 results[name]，deps 中的步骤全部成功后才会执行"""
+
+    def __init__(self, name, func, deps=()):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+
+class _StepLog:
+    """单个步骤的输出：成为最早未输出完的步骤之前先缓存，之后直接写到终端"""
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.live = False
+        self.done = False
+
+class _StepLogRouter:
+    """替换 sys.stdout / sys.stderr，把每个线程的输出路由到所属步骤的 _StepLog"""
+
+    def __init__(self, stream, lock):
+        self.stream = stream
+        self.lock = lock
+
+    def write(self, text):
+        log = getattr(_step_context, 'log', None)
+        with self.lock:
+            if log is None or log.live:
+                self.stream.write(text)
+            else:
+                log.buffer.write(text)
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+def run_steps(steps, workers=DEPLOY_WORKERS, timings=None):
+    """按依赖关系并行执行部署步骤
+
+    - 依赖全部成功的步骤立即提交到线程池，总耗时取决于关键路径而不是所有步骤之和
+    - 某个步骤失败时只跳过依赖它的步骤，其余步骤照常完成，最后统一报错
+    - 输出按步骤声明顺序显示：最早未完成的步骤实时输出，其余步骤的输出先缓存
+    步骤必须按拓扑顺序声明（依赖在前）。返回 {步骤名: 返回值}。
+    timings 不为 None 时填入每个步骤的状态、耗时（单调时钟）和 record_metric 记录的指标，失败时也会填写。
+    """
+    names = [step.name for step in steps]
+    for i, step in enumerate(steps):
+        for dep in step.deps:
+            if dep not in names[:i]:
+                raise ValueError(f"步骤 {step.name} 的依赖 {dep} 必须在它之前声明")
+
+    results = {}
+    status = {}
+    logs = {step.name: _StepLog() for step in steps}
+    metrics = {step.name: {} for step in steps}
+    timings = {} if timings is None else timings
+    lock = threading.Lock()
+    out, err = sys.stdout, sys.stderr
+    head = [0]
+
+    def advance():
+        # 依次输出已完成步骤的缓存，遇到第一个未完成的步骤时切换为实时输出
+        with lock:
+            while head[0] < len(steps):
+                log = logs[steps[head[0]].name]
+                out.write(log.buffer.getvalue())
+                log.buffer = io.StringIO()
+                if not log.done:
+                    log.live = True
+                    break
+                head[0] += 1
+            out.flush()
+
+    def execute(step):
+        _step_context.log = logs[step.name]
+        _step_context.metrics = metrics[step.name]
+        started = time.monotonic()
+        try:
+            return step.func(results)
+        except Exception:
+            traceback.print_exc()
+            raise
+        finally:
+            metrics[step.name]['seconds'] = time.monotonic() - started
+            _step_context.log = None
+            _step_context.metrics = None
+
+    sys.stdout, sys.stderr = _StepLogRouter(out, lock), _StepLogRouter(err, lock)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            running = {}
+
+            def launch_ready():
+                for step in steps:
+                    if step.name in status or step.name in running.values():
+                        continue
+                    dep_status = [status.get(dep) for dep in step.deps]
+                    if any(st in ('failed', 'skipped') for st in dep_status):
+                        status[step.name] = 'skipped'
+                        logs[step.name].buffer.write(f"\n  - 跳过 {step.name}: 依赖的步骤未成功\n")
+                        logs[step.name].done = True
+                    elif all(st == 'ok' for st in dep_status):
+                        running[pool.submit(execute, step)] = step.name
+
+            launch_ready()
+            advance()
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                        status[name] = 'ok'
+                    except Exception:
+                        status[name] = 'failed'
+                    with lock:
+                        logs[name].done = True
+                launch_ready()
+                advance()
+    finally:
+        sys.stdout, sys.stderr = out, err
+        for name in names:
+            timings[name] = dict(metrics[name], status=status.get(name, 'skipped'))
+    advance()
+
+    failed = [name for name in names if status.get(name) == 'failed']
+    if failed:
+        skipped = [name for name in names if status.get(name) == 'skipped']
+        raise RuntimeError(f"步骤失败: {', '.join(failed)}" + (f"（已跳过: {', '.join(skipped)}）" if skipped else ""))
+    return results
+
+def percentile(values, pct):
+    """最近秩法百分位数"""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[max(1, -(-len(values) * pct // 100)) - 1]
+
+def load_deploy_history(limit=None):
+    """读取部署历史记录（最旧的在前），limit 只保留最近的若干条"""
+    if not os.path.exists(DEPLOY_HISTORY):
+        return []
+    records = []
+    with open(DEPLOY_HISTORY, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records[-limit:] if limit else records
+
+def record_deploy(timings, total_seconds, succeeded):
+    """把本次部署的各步骤耗时和指标追加到历史文件"""
+    record = {
+        'id': RELEASE_ID,
+        'finished_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'status': 'ok' if succeeded else 'failed',
+        'total_seconds': round(total_seconds, 3),
+        'steps': {
+            name: {k: round(v, 3) if isinstance(v, float) else v for k, v in metrics.items()}
+            for name, metrics in timings.items()
+        },
+    }
+    try:
+        os.makedirs(os.path.dirname(DEPLOY_HISTORY), exist_ok=True)
+        with open(DEPLOY_HISTORY, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    except OSError as e:
+        print(f"  ! 写入部署历史失败: {e}")
+    return record
+
+def step_durations(records):
+    """{步骤名: [各次成功执行的耗时]}，另含 'total' 为成功部署的总耗时"""
+    durations = {}
+    for record in records:
+        for name, metrics in record.get('steps', {}).items():
+            if metrics.get('status') == 'ok' and 'seconds' in metrics:
+                durations.setdefault(name, []).append(metrics['seconds'])
+        if record.get('status') == 'ok':
+            durations.setdefault('total', []).append(record['total_seconds'])
+    return durations
+
+def find_regressions(record, history):
+    """与历史相比明显变慢的步骤: [(步骤名, 本次耗时, 历史中位数)]
+
+    本次耗时同时超过历史 p95 和中位数的 REGRESSION_RATIO 倍，且多出 REGRESSION_MIN_SECONDS 以上才算，
+    历史少于 3 次时不判断。
+    """
+    durations = step_durations(history)
+    current = {name: m['seconds'] for name, m in record.get('steps', {}).items()
+               if m.get('status') == 'ok' and 'seconds' in m}
+    if record.get('status') == 'ok':
+        current['total'] = record['total_seconds']
+    regressions = []
+    for name, seconds in current.items():
+        previous = durations.get(name, [])
+        if len(previous) < 3:
+            continue
+        median = percentile(previous, 50)
+        if (seconds > percentile(previous, 95) and seconds > median * REGRESSION_RATIO
+                and seconds - median > REGRESSION_MIN_SECONDS):
+            regressions.append((name, seconds, median))
+    return regressions
+
+def print_step_timings(record, history):
+    """部署结束时打印各步骤耗时，并提示相对历史的回归"""
+    print("\n步骤耗时:")
+    for name, metrics in record['steps'].items():
+        extra = []
+        if metrics.get('bytes_copied'):
+            extra.append(f"复制 {metrics['bytes_copied'] / 1024 / 1024:.1f} MB")
+        if metrics.get('files'):
+            extra.append(f"{metrics['files']} 个文件")
+        if metrics.get('subprocess_seconds'):
+            extra.append(f"子进程 {metrics['subprocess_seconds']:.1f}s")
+        seconds = f"{metrics['seconds']:.1f}s" if 'seconds' in metrics else '-'
+        print(f"  {name:<16}{metrics['status']:<9}{seconds:>8}  {'，'.join(extra)}")
+    print(f"  {'total':<16}{record['status']:<9}{record['total_seconds']:>7.1f}s")
+    for name, seconds, median in find_regressions(record, history):
+        print(f"  ⚠️  {name} 耗时 {seconds:.1f}s，明显高于历史中位数 {median:.1f}s")
+
+def print_deploy_report(last=REPORT_LAST):
+    """统计最近 last 次部署中每个步骤的 p50/p95，并标出最近一次部署中的回归"""
+    records = load_deploy_history(last)
+    if not records:
+        print(f"暂无部署历史: {DEPLOY_HISTORY}")
+        return
+    durations = step_durations(records)
+    latest = records[-1]
+    regressed = {name for name, _, _ in find_regressions(latest, records[:-1])}
+    latest_seconds = {name: m.get('seconds') for name, m in latest.get('steps', {}).items()}
+    latest_seconds['total'] = latest.get('total_seconds')
+
+    failed = sum(1 for r in records if r.get('status') != 'ok')
+    print(f"最近 {len(records)} 次部署（失败 {failed} 次），耗时单位: 秒")
+    print(f"{'步骤':<18}{'次数':>6}{'p50':>9}{'p95':>9}{'最近':>9}")
+    print('-' * 56)
+    order = list(latest.get('steps', {})) + [n for n in durations if n not in latest.get('steps', {}) and n != 'total'] + ['total']
+    for name in order:
+        values = durations.get(name, [])
+        last_value = latest_seconds.get(name)
+        flag = '  ⚠️ 回归' if name in regressed else ''
+        print(f"{name:<18}{len(values):>6}{percentile(values, 50):>9.1f}{percentile(values, 95):>9.1f}"
+              f"{(f'{last_value:.1f}' if last_value is not None else '-'):>9}{flag}")
+
+def deploy_steps(on_regression=SMOKE_ON_REGRESSION, max_ratio=SMOKE_MAX_RATIO, rolling=False,
+                 backup_format='snapshot', backup_excludes=ARCHIVE_EXCLUDES, artifact=None):
+    """部署流程的依赖图：拉取代码后，换行符修复、前端同步、依赖安装互不依赖，可并行执行
+
+    指定 artifact 时用解包构建包代替 git 拉取。
+    """
+    return [
+        DeployStep('backup', lambda r: backup_current(backup_format, backup_excludes)),
+        DeployStep('pull', lambda r: unpack_artifact(artifact) if artifact else pull_or_clone(), ['backup']),
+        DeployStep('fix_scripts', lambda r: fix_all_scripts(r['pull']), ['pull']),
+        DeployStep('sync_frontend', lambda r: sync_frontend_dist(r['pull']), ['pull']),
+        DeployStep('version_marker', lambda r: add_version_marker(r['pull']), ['sync_frontend']),
+        DeployStep('install_deps', lambda r: install_dependencies(r['pull']), ['pull']),
+        DeployStep('restart', lambda r: restart_service(r['pull'], rolling),
+                   ['fix_scripts', 'version_marker', 'install_deps']),
+        DeployStep('health', lambda r: check_health(on_regression, max_ratio, rolling), ['restart']),
+    ]
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='食材包订阅平台服务端更新')
+    parser.add_argument('--rollback', action='store_true', help='切换回上一个版本目录并重启服务（不复制文件）')
+    parser.add_argument('--report', type=int, nargs='?', const=REPORT_LAST, metavar='N',
+                        help=f'显示最近 N 次部署各步骤耗时的 p50/p95（默认 {REPORT_LAST}）')
+    parser.add_argument('--on-regression', choices=['warn', 'fail', 'rollback'], default=SMOKE_ON_REGRESSION,
+                        help='健康检查或冒烟压测未通过时的处理方式')
+    parser.add_argument('--smoke-ratio', type=float, default=SMOKE_MAX_RATIO,
+                        help='p95 超过上次部署基线多少倍视为回归')
+    parser.add_argument('--rolling', action='store_true',
+                        help='零停机滚动重启：新实例在备用端口就绪后切换 nginx upstream，再停止旧实例')
+    parser.add_argument('--backup-format', choices=['snapshot'] + list(ARCHIVE_SUFFIXES), default='snapshot',
+                        help='snapshot 为硬链接增量快照目录；tar.gz / tar.zst 为单个压缩归档')
+    parser.add_argument('--backup-exclude', action='append', metavar='PATTERN',
+                        help=f'归档备份排除的路径模式，可重复（默认 {", ".join(ARCHIVE_EXCLUDES)}；传空字符串表示不排除）')
+    parser.add_argument('--artifact', metavar='TAR',
+                        help='解包构建包到新的版本目录代替 git 拉取（由 ssh_update.py --artifact 上传）')
+    args = parser.parse_args()
+    backup_excludes = ARCHIVE_EXCLUDES if args.backup_exclude is None else [p for p in args.backup_exclude if p]
+
+    if args.report:
+        print_deploy_report(args.report)
+        return
+
     print("=" * 50)
     print("  食材包订阅平台 - 服务端更新脚本")
     print("=" * 50)
@@ -485,27 +1816,44 @@ def main():
         print(f"  sudo git clone {GIT_REPO} {os.path.basename(PROJECT_DIR)}")
         sys.exit(1)
     
+    if args.rollback:
+        try:
+            print("\n[回滚] 切换到上一个版本...")
+            previous = rollback_release()
+            restart_service(rolling=args.rolling)
+            check_health(on_regression='warn')
+            print(f"\n已回滚到版本: {previous}")
+        except Exception as e:
+            print(f"\n✗ 回滚失败: {e}")
+            sys.exit(1)
+        return
+    
+    timings = {}
+    started = time.monotonic()
+    succeeded = False
     try:
-        backup_current()
-        pull_or_clone()
-        fix_all_scripts()
-        sync_frontend_dist()
-        add_version_marker()
-        install_dependencies()
-        restart_service()
-        check_health()
+        run_steps(deploy_steps(args.on_regression, args.smoke_ratio, args.rolling,
+                               args.backup_format, backup_excludes, args.artifact), timings=timings)
+        succeeded = True
+        if current_release():
+            print("  清理旧版本...")
+            cleanup_old_releases()
         
         print("\n" + "=" * 50)
         print("  更新完成！")
         print("=" * 50)
         print(f"\n备份位置: {BACKUP_DIR}")
         print(f"项目目录: {PROJECT_DIR}")
+        if current_release():
+            print(f"当前版本: {current_release()}（回滚: python3 update-server.py --rollback）")
         
     except Exception as e:
         print(f"\n✗ 更新失败: {e}")
-        import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        history = load_deploy_history(REPORT_LAST)
+        print_step_timings(record_deploy(timings, time.monotonic() - started, succeeded), history)
 
 if __name__ == "__main__":
     main()